@@ -0,0 +1,302 @@
+import io
+import os
+import math
+import time
+import threading
+from collections import deque
+
+# Rate limiter state for one client: (tokens, last refill time)
+CREATE_RATE_LIMITS = '''CREATE TABLE IF NOT EXISTS rate_limits (
+    client TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID'''
+
+# Refill and take one token in a single statement; no row comes back when
+# the bucket is empty, so concurrent workers can't both spend the last token
+TAKE_TOKEN = (
+    'INSERT INTO rate_limits (client, tokens, updated) VALUES (:client, :burst - 1, :now) '
+    'ON CONFLICT (client) DO UPDATE SET '
+    'tokens = MIN(:burst, tokens + (excluded.updated - updated) * :rate) - 1, updated = excluded.updated '
+    'WHERE MIN(:burst, tokens + (excluded.updated - updated) * :rate) >= 1 '
+    'RETURNING tokens'
+)
+SELECT_TOKENS = 'SELECT tokens, updated FROM rate_limits WHERE client = ?'
+DELETE_IDLE_BUCKETS = 'DELETE FROM rate_limits WHERE updated < ?'
+
+# How many admissions pass between sweeps of idle buckets
+PRUNE_EVERY = 1000
+
+# Size of the reads that buffer a request body
+READ_CHUNK = 64 * 1024
+
+
+class MemoryRateLimiter:
+    """
+    Token buckets per client, kept in this process.
+
+    Each client may make burst requests at once and then rate requests per
+    second. Buckets that have refilled completely are dropped periodically,
+    since a fresh bucket is equivalent.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, client):
+        """
+        Spend one token from the client's bucket.
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until a token
+            is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[client] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                idle = now - self.burst / self.rate
+                self._buckets = {key: value for key, value in self._buckets.items() if value[1] >= idle}
+        return wait
+
+
+class SQLiteRateLimiter:
+    """Token buckets per client in the shared database, so all workers enforce one limit"""
+
+    def __init__(self, db, rate, burst):
+        self.db = db
+        self.rate = rate
+        self.burst = burst
+        self._takes = 0
+        with db.connection() as conn:
+            conn.execute(CREATE_RATE_LIMITS)
+
+    def take(self, client):
+        """Same contract as MemoryRateLimiter.take()"""
+        now = time.time()
+        params = {'client': client, 'burst': self.burst, 'rate': self.rate, 'now': now}
+        with self.db.connection() as conn:
+            allowed = conn.execute(TAKE_TOKEN, params).fetchone() is not None
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                conn.execute(DELETE_IDLE_BUCKETS, (now - self.burst / self.rate,))
+            if allowed:
+                return 0
+            row = conn.execute(SELECT_TOKENS, (client,)).fetchone()
+        tokens = min(self.burst, row[0] + (now - row[1]) * self.rate) if row else 0
+        return max(0.0, (1 - tokens) / self.rate)
+
+
+class ConcurrencyLimiter:
+    """
+    Cap on requests running at once, with a short bounded wait queue.
+
+    A request that finds every slot busy waits up to queue_timeout seconds
+    if fewer than queue_size requests are already waiting; otherwise it is
+    rejected straight away instead of piling onto an overloaded process.
+    A released slot is handed directly to the longest-waiting request, so
+    newcomers can't overtake the queue.
+    """
+
+    def __init__(self, limit, queue_size, queue_timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def acquire(self):
+        """Take a slot; returns False if the request should be shed"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return True
+            if len(self._waiters) >= self.queue_size:
+                return False
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        if waiter.wait(self.queue_timeout):
+            return True
+        with self._lock:
+            # The slot may have been handed over just as the wait timed out
+            if waiter.is_set():
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot passes to the oldest waiter; active stays the same
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+
+class AdmissionControl:
+    """
+    Per-client rate limiting and load shedding for expensive routes.
+
+    Runs as WSGI middleware in front of Flask, so a shed request costs no
+    request context, session decoding or routing. Requests to the guarded
+    paths first spend a token from the client's bucket (429 with
+    Retry-After when it is empty), then have their body read into memory
+    (413 above max_body bytes) and only then need one of the process's
+    concurrency slots (503 with Retry-After when the slots and the wait
+    queue are full), so a slow upload holds its connection's thread but
+    not a slot. Shed requests are counted in fittrack_shed_total.
+    """
+
+    def __init__(self, rate_limiter, concurrency, paths, registry=None, trust_proxy=False, enabled=True,
+                 max_body=64 * 1024):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.paths = frozenset(paths)
+        self.registry = registry
+        self.trust_proxy = trust_proxy
+        self.enabled = enabled
+        self.max_body = max_body
+        if registry is not None:
+            registry.describe('fittrack_shed_total', 'counter', 'Requests rejected by admission control, by reason')
+            registry.gauge_callback(
+                'fittrack_admission', 'Requests holding or waiting for a concurrency slot',
+                lambda: {(('state', 'active'),): concurrency.active, (('state', 'waiting'),): concurrency.waiting}
+            )
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        wsgi_app = app.wsgi_app
+
+        def admit(environ, start_response):
+            if environ.get('REQUEST_METHOD') != 'POST' or environ.get('PATH_INFO') not in self.paths:
+                return wsgi_app(environ, start_response)
+            wait = self.rate_limiter.take(self.client_key(environ))
+            if wait:
+                return self._shed(start_response, 'rate_limited', '429 Too Many Requests', wait,
+                                  'Too many requests, please slow down.')
+            error = self._buffer_body(environ)
+            if error:
+                return self._reply(start_response, *error)
+            if not self.concurrency.acquire():
+                return self._shed(start_response, 'overloaded', '503 Service Unavailable', 1,
+                                  'The server is busy, please try again shortly.')
+            try:
+                return wsgi_app(environ, start_response)
+            finally:
+                self.concurrency.release()
+
+        app.wsgi_app = admit
+
+    def client_key(self, environ):
+        """The client a request is charged to: the first X-Forwarded-For hop behind a trusted proxy, else the peer address"""
+        if self.trust_proxy:
+            forwarded = environ.get('HTTP_X_FORWARDED_FOR')
+            if forwarded:
+                return forwarded.split(',', 1)[0].strip()
+        return environ.get('REMOTE_ADDR') or 'unknown'
+
+    def _buffer_body(self, environ):
+        """
+        Read the request body into memory and hand the app a copy of it.
+
+        The body is bounded by Content-Length, or read to its end when it
+        is chunked, and may not exceed max_body bytes.
+
+        Returns:
+            None once the body is buffered, otherwise the (status, message)
+            to reject the request with
+        """
+        chunked = environ.get('wsgi.input_terminated') and not environ.get('CONTENT_LENGTH')
+        try:
+            length = self.max_body + 1 if chunked else int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return '400 Bad Request', 'Invalid Content-Length.'
+        if length < 0:
+            return '400 Bad Request', 'Invalid Content-Length.'
+        if length > self.max_body:
+            return '413 Content Too Large', 'Request body too large.'
+
+        stream = environ['wsgi.input']
+        chunks = []
+        size = 0
+        while size < length:
+            chunk = stream.read(min(READ_CHUNK, length - size))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        if chunked and size > self.max_body:
+            return '413 Content Too Large', 'Request body too large.'
+        if not chunked and size < length:
+            # The client went away or stopped sending mid-body
+            return '400 Bad Request', 'Incomplete request body.'
+
+        body = b''.join(chunks)
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return None
+
+    def _shed(self, start_response, reason, status, retry_after, message):
+        if self.registry is not None:
+            self.registry.inc('fittrack_shed_total', (('reason', reason),))
+        return self._reply(start_response, status, message, [('Retry-After', str(max(1, math.ceil(retry_after))))])
+
+    def _reply(self, start_response, status, message, headers=()):
+        body = (message + '\n').encode()
+        start_response(status, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Content-Length', str(len(body))),
+            *headers
+        ])
+        return [body]
+
+
+def create_admission_control(db, registry=None):
+    """
+    Build admission control for /process from the environment.
+
+    ADMISSION_ENABLED=0 turns it off. ADMISSION_RATE (requests per second)
+    and ADMISSION_BURST size each client's token bucket; ADMISSION_BACKEND
+    is 'memory' (per process) or 'sqlite' (shared by all workers).
+    ADMISSION_MAX_CONCURRENCY, ADMISSION_QUEUE_SIZE and
+    ADMISSION_QUEUE_TIMEOUT (seconds) bound the work in flight per process.
+    ADMISSION_TRUST_PROXY=1 keys clients by X-Forwarded-For.
+    ADMISSION_MAX_BODY is the largest request body accepted, in bytes.
+    """
+    rate = float(os.environ.get('ADMISSION_RATE', 2))
+    burst = float(os.environ.get('ADMISSION_BURST', 10))
+    if os.environ.get('ADMISSION_BACKEND', 'memory') == 'sqlite':
+        rate_limiter = SQLiteRateLimiter(db, rate, burst)
+    else:
+        rate_limiter = MemoryRateLimiter(rate, burst)
+    concurrency = ConcurrencyLimiter(
+        int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 2)),
+        int(os.environ.get('ADMISSION_QUEUE_SIZE', 4)),
+        float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 0.25))
+    )
+    return AdmissionControl(
+        rate_limiter, concurrency, ('/process',), registry,
+        trust_proxy=os.environ.get('ADMISSION_TRUST_PROXY', '0') == '1',
+        enabled=os.environ.get('ADMISSION_ENABLED', '1') == '1',
+        max_body=int(os.environ.get('ADMISSION_MAX_BODY', 64 * 1024))
+    )
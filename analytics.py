@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import uuid
+import threading
+from bisect import bisect_right
+
+# BMI category upper bounds, matching the dashboard's labels
+BMI_CATEGORIES = ((18.5, 'underweight'), (25, 'normal'), (30, 'overweight'), (float('inf'), 'obese'))
+
+# Age band upper bounds (exclusive)
+AGE_BANDS = ((18, '12-17'), (30, '18-29'), (40, '30-39'), (50, '40-49'), (65, '50-64'), (float('inf'), '65+'))
+
+# Categorical fields counted per cohort
+CATEGORICAL_FIELDS = ('bmi_category', 'goal_type', 'activity_level')
+
+# Numeric fields tracked per cohort and the fixed histogram bin edges used
+# for their quantiles. Fixed edges keep histograms from different workers
+# mergeable by adding counts.
+NUMERIC_FIELDS = {
+    'bmi': tuple(range(15, 46)),
+    'calorie_target': tuple(range(1200, 5001, 100)),
+    'weeks_to_goal': (1, 2, 4, 6, 8, 12, 16, 20, 26, 32, 40, 52, 78, 104, 156, 208, 260, 364, 520)
+}
+
+# Quantiles reported for each numeric field
+QUANTILES = (0.5, 0.9)
+
+
+def _band(bands, value):
+    for upper, label in bands:
+        if value < upper:
+            return label
+    return bands[-1][1]
+
+
+class RunningStats:
+    """Count, mean, variance, min and max kept with Welford's method"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=None, max=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Fold in another RunningStats (Chan et al.'s parallel combination)"""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self):
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+
+
+class BinnedHistogram:
+    """Counts over fixed bin edges; bin i holds values in [edges[i-1], edges[i])"""
+
+    __slots__ = ('edges', 'counts')
+
+    def __init__(self, edges, counts=None):
+        self.edges = edges
+        self.counts = list(counts) if counts is not None else [0] * (len(edges) + 1)
+
+    def add(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+
+    def quantile(self, q, low, high):
+        """
+        Estimate a quantile by interpolating within its bin.
+
+        Args:
+            q: Quantile in [0, 1]
+            low, high: Observed minimum and maximum, which bound the open
+                first and last bins
+
+        Returns:
+            The estimate, or None for an empty histogram
+        """
+        total = sum(self.counts)
+        if not total:
+            return None
+        target = q * total
+        running = 0
+        for i, count in enumerate(self.counts):
+            if count and running + count >= target:
+                start = max(low, self.edges[i - 1]) if i > 0 else low
+                end = min(high, self.edges[i]) if i < len(self.edges) else high
+                return start + (end - start) * (target - running) / count
+            running += count
+        return high
+
+
+class Cohort:
+    """Aggregates for one (sex, age band) cohort"""
+
+    def __init__(self):
+        self.count = 0
+        self.categories = {field: {} for field in CATEGORICAL_FIELDS}
+        self.stats = {field: RunningStats() for field in NUMERIC_FIELDS}
+        self.histograms = {field: BinnedHistogram(edges) for field, edges in NUMERIC_FIELDS.items()}
+
+    def add(self, values):
+        self.count += 1
+        for field in CATEGORICAL_FIELDS:
+            counts = self.categories[field]
+            counts[values[field]] = counts.get(values[field], 0) + 1
+        for field in NUMERIC_FIELDS:
+            self.stats[field].add(values[field])
+            self.histograms[field].add(values[field])
+
+    def merge(self, other):
+        self.count += other.count
+        for field in CATEGORICAL_FIELDS:
+            counts = self.categories[field]
+            for value, count in other.categories[field].items():
+                counts[value] = counts.get(value, 0) + count
+        for field in NUMERIC_FIELDS:
+            self.stats[field].merge(other.stats[field])
+            self.histograms[field].merge(other.histograms[field])
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'categories': {field: dict(counts) for field, counts in self.categories.items()},
+            'stats': {field: stats.to_dict() for field, stats in self.stats.items()},
+            'histograms': {field: list(histogram.counts) for field, histogram in self.histograms.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        cohort = cls()
+        cohort.count = data['count']
+        cohort.categories = {field: dict(data['categories'].get(field, {})) for field in CATEGORICAL_FIELDS}
+        for field, edges in NUMERIC_FIELDS.items():
+            cohort.stats[field] = RunningStats.from_dict(data['stats'][field])
+            cohort.histograms[field] = BinnedHistogram(edges, data['histograms'][field])
+        return cohort
+
+    def summary(self):
+        """Counts, shares and per-field mean, standard deviation, range and quantiles"""
+        numeric = {}
+        for field, stats in self.stats.items():
+            entry = {
+                'mean': round(stats.mean, 2) if stats.count else None,
+                'stddev': round(stats.variance ** 0.5, 2),
+                'min': stats.min,
+                'max': stats.max
+            }
+            for q in QUANTILES:
+                estimate = self.histograms[field].quantile(q, stats.min, stats.max)
+                entry[f'p{round(q * 100)}'] = round(estimate, 2) if estimate is not None else None
+            numeric[field] = entry
+        return {
+            'count': self.count,
+            'categories': {field: dict(sorted(counts.items())) for field, counts in self.categories.items()},
+            'numeric': numeric
+        }
+
+
+class CohortAnalytics:
+    """
+    Running aggregates over every generated plan, split by sex and age band.
+
+    record() updates this worker's aggregates in O(1) as each plan is
+    created, so nothing is ever recomputed from the plan history. The
+    aggregates of each worker are partials: their snapshots merge exactly
+    (counts and histograms add, Welford moments combine), so a report is
+    the merge of this worker's live partial and the latest snapshots the
+    other workers have published to the database.
+    """
+
+    def __init__(self, db=None, flush_interval=10.0):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked worker starts its own partial under a new identity
+        self.worker = uuid.uuid4().hex
+        self._cohorts = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, profile, metrics):
+        """Add one generated plan: its profile and the metrics computed for it"""
+        key = (profile['sex'], _band(AGE_BANDS, profile['age']))
+        values = {
+            'bmi_category': _band(BMI_CATEGORIES, metrics['bmi']),
+            'goal_type': metrics['goal_type'],
+            'activity_level': profile['activity_level'],
+            'bmi': metrics['bmi'],
+            'calorie_target': metrics['calorie_target'],
+            'weeks_to_goal': metrics['weeks_to_goal']
+        }
+        with self._lock:
+            cohort = self._cohorts.get(key)
+            if cohort is None:
+                cohort = self._cohorts[key] = Cohort()
+            cohort.add(values)
+            due = self.db is not None and time.monotonic() - self._last_flush >= self.flush_interval
+            if due:
+                self._last_flush = time.monotonic()
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        """This worker's aggregates as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                'cohorts': [
+                    {'sex': sex, 'age_band': band, **cohort.to_dict()}
+                    for (sex, band), cohort in self._cohorts.items()
+                ]
+            }
+
+    def flush(self):
+        """Publish this worker's snapshot so other workers' reports include it"""
+        if self.db is not None:
+            self.db.save_analytics_partial(self.worker, json.dumps(self.snapshot(), separators=(',', ':')))
+
+    def merged(self):
+        """
+        Merge this worker's live aggregates with the other workers' snapshots.
+
+        Returns:
+            Tuple of ({(sex, age_band): Cohort}, number of partials merged)
+        """
+        snapshots = [self.snapshot()]
+        if self.db is not None:
+            snapshots += [json.loads(snapshot) for _, snapshot in self.db.analytics_partials(self.worker)]
+
+        cohorts = {}
+        for snapshot in snapshots:
+            for data in snapshot['cohorts']:
+                key = (data['sex'], data['age_band'])
+                partial = Cohort.from_dict(data)
+                if key in cohorts:
+                    cohorts[key].merge(partial)
+                else:
+                    cohorts[key] = partial
+        return cohorts, len(snapshots)
+
+    def report(self):
+        """Summary of all workers' aggregates: overall, by sex, by age band and by cohort"""
+        cohorts, partials = self.merged()
+        overall = Cohort()
+        by_sex = {}
+        by_age_band = {}
+        for (sex, band), cohort in cohorts.items():
+            overall.merge(cohort)
+            by_sex.setdefault(sex, Cohort()).merge(cohort)
+            by_age_band.setdefault(band, Cohort()).merge(cohort)
+
+        band_order = [label for _, label in AGE_BANDS]
+        return {
+            'partials': partials,
+            'overall': overall.summary(),
+            'by_sex': {sex: cohort.summary() for sex, cohort in sorted(by_sex.items())},
+            'by_age_band': {
+                band: by_age_band[band].summary() for band in band_order if band in by_age_band
+            },
+            'cohorts': [
+                {'sex': sex, 'age_band': band, **cohorts[(sex, band)].summary()}
+                for sex, band in sorted(cohorts, key=lambda key: (key[0], band_order.index(key[1])))
+            ]
+        }
+
+
+def create_cohort_analytics(db):
+    """
+    Build cohort analytics that share partials through db.
+
+    ANALYTICS_FLUSH_INTERVAL sets how often (seconds) a worker publishes its
+    snapshot while recording.
+    """
+    return CohortAnalytics(db, float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 10)))
@@ -1,16 +1,322 @@
 import os
-import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-import pandas as pd
-import numpy as np
-from exercise_data import get_exercise_recommendations, calculate_water_intake, get_diet_recommendations
+import json
+import gzip
+import random
+import secrets
+import hashlib
+import tempfile
+from datetime import date, timedelta
+from jinja2 import FileSystemBytecodeCache
+from flask import (
+    Flask, render_template, stream_template, request, redirect, url_for, flash, session, jsonify, make_response
+)
+from werkzeug.exceptions import RequestEntityTooLarge
+from exercise_data import get_exercise_recommendations
+from plan_store import create_plan_store
+from plan_cache import create_plan_cache
+from fragment_cache import create_fragment_cache
+from models import create_database
+from analytics import create_cohort_analytics
+from hydration import create_hydration_log
+from admission import create_admission_control
+from metrics import create_request_metrics
+from memory_profile import create_allocation_profiler
+from logging_config import configure_logging, init_access_log
+from assets import init_assets
+from projection import DEFAULT_POINT_BUDGET, project_plan, project_weights_batch, projection_series
+from plan_engine import (
+    ACTIVITY_FACTORS, INVALID_ACTIVITY_MESSAGE, INVALID_SEX_MESSAGE, PROFILE_FIELDS, SEXES, VALIDATION_RULES,
+    validate_profile, profile_columns, validate_profiles_batch, calculate_bmi, calculate_plan_metrics_batch,
+    sweep_plan_metrics
+)
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: records are queued and written by a background thread
+configure_logging()
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
+# Largest request body accepted (413 above it); a full /api/plans/batch is well under
+app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024
+
+# Persist compiled template bytecode so new workers skip Jinja compilation
+jinja_cache_dir = os.environ.get(
+    "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fittrack-jinja-cache")
+)
+os.makedirs(jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+
+# Fingerprinted, precompressed static assets (built with `python assets.py`)
+asset_manifest = init_assets(app)
+
+# Generated plans live server-side; the session cookie only carries the plan ID
+plan_store = create_plan_store()
+
+# Shared, read-only metrics and diet components for recurring profiles/targets
+plan_cache = create_plan_cache()
+
+# Pre-rendered exercise, schedule and diet blocks of the dashboard
+fragment_cache = create_fragment_cache()
+
+# Users, plan history and weight logs; the connection pool is opened here so
+# requests only borrow connections
+db = create_database()
+db.connect()
+
+# Running cohort aggregates over generated plans, merged across workers
+analytics = create_cohort_analytics(db)
+
+# Logged weights are validated like the profile form's weight field
+WEIGHT_RULE = next(rule for rule in VALIDATION_RULES if rule[0] == 'weight')
+
+# Longest range returned by /api/weights
+MAX_HISTORY_DAYS = 366
+
+# Fields /api/plan can return, and the compact set returned when ?fields= is absent
+API_PLAN_FIELDS = (
+    'bmi', 'tdee', 'water_intake', 'calorie_target', 'goal_type', 'weeks_to_goal',
+    'macros', 'diet', 'exercises', 'schedule', 'projection'
+)
+API_PLAN_DEFAULT_FIELDS = API_PLAN_FIELDS[:7]
+
+# Amount logged by /api/water when none is given (one glass), and the
+# accepted range for a single entry
+WATER_DEFAULT_ML = 250
+WATER_MIN_ML = 1
+WATER_MAX_ML = 2000
+
+# Largest number of goal weights in a /api/plan/sweep grid
+MAX_SWEEP_GOAL_WEIGHTS = 201
+
+# Most rows in one batch request; a projection row holds up to 521 weekly
+# weights, so /api/projections/batch accepts fewer
+MAX_BATCH_ROWS = 10000
+MAX_PROJECTION_BATCH_ROWS = 1000
+
+# Grid values returned by /api/plan/sweep
+SWEEP_FIELDS = (
+    'calorie_target', 'tdee', 'protein', 'fat', 'carbs', 'water_intake', 'weeks_to_goal', 'goal_type'
+)
+
+# JSON responses smaller than this aren't worth compressing
+GZIP_MIN_SIZE = 1024
+
+# Structured, sampled access log
+init_access_log(app)
+
+# Opt-in sampled allocation profiling per route and stage (MEMORY_PROFILE=1)
+memory_profiler = create_allocation_profiler()
+
+# Bearer token /admin/memory-profile requires; without one it only answers
+# clients on the loopback interface that didn't come through a proxy
+MEMORY_PROFILE_TOKEN = os.environ.get('MEMORY_PROFILE_TOKEN') or None
+
+# Per-stage timings for the Server-Timing header and /metrics
+request_metrics = create_request_metrics(memory_profiler)
+request_metrics.init_app(app)
+request_metrics.registry.gauge_callback(
+    'fittrack_cache_entries', 'Entries and counters of the in-process caches',
+    lambda: {
+        (('cache', name), ('stat', stat)): value
+        for name, stats in (
+            ('plan_metrics', plan_cache.metrics_cache.stats()),
+            ('plan_diet', plan_cache.diet_cache.stats()),
+            ('fragments', fragment_cache.stats())
+        )
+        for stat, value in stats.items()
+    }
+)
+request_metrics.registry.gauge_callback(
+    'fittrack_db_connections_opened', 'Database connections opened by this worker',
+    lambda: {(): db.connections_opened}
+)
+
+# Per-client rate limiting and load shedding for /process
+admission = create_admission_control(db, request_metrics.registry)
+admission.init_app(app)
+
+# Water intake log; entries are buffered and written to the database in batches
+hydration = create_hydration_log(db, request_metrics.registry)
+
+# Templates whose source contributes to the dashboard ETag
+DASHBOARD_TEMPLATES = (
+    'dashboard.html', 'layout.html',
+    'dashboard_exercises.html', 'dashboard_schedule.html', 'dashboard_diet.html'
+)
+
+_template_fingerprint = None
+
+# Stream the dashboard, sending the page head and summary cards before the
+# exercise, schedule and diet sections are rendered
+DASHBOARD_STREAMING = os.environ.get('DASHBOARD_STREAMING', '1') == '1'
+
+# What {{ flush() }} emits in a streamed render: the point where the output
+# so far is sent to the client. Plain renders emit nothing there.
+FLUSH_MARKER = '\x00flush\x00'
+
+app.add_template_global(lambda: '', 'flush')
+
+# Dashboard fragments and how each is rendered from a plan
+DASHBOARD_FRAGMENTS = {
+    'exercises': lambda plan: fragment_cache.render('dashboard_exercises.html', exercises=plan['exercises']['exercises']),
+    'schedule': lambda plan: fragment_cache.render('dashboard_schedule.html', schedule=plan['exercises']['schedule']),
+    'diet': lambda plan: fragment_cache.render('dashboard_diet.html', diet=plan['diet'])
+}
+
+class LazyFragments:
+    """Dashboard fragments rendered when the template reaches them, so a streamed page flushes its head first"""
+    
+    __slots__ = ('plan',)
+    
+    def __init__(self, plan):
+        self.plan = plan
+    
+    def __getitem__(self, name):
+        return DASHBOARD_FRAGMENTS[name](self.plan)
+
+def flushed_chunks(chunks):
+    """Join a streamed template's output into the pieces between its flush() points"""
+    buffer = []
+    for chunk in chunks:
+        if chunk == FLUSH_MARKER:
+            if buffer:
+                yield ''.join(buffer)
+                buffer = []
+        else:
+            buffer.append(chunk)
+    if buffer:
+        yield ''.join(buffer)
+
+def plan_etag(plan):
+    """Content hash of a generated plan, computed once when it is created"""
+    payload = json.dumps(plan, sort_keys=True, separators=(',', ':'), default=dict)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def dashboard_etag(plan):
+    """Strong ETag for a rendered dashboard: the plan hash plus the template sources and asset build"""
+    global _template_fingerprint
+    if 'etag' not in plan:
+        return None
+    if _template_fingerprint is None:
+        digest = hashlib.sha256()
+        for name in DASHBOARD_TEMPLATES:
+            source, _, _ = app.jinja_loader.get_source(app.jinja_env, name)
+            digest.update(source.encode())
+        # A new asset build changes the URLs in the page
+        digest.update(json.dumps(asset_manifest, sort_keys=True).encode())
+        _template_fingerprint = digest.hexdigest()[:16]
+    return f"{plan['etag']}-{_template_fingerprint}"
+
+def precompile_templates():
+    """Load every template up front so the first request doesn't pay for compiling them"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+if os.environ.get("PRECOMPILE_TEMPLATES", "1") == "1":
+    precompile_templates()
+
+def generate_plan(age, weight, goal_weight, sex, height, activity_level):
+    """
+    Build the full plan for a validated profile.
+    
+    This is the CPU-bound part of /process; the ASGI entry point runs it in
+    its executor.
+    """
+    stage = request_metrics.stage
+    
+    # Calculate BMI, TDEE, calorie target, water intake and timeline
+    with stage('metrics'):
+        plan = dict(plan_cache.get_metrics(age, weight, goal_weight, sex, height, activity_level))
+        plan['user_data'] = {
+            'age': age,
+            'weight': weight,
+            'goal_weight': goal_weight,
+            'sex': sex,
+            'height': height,
+            'activity_level': activity_level
+        }
+    
+    # Get exercise recommendations from the plan's own seeded RNG, so the
+    # same plan always regenerates the same exercises
+    with stage('exercises'):
+        plan['seed'] = secrets.randbits(64)
+        plan['exercises'] = get_exercise_recommendations(
+            goal_weight - weight, 
+            calculate_bmi(weight, height), 
+            sex, 
+            age,
+            activity_level,
+            rng=random.Random(plan['seed'])
+        )
+    
+    # Get diet recommendations
+    with stage('diet'):
+        plan['diet'] = plan_cache.get_diet(
+            plan['goal_type'],
+            plan['calorie_target']
+        )
+    
+    # Week-by-week weight projection for the progress chart
+    with stage('projection'):
+        plan['projection'] = project_plan(age, weight, goal_weight, sex, height, activity_level)
+        plan['start_date'] = date.today().isoformat()
+        plan['etag'] = plan_etag(plan)
+    return plan
+
+def store_plan(user_id, plan):
+    """
+    Store a generated plan and record it and the starting weight in the user's history.
+    
+    Args:
+        user_id: The session's user, or None to create one
+        plan: Plan from generate_plan()
+    
+    Returns:
+        Tuple of (user_id, plan_id)
+    """
+    user_id = user_id or db.create_user()
+    plan_id = plan_store.save(plan)
+    db.save_plan(user_id, plan_id, plan)
+    db.log_weight(user_id, plan['user_data']['weight'])
+    return user_id, plan_id
+
+def dashboard_context(plan):
+    """Template context of the dashboard page, apart from its fragments"""
+    return {
+        'user_data': plan['user_data'],
+        'bmi': plan['bmi'],
+        'tdee': plan['tdee'],
+        'calorie_target': plan['calorie_target'],
+        'water_intake': plan['water_intake'],
+        'exercises': plan['exercises'],
+        'diet': plan['diet'],
+        'goal_type': plan['goal_type'],
+        'weeks_to_goal': plan['weeks_to_goal'],
+        'projection': plan.get('projection'),
+        'start_date': plan.get('start_date')
+    }
+
+def render_dashboard(plan):
+    """Render the dashboard page for a plan; needs a request context for the session and flashes"""
+    stage = request_metrics.stage
+    with stage('fragments'):
+        fragments = {name: render(plan) for name, render in DASHBOARD_FRAGMENTS.items()}
+    
+    with stage('render'):
+        return render_template('dashboard.html', fragments=fragments, **dashboard_context(plan))
+
+def stream_dashboard(plan):
+    """
+    Render the dashboard page for a plan as it is sent.
+    
+    Yields the page in the pieces between the templates' flush() points:
+    the head, then the summary cards, then each section. The fragments
+    are rendered as the template reaches them. Rendering happens after
+    the view returns, so it isn't part of the request's stage timings.
+    """
+    return flushed_chunks(stream_template(
+        'dashboard.html', fragments=LazyFragments(plan), flush=lambda: FLUSH_MARKER, **dashboard_context(plan)
+    ))
 
 @app.route('/')
 def index():
@@ -19,105 +325,45 @@ def index():
 
 @app.route('/process', methods=['POST'])
 def process():
-    """Process user input and store in session"""
+    """Process user input and store the generated plan"""
+    stage = request_metrics.stage
     try:
         # Get user input
-        age = int(request.form.get('age'))
-        weight = float(request.form.get('weight'))
-        goal_weight = float(request.form.get('goal_weight'))
-        sex = request.form.get('sex')
-        height = float(request.form.get('height'))
-        activity_level = request.form.get('activity_level')
+        with stage('parse'):
+            age = int(request.form.get('age'))
+            weight = float(request.form.get('weight'))
+            goal_weight = float(request.form.get('goal_weight'))
+            sex = request.form.get('sex')
+            height = float(request.form.get('height'))
+            activity_level = request.form.get('activity_level')
         
         # Validate input
-        if age < 12 or age > 100:
-            flash('Please enter a valid age between 12 and 100.')
-            return redirect(url_for('index'))
-        
-        if weight < 30 or weight > 300:
-            flash('Please enter a valid weight between 30kg and 300kg.')
-            return redirect(url_for('index'))
-            
-        if goal_weight < 30 or goal_weight > 300:
-            flash('Please enter a valid goal weight between 30kg and 300kg.')
-            return redirect(url_for('index'))
-            
-        if height < 100 or height > 250:
-            flash('Please enter a valid height between 100cm and 250cm.')
+        with stage('validate'):
+            error = validate_profile({
+                'age': age,
+                'weight': weight,
+                'goal_weight': goal_weight,
+                'height': height
+            })
+            # Analytics cohorts are keyed on sex, so only the form's values get through
+            if error is None and sex not in SEXES:
+                error = INVALID_SEX_MESSAGE
+            if error is None and activity_level not in ACTIVITY_FACTORS:
+                error = INVALID_ACTIVITY_MESSAGE
+        if error:
+            flash(error)
             return redirect(url_for('index'))
         
-        # Store in session
-        session['user_data'] = {
-            'age': age,
-            'weight': weight,
-            'goal_weight': goal_weight,
-            'sex': sex,
-            'height': height,
-            'activity_level': activity_level
-        }
-        
-        # Calculate BMI
-        bmi = weight / ((height/100) ** 2)
-        session['bmi'] = round(bmi, 2)
-        
-        # Calculate BMR (Basal Metabolic Rate) using Mifflin-St Jeor Equation
-        if sex == 'male':
-            bmr = 10 * weight + 6.25 * height - 5 * age + 5
-        else:
-            bmr = 10 * weight + 6.25 * height - 5 * age - 161
-        
-        # Calculate TDEE (Total Daily Energy Expenditure)
-        activity_factors = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'active': 1.725,
-            'very_active': 1.9
-        }
-        
-        tdee = bmr * activity_factors[activity_level]
-        session['tdee'] = round(tdee)
-        
-        # Calculate water intake
-        water_intake = calculate_water_intake(weight, activity_level)
-        session['water_intake'] = water_intake
-        
-        # Calculate calorie deficit/surplus based on goal
-        weight_diff = goal_weight - weight
+        plan = generate_plan(age, weight, goal_weight, sex, height, activity_level)
         
-        # Calculate daily calorie target (assuming ~500 calorie deficit/surplus for ~0.5kg/week)
-        if weight_diff < 0:  # Weight loss
-            session['calorie_target'] = max(1200, round(tdee - 500))
-            session['goal_type'] = 'loss'
-        elif weight_diff > 0:  # Weight gain
-            session['calorie_target'] = round(tdee + 500)
-            session['goal_type'] = 'gain'
-        else:  # Maintenance
-            session['calorie_target'] = round(tdee)
-            session['goal_type'] = 'maintain'
-            
-        # Get exercise recommendations
-        session['exercises'] = get_exercise_recommendations(
-            weight_diff, 
-            bmi, 
-            sex, 
-            age,
-            activity_level
-        )
-        
-        # Get diet recommendations
-        session['diet'] = get_diet_recommendations(
-            session['goal_type'],
-            session['calorie_target']
-        )
-        
-        # Calculate weeks to goal
-        if weight_diff != 0:
-            # Assumes 0.5kg/week weight change with a 500 calorie deficit/surplus
-            weeks_to_goal = abs(weight_diff) / 0.5
-            session['weeks_to_goal'] = round(weeks_to_goal)
-        else:
-            session['weeks_to_goal'] = 0
+        # Store the plan and keep only the IDs in the session
+        with stage('store'):
+            user_id, plan_id = store_plan(session.get('user_id'), plan)
+        with stage('analytics'):
+            analytics.record(plan['user_data'], plan)
+        session.clear()
+        session['user_id'] = user_id
+        session['plan_id'] = plan_id
             
         return redirect(url_for('dashboard'))
         
@@ -129,22 +375,455 @@ def process():
 @app.route('/dashboard')
 def dashboard():
     """Display personalized recommendations dashboard"""
-    if 'user_data' not in session:
+    stage = request_metrics.stage
+    with stage('load'):
+        plan_id = session.get('plan_id')
+        plan = plan_store.load(plan_id) if plan_id else None
+    if plan is None:
+        session.pop('plan_id', None)
         flash('Please enter your information first.')
         return redirect(url_for('index'))
+    
+    # Repeat visits revalidate with If-None-Match and skip rendering entirely;
+    # pending flash messages are part of the page, so always render those
+    etag = dashboard_etag(plan)
+    if etag and '_flashes' not in session and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
-    return render_template(
-        'dashboard.html',
-        user_data=session['user_data'],
-        bmi=session['bmi'],
-        tdee=session['tdee'],
-        calorie_target=session['calorie_target'],
-        water_intake=session['water_intake'],
-        exercises=session['exercises'],
-        diet=session['diet'],
-        goal_type=session['goal_type'],
-        weeks_to_goal=session['weeks_to_goal']
+    # Flashes are popped while rendering, which a streamed page can no
+    # longer save to the session cookie, so pages with flashes render whole
+    if DASHBOARD_STREAMING and '_flashes' not in session:
+        response = app.response_class(stream_dashboard(plan), mimetype='text/html')
+    else:
+        response = make_response(render_dashboard(plan))
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def json_response(data, status=200):
+    """Compact JSON response, gzip-compressed when large and the client accepts it"""
+    body = json.dumps(data, separators=(',', ':'), default=dict).encode()
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= GZIP_MIN_SIZE and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.content_encoding = 'gzip'
+    return response
+
+def read_profile(payload):
+    """
+    Read and validate a single profile from a JSON object.
+    
+    Returns:
+        Tuple of (profile, error); exactly one of them is None
+    """
+    if not isinstance(payload, dict):
+        return None, 'Expected a JSON object with: ' + ', '.join(PROFILE_FIELDS)
+    try:
+        profile = {
+            'age': float(payload['age']),
+            'weight': float(payload['weight']),
+            'goal_weight': float(payload['goal_weight']),
+            'sex': payload['sex'],
+            'height': float(payload['height']),
+            'activity_level': payload['activity_level']
+        }
+    except KeyError as e:
+        return None, f'Missing field: {e.args[0]}'
+    except (TypeError, ValueError, OverflowError):
+        return None, 'age, weight, goal_weight and height must be numbers.'
+    
+    # Like the form, only whole years are accepted
+    if not profile['age'].is_integer():
+        return None, VALIDATION_RULES[0][3]
+    profile['age'] = int(profile['age'])
+    
+    error = validate_profile(profile)
+    # JSON may hold lists or objects here, which can't be looked up
+    if error is None and not (isinstance(profile['sex'], str) and profile['sex'] in SEXES):
+        error = INVALID_SEX_MESSAGE
+    if error is None and not (isinstance(profile['activity_level'], str) and profile['activity_level'] in ACTIVITY_FACTORS):
+        error = INVALID_ACTIVITY_MESSAGE
+    return (None, error) if error else (profile, None)
+
+def read_plan_fields(spec):
+    """
+    Read the comma-separated ?fields= of /api/plan.
+    
+    Returns:
+        Tuple of (fields, error); exactly one of them is None
+    """
+    fields = [name.strip() for name in spec.split(',') if name.strip()] if spec else API_PLAN_DEFAULT_FIELDS
+    unknown = [name for name in fields if name not in API_PLAN_FIELDS]
+    if unknown:
+        return None, 'Unknown field(s): ' + ', '.join(unknown)
+    return fields, None
+
+@app.route('/api/plan', methods=['POST'])
+def api_plan():
+    """
+    Compute a plan from a JSON profile and return it directly.
+    
+    ?fields= selects a comma-separated subset of API_PLAN_FIELDS (default:
+    the metrics and macros). Only the requested parts are computed; nothing
+    is stored and no session is created.
+    """
+    fields, error = read_plan_fields(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    payload = request.get_json(silent=True)
+    profile, error = read_profile(payload)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return json_response(compute_plan_fields(profile, fields, payload.get('seed')))
+
+def compute_plan_fields(profile, fields, seed=None):
+    """
+    Compute the requested parts of a plan for a validated profile.
+    
+    Args:
+        profile: Profile from read_profile()
+        fields: Names from API_PLAN_FIELDS
+        seed: Exercise seed from a previous response, or None for a new one
+    
+    Returns:
+        Dictionary with the requested fields (and the seed, when exercises
+        or the schedule were requested)
+    """
+    metrics = plan_cache.get_metrics(*(profile[field] for field in PROFILE_FIELDS))
+    result = {name: metrics[name] for name in fields if name in metrics}
+    
+    if 'macros' in fields or 'diet' in fields:
+        diet = plan_cache.get_diet(metrics['goal_type'], metrics['calorie_target'])
+        if 'macros' in fields:
+            result['macros'] = diet['macros']
+        if 'diet' in fields:
+            result['diet'] = diet
+    
+    if 'exercises' in fields or 'schedule' in fields:
+        # Clients can pass back a previous seed to get the same exercises again
+        if not isinstance(seed, int) or isinstance(seed, bool):
+            seed = secrets.randbits(64)
+        exercises = get_exercise_recommendations(
+            profile['goal_weight'] - profile['weight'],
+            calculate_bmi(profile['weight'], profile['height']),
+            profile['sex'],
+            profile['age'],
+            profile['activity_level'],
+            rng=random.Random(seed)
+        )
+        result['seed'] = seed
+        if 'exercises' in fields:
+            result['exercises'] = exercises['exercises']
+        if 'schedule' in fields:
+            result['schedule'] = exercises['schedule']
+    
+    if 'projection' in fields:
+        result['projection'] = project_plan(*(profile[field] for field in PROFILE_FIELDS))
+    return result
+
+def read_goal_weights(spec, default):
+    """
+    Read the goal weights of a sweep: a list, or {"start", "stop", "step"} (stop inclusive).
+    
+    Returns:
+        Tuple of (goal_weights, error); exactly one of them is None
+    """
+    if spec is None:
+        return [default], None
+    _, low, high, message = VALIDATION_RULES[2]
+    try:
+        if isinstance(spec, dict):
+            start, stop, step = float(spec['start']), float(spec['stop']), float(spec['step'])
+            if not (low <= start <= high and low <= stop <= high):
+                return None, message
+            if not step > 0 or stop < start:
+                return None, 'goal_weights needs step > 0 and stop >= start.'
+            # Checked as a float: a tiny step gives a quotient too large for int()
+            if (stop - start) / step + 1e-9 >= MAX_SWEEP_GOAL_WEIGHTS:
+                return None, f'A sweep can have at most {MAX_SWEEP_GOAL_WEIGHTS} goal weights.'
+            count = int((stop - start) / step + 1e-9) + 1
+            goal_weights = [round(start + i * step, 2) for i in range(count)]
+        elif isinstance(spec, list):
+            goal_weights = [float(value) for value in spec]
+        else:
+            raise TypeError
+    except KeyError as e:
+        return None, f'goal_weights range is missing: {e.args[0]}'
+    except (TypeError, ValueError, OverflowError):
+        return None, 'goal_weights must be a list of numbers or {"start", "stop", "step"}.'
+    
+    if not goal_weights or len(goal_weights) > MAX_SWEEP_GOAL_WEIGHTS:
+        return None, f'A sweep needs between 1 and {MAX_SWEEP_GOAL_WEIGHTS} goal weights.'
+    if not all(low <= value <= high for value in goal_weights):
+        return None, message
+    return goal_weights, None
+
+@app.route('/api/plan/sweep', methods=['POST'])
+def api_plan_sweep():
+    """
+    Compare outcomes for one profile across goal weights and activity levels.
+    
+    The body is a profile as for /api/plan plus optional "goal_weights" (a
+    list or {"start", "stop", "step"}) and "activity_levels" (a list);
+    either defaults to the profile's own value. The response holds one
+    row per activity level and one column per goal weight for each of
+    SWEEP_FIELDS, computed in a single vectorized pass.
+    """
+    payload = request.get_json(silent=True)
+    profile, error = read_profile(payload)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    goal_weights, error = read_goal_weights(payload.get('goal_weights'), profile['goal_weight'])
+    if error:
+        return jsonify({'error': error}), 400
+    
+    activity_levels = payload.get('activity_levels', [profile['activity_level']])
+    if (not isinstance(activity_levels, list) or not activity_levels
+            or not all(isinstance(level, str) and level in ACTIVITY_FACTORS for level in activity_levels)):
+        return jsonify({'error': INVALID_ACTIVITY_MESSAGE}), 400
+    
+    grid = sweep_plan_metrics(profile, goal_weights, activity_levels)
+    return json_response({
+        'goal_weights': goal_weights,
+        'activity_levels': activity_levels,
+        'grid': {name: grid[name].tolist() for name in SWEEP_FIELDS}
+    })
+
+def parse_date(value, default):
+    """Parse an ISO date query/body value, falling back to default when absent"""
+    return date.fromisoformat(value) if value else default
+
+@app.route('/api/weights', methods=['GET'])
+def weight_history():
+    """Return the current user's logged weights between ?start= and ?end= (ISO dates)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return jsonify({'error': 'Please enter your information first.'}), 401
+    
+    try:
+        end = parse_date(request.args.get('end'), date.today())
+        start = parse_date(request.args.get('start'), end - timedelta(days=365))
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format.'}), 400
+    if start > end or (end - start).days > MAX_HISTORY_DAYS:
+        return jsonify({'error': f'The date range must be between 0 and {MAX_HISTORY_DAYS} days.'}), 400
+    
+    rows = db.weight_history(user_id, start, end)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'entries': [{'date': day, 'weight': weight} for day, weight in rows]
+    })
+
+@app.route('/api/weights', methods=['POST'])
+def log_weight():
+    """Log the current user's weight for a day (today unless a date is given)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return jsonify({'error': 'Please enter your information first.'}), 401
+    
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object with a weight.'}), 400
+    try:
+        weight = float(payload.get('weight'))
+        day = parse_date(payload.get('date'), date.today())
+    except (TypeError, ValueError):
+        return jsonify({'error': 'weight must be a number and date a YYYY-MM-DD date.'}), 400
+    
+    _, low, high, message = WEIGHT_RULE
+    if not low <= weight <= high:
+        return jsonify({'error': message}), 400
+    if day > date.today():
+        return jsonify({'error': 'Weights cannot be logged for future dates.'}), 400
+    
+    db.log_weight(user_id, weight, day)
+    return jsonify({'date': day.isoformat(), 'weight': weight}), 201
+
+def water_progress(day, total):
+    """Body for the water endpoints: the day's total and progress towards the plan's target"""
+    plan_id = session.get('plan_id')
+    plan = plan_store.load(plan_id) if plan_id else None
+    target = round(plan['water_intake'] * 1000) if plan else None
+    return {
+        'date': day.isoformat(),
+        'ml': total,
+        'target_ml': target,
+        'progress': round(total / target, 3) if target else None
+    }
+
+@app.route('/api/water', methods=['GET'])
+def water_intake():
+    """Return the current user's water intake for a day (?date=, today by default)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return jsonify({'error': 'Please enter your information first.'}), 401
+    
+    try:
+        day = parse_date(request.args.get('date'), date.today())
+    except ValueError:
+        return jsonify({'error': 'date must be a YYYY-MM-DD date.'}), 400
+    
+    return jsonify(water_progress(day, hydration.total(user_id, day)))
+
+@app.route('/api/water', methods=['POST'])
+def log_water():
+    """Add water to the current user's intake for a day (a glass today unless ml or date are given)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return jsonify({'error': 'Please enter your information first.'}), 401
+    
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        ml = payload.get('ml', WATER_DEFAULT_ML)
+        if isinstance(ml, bool) or not isinstance(ml, (int, float)) or ml != int(ml):
+            raise TypeError
+        ml = int(ml)
+        day = parse_date(payload.get('date'), date.today())
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'ml must be a whole number and date a YYYY-MM-DD date.'}), 400
+    
+    if not WATER_MIN_ML <= ml <= WATER_MAX_ML:
+        return jsonify({'error': f'ml must be between {WATER_MIN_ML} and {WATER_MAX_ML}.'}), 400
+    if day > date.today():
+        return jsonify({'error': 'Water cannot be logged for future dates.'}), 400
+    
+    return jsonify(water_progress(day, hydration.log(user_id, day, ml))), 201
+
+@app.route('/metrics')
+def metrics():
+    """Expose request, stage, session and cache metrics in the Prometheus text format"""
+    return app.response_class(
+        request_metrics.registry.render(),
+        mimetype='text/plain; version=0.0.4'
     )
 
+def memory_profile_allowed():
+    """Whether the request may use /admin/memory-profile (see MEMORY_PROFILE_TOKEN)"""
+    if MEMORY_PROFILE_TOKEN is not None:
+        return secrets.compare_digest(
+            request.headers.get('Authorization', '').encode(), f'Bearer {MEMORY_PROFILE_TOKEN}'.encode()
+        )
+    return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+@app.route('/admin/memory-profile', methods=['GET', 'DELETE'])
+def memory_profile():
+    """Report sampled allocations per route and stage for this worker; DELETE starts a fresh report"""
+    if not memory_profile_allowed():
+        return jsonify({'error': 'Set MEMORY_PROFILE_TOKEN and send it as a Bearer token, or connect from localhost.'}), 403
+    if not memory_profiler.enabled:
+        return jsonify({'error': 'Memory profiling is off; set MEMORY_PROFILE=1 to enable it.'}), 404
+    if request.method == 'DELETE':
+        memory_profiler.clear()
+        return '', 204
+    return jsonify(memory_profiler.report())
+
+@app.route('/api/analytics/cohorts')
+def cohort_analytics():
+    """Distribution of generated plans overall, by sex, by age band and by cohort"""
+    return json_response(analytics.report())
+
+@app.route('/api/plan-cache/stats')
+def plan_cache_stats():
+    """Report plan cache hit, miss and eviction counters"""
+    return jsonify(plan_cache.stats())
+
+def read_batch_columns(max_rows=MAX_BATCH_ROWS):
+    """
+    Read profile columns from a JSON batch request.
+    
+    Args:
+        max_rows: Most rows accepted; larger batches get a 413
+    
+    Returns:
+        Tuple of (columns, error_response); exactly one of them is None
+    """
+    try:
+        payload = request.get_json(silent=True)
+    except RequestEntityTooLarge:
+        return None, (jsonify({'error': f'A batch request can be at most {app.config["MAX_CONTENT_LENGTH"]} bytes.'}), 413)
+    if not isinstance(payload, dict) or not all(isinstance(payload.get(field), list) for field in PROFILE_FIELDS):
+        return None, (jsonify({'error': 'Expected a JSON object with list columns: ' + ', '.join(PROFILE_FIELDS)}), 400)
+    
+    count = len(payload['age'])
+    if any(len(payload[field]) != count for field in PROFILE_FIELDS):
+        return None, (jsonify({'error': 'All columns must have the same length.'}), 400)
+    if count > max_rows:
+        return None, (jsonify({'error': f'A batch can have at most {max_rows} rows.'}), 413)
+    
+    # NumPy would turn nested lists into extra dimensions or list elements
+    if any(isinstance(value, (list, dict)) for field in PROFILE_FIELDS for value in payload[field]):
+        return None, (jsonify({'error': 'Columns must contain only single values, not lists or objects.'}), 400)
+    
+    try:
+        return profile_columns(payload), None
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'Numeric columns must contain only numbers.'}), 400)
+
+@app.route('/api/plans/batch', methods=['POST'])
+def plans_batch():
+    """Compute plan metrics for a batch of profiles sent as JSON columns"""
+    columns, error_response = read_batch_columns()
+    if error_response:
+        return error_response
+    
+    count = len(columns['age'])
+    valid, errors = validate_profiles_batch(columns)
+    metrics = calculate_plan_metrics_batch(*(columns[field][valid] for field in PROFILE_FIELDS))
+    
+    results = {}
+    valid_rows = valid.nonzero()[0].tolist()
+    for name, values in metrics.items():
+        if len(valid_rows) == count:
+            results[name] = values.tolist()
+        else:
+            column = [None] * count
+            for i, value in zip(valid_rows, values.tolist()):
+                column[i] = value
+            results[name] = column
+    
+    return jsonify({
+        'count': count,
+        'results': results,
+        'errors': [{'index': i, 'error': errors[i]} for i in sorted(errors)]
+    })
+
+@app.route('/api/projections/batch', methods=['POST'])
+def projections_batch():
+    """Project weekly weight trajectories for a batch of profiles sent as JSON columns"""
+    columns, error_response = read_batch_columns(MAX_PROJECTION_BATCH_ROWS)
+    if error_response:
+        return error_response
+    
+    points = request.args.get('points', DEFAULT_POINT_BUDGET, type=int)
+    if points < 3 or points > 520:
+        return jsonify({'error': 'points must be between 3 and 520.'}), 400
+    
+    count = len(columns['age'])
+    valid, errors = validate_profiles_batch(columns)
+    weights, weeks_to_goal = project_weights_batch(*(columns[field][valid] for field in PROFILE_FIELDS))
+    
+    projections = [None] * count
+    for row, i in enumerate(valid.nonzero()[0].tolist()):
+        projections[i] = projection_series(weights[row], weeks_to_goal[row], points)
+    
+    return jsonify({
+        'count': count,
+        'projections': projections,
+        'errors': [{'index': i, 'error': errors[i]} for i in sorted(errors)]
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
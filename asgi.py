@@ -0,0 +1,546 @@
+"""
+ASGI entry point for FitTrack.
+
+    python asgi.py
+    uvicorn asgi:application
+
+The home page, /process, /dashboard and /api/plan are served by async
+handlers on an asyncio event loop: request bodies are read and responses
+written without holding a thread, so a slow client only costs a socket.
+Plan generation, template rendering and storage calls run in a bounded
+thread pool; when its threads and queue are full, requests are shed with
+503 instead of queueing without limit. Every other route is passed to the
+Flask app, also in the pool. The WSGI app in app.py is unchanged and
+shares its stores, caches and database with this one.
+
+python asgi.py runs uvicorn when it is installed and otherwise a small
+built-in HTTP/1.1 server (keep-alive, Content-Length bodies; no TLS or
+chunked uploads), which is meant to sit behind a reverse proxy.
+
+Configuration (environment):
+    ASGI_HOST, ASGI_PORT     listen address (default 0.0.0.0:8000)
+    ASGI_EXECUTOR_WORKERS    threads for blocking work (default: CPU count)
+    ASGI_EXECUTOR_QUEUE      jobs that may wait for a thread before requests
+                             are shed (default 64)
+    ASGI_MAX_BODY            largest request body accepted, in bytes
+                             (default 1 MiB)
+    ASGI_TIMEOUT             seconds a client may take to send a request or
+                             sit idle between requests (default 60)
+"""
+import io
+import os
+import sys
+import math
+import signal
+import asyncio
+import logging
+import contextvars
+from http import HTTPStatus
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, make_response
+from logging_config import configure_logging, shutdown_logging
+from app import (
+    app, admission, analytics, hydration, plan_store, request_metrics, dashboard_etag,
+    generate_plan, store_plan, render_dashboard, read_profile, read_plan_fields, compute_plan_fields,
+    json_response, validate_profile
+)
+from plan_engine import ACTIVITY_FACTORS, INVALID_ACTIVITY_MESSAGE, INVALID_SEX_MESSAGE, SEXES
+
+logger = logging.getLogger('fittrack.asgi')
+
+MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 1024 * 1024))
+TIMEOUT = float(os.environ.get('ASGI_TIMEOUT', 60))
+
+
+class Overloaded(Exception):
+    """Raised when the executor's threads and queue are all taken"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking work with a cap on queued jobs.
+
+    Jobs run in a copy of the caller's context, so Flask's request, session
+    and the request's stage timings are available in the thread. Only the
+    event loop submits jobs, so the pending count needs no lock.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.limit = workers + queue_size
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='asgi')
+
+    async def run(self, function, *args):
+        if self.pending >= self.limit:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, function, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+# Blocking work of every request: plan generation, rendering, storage and
+# the routes served by the Flask app
+executor = BoundedExecutor(
+    int(os.environ.get('ASGI_EXECUTOR_WORKERS', 0)) or os.cpu_count() or 1,
+    int(os.environ.get('ASGI_EXECUTOR_QUEUE', 64))
+)
+
+async def read_body(receive, limit):
+    """Collect the request body from http.request messages; None if the client went away"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope, so Flask's request objects work unchanged"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ', ') + value
+        environ[key] = value
+    return environ
+
+
+def call_wsgi(environ):
+    """Run the Flask app for one request; returns (status code, headers, body)"""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(' ', 1)[0]), headers]
+
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    status, headers = started
+    if not any(name.lower() == 'content-length' for name, _ in headers):
+        headers = headers + [('Content-Length', str(len(body)))]
+    return status, headers, body
+
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_text(send, status, message, headers=()):
+    body = (message + '\n').encode()
+    await send_response(send, status, [
+        ('Content-Type', 'text/plain; charset=utf-8'),
+        ('Content-Length', str(len(body))),
+        *headers
+    ], body)
+
+
+async def index():
+    return await executor.run(render_template, 'index.html')
+
+
+async def process():
+    """Async variant of app.process(): parse and validate on the loop, generate and store in the executor"""
+    stage = request_metrics.stage
+    try:
+        with stage('parse'):
+            age = int(request.form.get('age'))
+            weight = float(request.form.get('weight'))
+            goal_weight = float(request.form.get('goal_weight'))
+            sex = request.form.get('sex')
+            height = float(request.form.get('height'))
+            activity_level = request.form.get('activity_level')
+
+        with stage('validate'):
+            error = validate_profile({
+                'age': age,
+                'weight': weight,
+                'goal_weight': goal_weight,
+                'height': height
+            })
+            # Analytics cohorts are keyed on sex, so only the form's values get through
+            if error is None and sex not in SEXES:
+                error = INVALID_SEX_MESSAGE
+            if error is None and activity_level not in ACTIVITY_FACTORS:
+                error = INVALID_ACTIVITY_MESSAGE
+        if error:
+            flash(error)
+            return redirect(url_for('index'))
+
+        plan = await executor.run(generate_plan, age, weight, goal_weight, sex, height, activity_level)
+
+        with stage('store'):
+            user_id, plan_id = await executor.run(store_plan, session.get('user_id'), plan)
+        with stage('analytics'):
+            # A due flush writes to SQLite, so it stays off the loop too
+            await executor.run(analytics.record, plan['user_data'], plan)
+        session.clear()
+        session['user_id'] = user_id
+        session['plan_id'] = plan_id
+
+        return redirect(url_for('dashboard'))
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error processing form: {str(e)}")
+        flash('There was an error processing your information. Please try again.')
+        return redirect(url_for('index'))
+
+
+async def dashboard():
+    """Async variant of app.dashboard(): load and render in the executor"""
+    stage = request_metrics.stage
+    with stage('load'):
+        plan_id = session.get('plan_id')
+        plan = await executor.run(plan_store.load, plan_id) if plan_id else None
+    if plan is None:
+        session.pop('plan_id', None)
+        flash('Please enter your information first.')
+        return redirect(url_for('index'))
+
+    etag = dashboard_etag(plan)
+    if etag and '_flashes' not in session and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    response = make_response(await executor.run(render_dashboard, plan))
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+async def api_plan():
+    """Async variant of app.api_plan(): the plan is computed and encoded in the executor"""
+    fields, error = read_plan_fields(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    payload = request.get_json(silent=True)
+    profile, error = read_profile(payload)
+    if error:
+        return jsonify({'error': error}), 400
+
+    def compute():
+        return json_response(compute_plan_fields(profile, fields, payload.get('seed')))
+
+    return await executor.run(compute)
+
+
+# (method, path) -> async handler; everything else goes to the Flask app
+ROUTES = {
+    ('GET', '/'): index,
+    ('POST', '/process'): process,
+    ('GET', '/dashboard'): dashboard,
+    ('POST', '/api/plan'): api_plan
+}
+
+
+async def handle_http(scope, receive, send):
+    try:
+        body = await read_body(receive, MAX_BODY)
+    except BodyTooLarge:
+        await send_text(send, 413, 'Request body too large.')
+        return
+    if body is None:
+        return
+    environ = build_environ(scope, body)
+    handler = ROUTES.get((scope['method'], scope['path']))
+
+    try:
+        if handler is None:
+            await send_response(send, *await executor.run(call_wsgi, environ))
+            return
+
+        # The WSGI admission middleware doesn't see these routes; the
+        # per-client rate limit applies here and the executor bound
+        # replaces the concurrency limit
+        if admission.enabled and environ['REQUEST_METHOD'] == 'POST' and environ['PATH_INFO'] in admission.paths:
+            # The sqlite backend writes the bucket, so it runs in the executor
+            wait = await executor.run(admission.rate_limiter.take, admission.client_key(environ))
+            if wait:
+                count_shed('rate_limited')
+                await send_text(send, 429, 'Too many requests, please slow down.',
+                                [('Retry-After', str(max(1, math.ceil(wait))))])
+                return
+
+        with app.request_context(environ):
+            response = app.preprocess_request()
+            if response is None:
+                response = await handler()
+            response = app.process_response(app.make_response(response))
+    except Overloaded:
+        count_shed('overloaded')
+        await send_text(send, 503, 'The server is busy, please try again shortly.', [('Retry-After', '1')])
+        return
+    except Exception:
+        logger.exception("Unhandled error in %s %s", scope['method'], scope['path'])
+        await send_text(send, 500, HTTPStatus.INTERNAL_SERVER_ERROR.phrase)
+        return
+
+    await send_response(send, response.status_code, response.headers.to_wsgi_list(), response.get_data())
+
+
+def count_shed(reason):
+    if admission.registry is not None:
+        admission.registry.inc('fittrack_shed_total', (('reason', reason),))
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+
+
+def shutdown():
+    """Finish running jobs and write out buffered state"""
+    executor.shutdown()
+    hydration.close()
+    analytics.flush()
+
+
+class HTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 server for an ASGI application.
+
+    Each connection is a task that parses requests, feeds the body to the
+    application as it arrives and writes the response with backpressure
+    (drain), so waiting on a slow client never blocks other connections.
+    """
+
+    def __init__(self, application, timeout=TIMEOUT, max_header_size=65536):
+        self.application = application
+        self.timeout = timeout
+        self.max_header_size = max_header_size
+        self.server = None
+
+    async def start(self, host, port, backlog=2048, sock=None):
+        if sock is not None:
+            self.server = await asyncio.start_server(self.handle, sock=sock, limit=self.max_header_size)
+        else:
+            self.server = await asyncio.start_server(
+                self.handle, host, port, backlog=backlog, limit=self.max_header_size
+            )
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername') or ('', 0)
+        local = writer.get_extra_info('sockname') or ('', 0)
+        try:
+            while await self._handle_request(reader, writer, peer, local):
+                pass
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader, writer, peer, local):
+        """Serve one request; returns True to keep the connection open"""
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.timeout)
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ', 2)
+        headers = []
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+        header_map = dict(headers)
+        if b'chunked' in header_map.get(b'transfer-encoding', b'').lower():
+            writer.write(b'HTTP/1.1 411 Length Required\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            await writer.drain()
+            return False
+
+        connection = header_map.get(b'connection', b'').lower()
+        keep_alive = connection != b'close' if version == 'HTTP/1.1' else connection == b'keep-alive'
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0', 'spec_version': '2.3'},
+            'http_version': version[5:],
+            'method': method.upper(),
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'client': peer[:2],
+            'server': local[:2]
+        }
+
+        remaining = int(header_map.get(b'content-length', b'0'))
+        response_started = False
+        response_done = False
+        chunked = False
+
+        async def receive():
+            nonlocal remaining
+            if remaining <= 0:
+                if response_done:
+                    return {'type': 'http.disconnect'}
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            chunk = await asyncio.wait_for(reader.read(min(remaining, 65536)), self.timeout)
+            if not chunk:
+                raise ConnectionResetError('client closed the connection mid-request')
+            remaining -= len(chunk)
+            return {'type': 'http.request', 'body': chunk, 'more_body': remaining > 0}
+
+        async def send(message):
+            nonlocal response_started, response_done, chunked, keep_alive
+            if message['type'] == 'http.response.start':
+                response_started = True
+                names = {name.lower() for name, _ in message.get('headers', ())}
+                out = [f"HTTP/1.1 {message['status']} {status_phrase(message['status'])}\r\n".encode()]
+                out += [name + b': ' + value + b'\r\n' for name, value in message.get('headers', ())]
+                if b'content-length' not in names and message['status'] not in (204, 304):
+                    chunked = True
+                    out.append(b'transfer-encoding: chunked\r\n')
+                if not keep_alive:
+                    out.append(b'connection: close\r\n')
+                writer.write(b''.join(out) + b'\r\n')
+            elif message['type'] == 'http.response.body':
+                body = message.get('body', b'')
+                more = message.get('more_body', False)
+                if chunked:
+                    if body:
+                        writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+                    if not more:
+                        writer.write(b'0\r\n\r\n')
+                elif method.upper() != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not more:
+                    response_done = True
+
+        try:
+            await self.application(scope, receive, send)
+        except Exception:
+            logger.exception("ASGI application failed")
+            if not response_started:
+                await send_text(send, 500, HTTPStatus.INTERNAL_SERVER_ERROR.phrase)
+            return False
+        if not response_done:
+            return False
+        # Discard any body the application didn't read before the next request
+        while remaining > 0:
+            chunk = await asyncio.wait_for(reader.read(min(remaining, 65536)), self.timeout)
+            if not chunk:
+                return False
+            remaining -= len(chunk)
+        return keep_alive
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+def status_phrase(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+async def run_builtin(host, port):
+    server = HTTPServer(application)
+    host, port = await server.start(host, port)
+    logger.info("Serving ASGI on %s:%s", host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await loop.run_in_executor(None, shutdown)
+
+
+def main():
+    configure_logging()
+    host = os.environ.get('ASGI_HOST', '0.0.0.0')
+    port = int(os.environ.get('ASGI_PORT', 8000))
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn is not None:
+        uvicorn.run(application, host=host, port=port, lifespan='on')
+    else:
+        asyncio.run(run_builtin(host, port))
+    shutdown_logging()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Static asset build and serving.
+
+    python assets.py
+
+minifies the stylesheets and scripts listed in ASSETS, writes them under
+static/dist with a content hash in the file name, adds precompressed .gz
+(and .br, when the brotli package is installed) variants and records the
+mapping in static/dist/manifest.json.
+
+At runtime init_assets() adds an asset_url() template helper that returns
+the fingerprinted URL when a build exists (and the plain file otherwise),
+and replaces Flask's static view so fingerprinted files are served with
+immutable cache headers and, when the client accepts it, straight from
+their precompressed variant.
+"""
+import os
+import re
+import sys
+import json
+import gzip
+import hashlib
+import mimetypes
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Source files, relative to the static folder
+ASSETS = ('css/style.css', 'js/main.js', 'js/chart.js')
+
+# Build output, relative to the static folder
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Fingerprinted files never change, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Precompressed variants in order of preference: (encoding, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def minify_css(source):
+    """Strip comments and insignificant whitespace from a stylesheet"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    source = source.replace(';}', '}')
+    return source.strip() + '\n'
+
+
+def minify_js(source):
+    """
+    Strip comments, indentation and blank lines from a script.
+
+    Strings and template literals are copied untouched. Line breaks are
+    kept so automatic semicolon insertion still sees the same statements;
+    the scripts here contain no regular expression literals, which this
+    scanner doesn't recognise.
+    """
+    out = []
+    i = 0
+    n = len(source)
+    while i < n:
+        c = source[i]
+        if c in '\'"`':
+            end = i + 1
+            while end < n and source[end] != c:
+                end += 2 if source[end] == '\\' else 1
+            out.append(source[i:end + 1])
+            i = end + 1
+        elif source.startswith('//', i):
+            while i < n and source[i] != '\n':
+                i += 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        else:
+            out.append(c)
+            i += 1
+
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build_assets(static_folder):
+    """
+    Minify, fingerprint and precompress ASSETS.
+
+    Returns:
+        The manifest: {'assets': {source: fingerprinted path},
+        'encodings': {fingerprinted path: [encodings]}}, with paths
+        relative to the static folder
+    """
+    manifest = {'assets': {}, 'encodings': {}}
+    for name in ASSETS:
+        base, ext = os.path.splitext(name)
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            content = MINIFIERS[ext](f.read()).encode()
+
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        output = f'{DIST_DIR}/{base}.{digest}{ext}'
+        path = os.path.join(static_folder, output)
+        _write(path, content)
+
+        encodings = []
+        # mtime=0 keeps the .gz byte-identical across builds of the same content
+        _write(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        encodings.append('gzip')
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(content, quality=11))
+            encodings.append('br')
+
+        manifest['assets'][name] = output
+        manifest['encodings'][output] = encodings
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Return the build manifest, or an empty one if assets haven't been built"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'assets': {}, 'encodings': {}}
+
+
+def init_assets(app):
+    """
+    Register asset_url() and the caching, precompression-aware static view.
+
+    Returns:
+        The loaded manifest, so callers can fold it into page validators
+    """
+    manifest = load_manifest(app.static_folder)
+    assets = manifest['assets']
+    encodings = manifest['encodings']
+
+    def asset_url(filename):
+        """URL of a static file, fingerprinted when a build exists"""
+        return app.url_for('static', filename=assets.get(filename, filename))
+
+    def static(filename):
+        available = encodings.get(filename)
+        if available is None:
+            return app.send_static_file(filename)
+
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding in available and request.accept_encodings[encoding]:
+                mimetype, _ = mimetypes.guess_type(filename)
+                response = send_from_directory(
+                    app.static_folder, filename + suffix, mimetype=mimetype, max_age=None
+                )
+                response.content_encoding = encoding
+                break
+        if response is None:
+            response = send_from_directory(app.static_folder, filename, max_age=None)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    app.add_template_global(asset_url)
+    # Flask only registers the static route when the static folder exists
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = static
+    return manifest
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    result = build_assets(folder)
+    for source, output in result['assets'].items():
+        print(f"{source} -> {output} ({', '.join(result['encodings'][output])})")
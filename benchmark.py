@@ -0,0 +1,1172 @@
+"""
+Benchmarks for the request hot path.
+
+    python benchmark.py run -o results.json
+    python benchmark.py run --scenarios client,server --requests 2000 --concurrency 8
+    python benchmark.py run --scenarios server --url http://127.0.0.1:5000
+    python benchmark.py compare baseline.json results.json
+
+Before/after runs: check the older commit out into a worktree and point
+--tree at it, so the app modules are imported from there:
+
+    git worktree add /tmp/before HEAD~1
+    python benchmark.py run --scenarios exercises --tree /tmp/before -o before.json
+    python benchmark.py run --scenarios exercises -o after.json
+    python benchmark.py compare before.json after.json
+
+Scenarios an older tree lacks the code for fail with an ImportError.
+
+Scenarios:
+    micro   get_exercise_recommendations, get_diet_recommendations and
+            calculate_water_intake called directly, plus the meal portion
+            solver for one user and for batches of --batch-size users
+    exercises  get_exercise_recommendations over 60 representative
+            profiles through the module's global random state, so it runs
+            against trees from before the seeded-plan change too
+    database  --db-users users with a year of weekly weights in a fresh
+            SQLite database: bulk inserts (2,000 users per transaction),
+            single upserts as /api/weights makes them, and 1-year history
+            queries; reports rows_per_sec and the query plan
+    client  POST /process then GET /dashboard through the Flask test client
+    server  the same flow over HTTP against a real server; without --url a
+            threaded Werkzeug server is started on a free local port
+    overload  --overload-concurrency clients flooding POST /process; reports
+            the latency of admitted requests and how many were shed (shed
+            clients wait out Retry-After). Run it with ADMISSION_ENABLED=0
+            for the unprotected baseline.
+    hydration  --events water log events from --concurrency threads over
+            --users users, written through the write-behind buffer and, for
+            comparison, one transaction per event; plus POST /api/water
+            through the Flask test client. Checks that every buffered
+            event reached the database after close().
+    slow    --slow-clients connections trickling a /process form over
+            --slow-seconds each, while --concurrency fast clients run the
+            client flow; run against the threaded Werkzeug server and the
+            ASGI entry point (asgi.py) in turn. Reports the fast clients'
+            throughput, latency and errors, the slow requests' statuses and
+            the process's peak thread count.
+    startup  --startup-runs fresh interpreters each importing the app and
+            answering POST /process and GET /dashboard through the test
+            client; reports import time, time to the first dashboard
+            response (the latencies) and peak RSS, with the compiled
+            template cache warm and empty
+    batch   the batch plan engine (validation plus metrics) over columns of
+            --batch-rows profiles, next to the single-profile path /process
+            uses; reports profiles_per_sec
+    instrumentation  the cost of one timed stage inside a request and of
+            a stage with no request, plus the client scenario run in
+            child processes with METRICS_ENABLED=1 and 0
+    fragments  GET /dashboard over HTTP for 64 plans with the rendered
+            fragment cache on and off, plus each fragment's render time on
+            a cache hit and with the cache off
+    assets  the static assets a dashboard page links to, fetched through
+            the test client as a browser would on a first and a repeat
+            visit (fresh cached copies are reused, others revalidated);
+            reports the bytes and requests of each. Build the assets
+            with `python assets.py` first to measure the pipeline.
+    stream  GET /dashboard over HTTP for a plan with --plan-scale times the
+            usual exercises, with streamed rendering on and off; reports
+            time to first byte (ttfb_*) next to the full response latency.
+
+Every simulated request carries its own X-Forwarded-For address, so the
+per-client rate limit doesn't throttle the benchmark itself.
+
+Each result reports throughput, p50/p95/p99 latency and peak memory; the
+end-to-end scenarios also report response and cookie sizes. compare exits
+with status 1 when a result regresses by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import http.client
+from urllib.parse import urlencode, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep benchmark runs away from the development database
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='fittrack-bench-'), 'bench.db'))
+
+# Rate limit simulated clients by their X-Forwarded-For address
+os.environ.setdefault('ADMISSION_TRUST_PROXY', '1')
+
+# Directory the app modules are imported from; --tree points it elsewhere
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = ('micro', 'exercises', 'startup', 'batch', 'database', 'client', 'instrumentation', 'server', 'fragments', 'overload', 'hydration', 'slow', 'assets', 'stream')
+
+# Metrics compared by `compare`, and whether higher values are better
+COMPARED_METRICS = {
+    'ops_per_sec': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'response_bytes': False,
+    'cookie_bytes': False
+}
+
+ACTIVITY_LEVELS = ('sedentary', 'light', 'moderate', 'active', 'very_active')
+
+
+def random_profile(rng):
+    """A valid form submission with values spread over the accepted ranges"""
+    return {
+        'age': str(rng.randint(18, 80)),
+        'weight': str(round(rng.uniform(45, 150), 1)),
+        'goal_weight': str(round(rng.uniform(45, 150), 1)),
+        'sex': rng.choice(('male', 'female')),
+        'height': str(rng.randint(150, 200)),
+        'activity_level': rng.choice(ACTIVITY_LEVELS)
+    }
+
+
+def client_address(index):
+    """A distinct client address for each simulated request"""
+    return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, **extra):
+    """Throughput and latency percentiles (ms) for a list of per-operation latencies"""
+    latencies = sorted(latencies)
+    result = {
+        'count': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    result.update(extra)
+    return result
+
+
+def peak_allocation(function, calls=50):
+    """Peak traced allocation (KiB) while calling function repeatedly"""
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            function()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def time_calls(function, iterations, batch=20, warmup=100):
+    """
+    Call function iterations times and summarize the per-call latencies.
+
+    Calls are timed in batches so the timer's own overhead doesn't swamp
+    functions that only take a microsecond or two.
+    """
+    for _ in range(warmup):
+        function()
+    latencies = []
+    clock = time.perf_counter
+    calls = range(batch)
+    start = clock()
+    for _ in range(max(1, iterations // batch)):
+        t = clock()
+        for _ in calls:
+            function()
+        latencies.append((clock() - t) / batch)
+    elapsed = (clock() - start) / batch
+    return summarize(latencies, elapsed, peak_alloc_kb=peak_allocation(function))
+
+
+def run_micro(args):
+    """Benchmark the recommendation helpers called directly"""
+    from exercise_data import get_exercise_recommendations, get_diet_recommendations, calculate_water_intake, MACRO_RATIOS
+    from meal_planner import plan_meals, solve_meal_portions
+    from plan_engine import load_numpy
+
+    rng = random.Random(args.seed)
+    profiles = [random_profile(rng) for _ in range(256)]
+    cases = [
+        (
+            float(p['goal_weight']) - float(p['weight']),
+            float(p['weight']) / (float(p['height']) / 100) ** 2,
+            p['sex'], int(p['age']), p['activity_level'], float(p['weight'])
+        )
+        for p in profiles
+    ]
+    goals = [('loss', 1800), ('gain', 2900), ('maintain', 2300)]
+
+    def exercises():
+        diff, bmi, sex, age, level, _ = rng.choice(cases)
+        get_exercise_recommendations(diff, bmi, sex, age, level, rng=rng)
+
+    def diet():
+        get_diet_recommendations(*rng.choice(goals))
+
+    def water():
+        case = rng.choice(cases)
+        calculate_water_intake(case[5], case[4])
+
+    meal_shares = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.30, 'snacks': 0.10}
+    meal_targets = [(rng.randint(1200, 4000), MACRO_RATIOS[goal]) for goal, _ in goals for _ in range(64)]
+
+    def meals():
+        calorie_target, ratios = rng.choice(meal_targets)
+        plan_meals(calorie_target, meal_shares, ratios)
+
+    np = load_numpy()
+    batch_calories = np.array([[rng.randint(1200, 4000)] for _ in range(args.batch_size)]) * [list(meal_shares.values())]
+    batch_ratios = np.array([MACRO_RATIOS[rng.choice(goals)[0]] for _ in range(args.batch_size)])
+
+    def meals_batch():
+        solve_meal_portions(batch_calories, batch_ratios)
+
+    batch = time_calls(meals_batch, max(1, args.iterations // 1000), batch=1, warmup=2)
+    batch['users_per_sec'] = round(batch['ops_per_sec'] * args.batch_size, 1)
+
+    return {
+        'micro.get_exercise_recommendations': time_calls(exercises, args.iterations),
+        'micro.get_diet_recommendations': time_calls(diet, args.iterations),
+        'micro.calculate_water_intake': time_calls(water, args.iterations),
+        'micro.plan_meals': time_calls(meals, args.iterations // 10),
+        'micro.solve_meal_portions_batch': batch
+    }
+
+
+def run_exercises(args):
+    """Benchmark get_exercise_recommendations over a fixed set of profiles"""
+    from exercise_data import get_exercise_recommendations
+
+    # weight change, BMI, sex, age and activity level: 60 combinations
+    cases = [
+        (diff, bmi, 'male', age, level)
+        for diff in (-5, 0, 5) for bmi in (22, 31) for age in (30, 60) for level in ACTIVITY_LEVELS
+    ]
+    cycle = iter(range(1 << 62))
+    random.seed(args.seed)
+
+    def exercises():
+        get_exercise_recommendations(*cases[next(cycle) % len(cases)])
+
+    return {'exercises.get_exercise_recommendations': time_calls(exercises, args.iterations)}
+
+
+def run_batch(args):
+    """Benchmark the batch plan engine at several batch sizes against the scalar path"""
+    from plan_engine import (
+        PROFILE_FIELDS, load_numpy, calculate_plan_metrics,
+        calculate_plan_metrics_batch, validate_profile, validate_profiles_batch
+    )
+
+    np = load_numpy()
+    generator = np.random.default_rng(args.seed)
+
+    def columns(rows):
+        return {
+            'age': generator.integers(18, 81, rows).astype(np.float64),
+            'weight': np.round(generator.uniform(45, 150, rows), 1),
+            'goal_weight': np.round(generator.uniform(45, 150, rows), 1),
+            'sex': generator.choice(np.array(['male', 'female'], dtype=object), rows),
+            'height': generator.integers(150, 201, rows).astype(np.float64),
+            'activity_level': generator.choice(np.array(ACTIVITY_LEVELS, dtype=object), rows)
+        }
+
+    results = {}
+    for rows in (int(size) for size in args.batch_rows.split(',')):
+        batch = columns(rows)
+
+        def engine():
+            valid, _ = validate_profiles_batch(batch)
+            calculate_plan_metrics_batch(*(batch[field][valid] for field in PROFILE_FIELDS))
+
+        # About a million profiles per size, and at least 3 timed calls
+        engine()
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(max(3, 1000000 // rows)):
+            t = time.perf_counter()
+            engine()
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        result = summarize(
+            latencies, elapsed, rows=rows, profiles_per_sec=round(len(latencies) * rows / elapsed, 1),
+            peak_alloc_kb=peak_allocation(engine, calls=1)
+        )
+        results[f'batch.engine_{rows}'] = result
+
+    sample = columns(256)
+    profiles = [dict(zip(PROFILE_FIELDS, row)) for row in zip(*(sample[field].tolist() for field in PROFILE_FIELDS))]
+    for profile in profiles:
+        profile['age'] = int(profile['age'])
+    cycle = iter(range(1 << 62))
+
+    def scalar():
+        profile = profiles[next(cycle) % len(profiles)]
+        if validate_profile(profile) is None:
+            calculate_plan_metrics(*(profile[field] for field in PROFILE_FIELDS))
+
+    result = time_calls(scalar, args.iterations)
+    result['profiles_per_sec'] = result['ops_per_sec']
+    results['batch.scalar'] = result
+    return results
+
+
+def run_database(args):
+    """Benchmark weight log writes and 1-year history reads at --db-users users"""
+    from datetime import date, timedelta
+    from models import Database, INSERT_USER, SELECT_WEIGHTS
+
+    db = Database(os.path.join(tempfile.mkdtemp(prefix='fittrack-bench-'), 'weights.db'))
+    db.connect()
+    today = date.today()
+    days = [(today - timedelta(weeks=week)).isoformat() for week in range(52, 0, -1)]
+    with db.transaction() as conn:
+        conn.executemany(INSERT_USER, ((today.isoformat(),) for _ in range(args.db_users)))
+
+    users_per_batch = 2000
+    latencies = []
+    start = time.perf_counter()
+    for first in range(1, args.db_users + 1, users_per_batch):
+        rows = [
+            (user_id, day, 80.0 - week * 0.1)
+            for user_id in range(first, min(first + users_per_batch, args.db_users + 1))
+            for week, day in enumerate(days)
+        ]
+        t = time.perf_counter()
+        db.log_weights(rows)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    rows_written = args.db_users * len(days)
+    results = {'database.bulk_insert': summarize(
+        latencies, elapsed, users=args.db_users, rows=rows_written, rows_per_sec=round(rows_written / elapsed, 1)
+    )}
+
+    rng = random.Random(args.seed)
+    results['database.log_weight'] = time_calls(
+        lambda: db.log_weight(rng.randint(1, args.db_users), 81.0, today), max(100, args.iterations // 10), batch=1
+    )
+
+    year_ago = today - timedelta(days=365)
+    results['database.weight_history_1y'] = time_calls(
+        lambda: db.weight_history(rng.randint(1, args.db_users), year_ago, today), max(100, args.iterations // 4), batch=1
+    )
+    with db.connection() as conn:
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + SELECT_WEIGHTS, (1, days[0], days[-1])).fetchall()
+    results['database.weight_history_1y']['query_plan'] = '; '.join(row[-1] for row in plan)
+    db.close()
+    return results
+
+
+def run_concurrent(flow, requests, concurrency):
+    """
+    Run flow(worker_state, index) requests times across concurrency threads.
+
+    Returns:
+        Tuple of (latencies, elapsed, errors)
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        state = {}
+        local = []
+        failed = 0
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            t = time.perf_counter()
+            try:
+                flow(state, index)
+            except Exception:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return latencies, time.perf_counter() - start, errors
+
+
+def run_client(args):
+    """Benchmark /process -> /dashboard through the Flask test client"""
+    from app import app
+
+    rng = random.Random(args.seed)
+    forms = [random_profile(rng) for _ in range(512)]
+    sizes = {}
+
+    def flow(state, index):
+        client = app.test_client()
+        response = client.post(
+            '/process', data=forms[index % len(forms)], headers={'X-Forwarded-For': client_address(index)}
+        )
+        if response.status_code != 302:
+            raise RuntimeError(f'/process returned {response.status_code}')
+        cookie = response.headers.get('Set-Cookie', '')
+        page = client.get('/dashboard')
+        if page.status_code != 200:
+            raise RuntimeError(f'/dashboard returned {page.status_code}')
+        sizes.setdefault('cookie_bytes', len(cookie))
+        sizes.setdefault('response_bytes', len(page.data))
+
+    run_concurrent(flow, min(50, args.requests), 1)
+    latencies, elapsed, errors = run_concurrent(flow, args.requests, args.concurrency)
+    return {
+        'client.process_dashboard': summarize(
+            latencies, elapsed, errors=errors, concurrency=args.concurrency, **sizes
+        )
+    }
+
+
+def run_instrumentation(args):
+    """Benchmark the per-stage timing and its effect on the client flow"""
+    from app import app, request_metrics
+
+    results = {}
+    stage = request_metrics.stage
+    results['instrumentation.stage_idle'] = time_calls(lambda: stage('bench').__exit__(), args.iterations)
+    with app.test_request_context():
+        request_metrics._start()
+
+        def timed():
+            with stage('bench'):
+                pass
+
+        results['instrumentation.stage_in_request'] = time_calls(timed, args.iterations)
+
+    # METRICS_ENABLED is read when the app is imported, so each setting
+    # runs the client scenario in its own process
+    for mode, enabled in (('enabled', '1'), ('disabled', '0')):
+        output = os.path.join(tempfile.mkdtemp(prefix='fittrack-bench-'), 'client.json')
+        command = [
+            sys.executable, os.path.abspath(__file__), 'run', '--scenarios', 'client', '--requests', str(args.requests),
+            '--concurrency', str(args.concurrency), '--seed', str(args.seed), '-o', output
+        ]
+        if args.tree:
+            command += ['--tree', args.tree]
+        subprocess.run(command, env=dict(os.environ, METRICS_ENABLED=enabled), check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            results[f'instrumentation.client_{mode}'] = json.load(f)['results']['client.process_dashboard']
+    return results
+
+
+def start_server():
+    """Start the app on a free local port in a background thread and return its URL"""
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def start_asgi_server():
+    """Start asgi.py's built-in server on a free local port in a background thread and return its URL"""
+    import asyncio
+    import asgi
+
+    loop = asyncio.new_event_loop()
+    server = asgi.HTTPServer(asgi.application)
+    _, port = loop.run_until_complete(server.start('127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    class Stopper:
+        def shutdown(self):
+            loop.call_soon_threadsafe(server.close)
+            loop.call_soon_threadsafe(loop.stop)
+
+    return f'http://127.0.0.1:{port}', Stopper()
+
+
+def run_server(args):
+    """Benchmark /process -> /dashboard over HTTP against a running server"""
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_server()
+    parts = urlsplit(url)
+
+    rng = random.Random(args.seed)
+    bodies = [urlencode(random_profile(rng)) for _ in range(512)]
+    sizes = {}
+
+    def flow(state, index):
+        # One keep-alive connection per worker thread
+        conn = state.get('conn')
+        if conn is None:
+            conn = state['conn'] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+
+        conn.request('POST', '/process', bodies[index % len(bodies)], {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-Forwarded-For': client_address(index)
+        })
+        response = conn.getresponse()
+        response.read()
+        cookie = response.getheader('Set-Cookie', '')
+        if response.status != 302:
+            raise RuntimeError(f'/process returned {response.status}')
+
+        conn.request('GET', '/dashboard', headers={'Cookie': cookie.split(';', 1)[0]})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(f'/dashboard returned {response.status}')
+        sizes.setdefault('cookie_bytes', len(cookie))
+        sizes.setdefault('response_bytes', len(body))
+
+    try:
+        run_concurrent(flow, min(50, args.requests), 1)
+        latencies, elapsed, errors = run_concurrent(flow, args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            server.shutdown()
+    return {
+        'server.process_dashboard': summarize(
+            latencies, elapsed, errors=errors, concurrency=args.concurrency, url=url, **sizes
+        )
+    }
+
+
+def run_fragments(args):
+    """Benchmark the dashboard and its fragments with the fragment cache on and off"""
+    import app as app_module
+
+    app = app_module.app
+    rng = random.Random(args.seed)
+    cookies = []
+    plans = []
+    for index in range(64):
+        client = app.test_client()
+        response = client.post('/process', data=random_profile(rng), headers={'X-Forwarded-For': client_address(index)})
+        cookies.append(response.headers['Set-Cookie'].split(';', 1)[0])
+        with client.session_transaction() as session:
+            plans.append(app_module.plan_store.load(session['plan_id']))
+
+    url, server = start_server()
+    parts = urlsplit(url)
+    cache = app_module.fragment_cache
+    enabled = cache.enabled
+    results = {}
+
+    def flow(state, index):
+        conn = state.get('conn')
+        if conn is None:
+            conn = state['conn'] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        conn.request('GET', '/dashboard', headers={'Cookie': cookies[index % len(cookies)]})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'/dashboard returned {response.status}')
+
+    try:
+        for mode, on in (('cached', True), ('uncached', False)):
+            cache.enabled = on
+            # The warm-up also fills the cache with every plan's fragments
+            run_concurrent(flow, max(len(cookies), min(200, args.requests)), 1)
+            latencies, elapsed, errors = run_concurrent(flow, args.requests, args.concurrency)
+            results[f'fragments.dashboard_{mode}'] = summarize(
+                latencies, elapsed, errors=errors, concurrency=args.concurrency
+            )
+
+            with app.test_request_context():
+                for name, render in app_module.DASHBOARD_FRAGMENTS.items():
+                    results[f'fragments.{name}_{mode}'] = time_calls(
+                        lambda: render(rng.choice(plans)), max(100, args.iterations // 10)
+                    )
+    finally:
+        cache.enabled = enabled
+        server.shutdown()
+    return results
+
+
+def start_slow_uploads(parts, bodies, clients, seconds, stop):
+    """
+    Start clients that each send a /process form a few bytes at a time.
+
+    Every client sends its form over the given seconds, then reads the
+    response, over and over until stop is set.
+
+    Returns:
+        Tuple of (thread running the clients, dict counting their response statuses)
+    """
+    import asyncio
+
+    statuses = {}
+
+    async def slow_client(index):
+        while not stop.is_set():
+            body = bodies[index % len(bodies)].encode()
+            try:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+                writer.write((
+                    f'POST /process HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                    f'Content-Type: application/x-www-form-urlencoded\r\n'
+                    f'Content-Length: {len(body)}\r\nX-Forwarded-For: {client_address(1 << 20 | index)}\r\n'
+                    f'Connection: close\r\n\r\n'
+                ).encode())
+                pieces = 8
+                step = -(-len(body) // pieces)
+                for offset in range(0, len(body), step):
+                    await asyncio.sleep(seconds / pieces)
+                    writer.write(body[offset:offset + step])
+                    await writer.drain()
+                # A server that answers before reading the whole body may
+                # not close the connection, so read by Content-Length
+                head = await reader.readuntil(b'\r\n\r\n')
+                status = head.split(b' ', 2)[1]
+                length = 0
+                for line in head.lower().split(b'\r\n'):
+                    if line.startswith(b'content-length:'):
+                        length = int(line.split(b':', 1)[1])
+                await reader.readexactly(length)
+                writer.close()
+                status = status.decode()
+            except (OSError, asyncio.IncompleteReadError):
+                status = 'error'
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def slow_clients():
+        await asyncio.gather(*(slow_client(index) for index in range(clients)))
+
+    thread = threading.Thread(target=lambda: asyncio.run(slow_clients()), daemon=True)
+    thread.start()
+    return thread, statuses
+
+
+def run_overload(args):
+    """
+    Flood POST /process and measure admitted latency and shedding.
+
+    The flood runs twice: on its own, and alongside --overload-slow-clients
+    connections trickling their forms in over --slow-seconds, which must
+    not take the concurrency slots from the flood while they upload.
+    """
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_server()
+    parts = urlsplit(url)
+
+    rng = random.Random(args.seed)
+    bodies = [urlencode(random_profile(rng)) for _ in range(512)]
+
+    def flood():
+        outcomes = []
+        lock = threading.Lock()
+
+        def flow(state, index):
+            conn = state.get('conn')
+            if conn is None:
+                conn = state['conn'] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            t = time.perf_counter()
+            conn.request('POST', '/process', bodies[index % len(bodies)], {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-Forwarded-For': client_address(index)
+            })
+            response = conn.getresponse()
+            response.read()
+            latency = time.perf_counter() - t
+            with lock:
+                outcomes.append((response.status, latency))
+            # Shed clients back off as told, like a well-behaved client would
+            retry_after = response.getheader('Retry-After')
+            if retry_after:
+                time.sleep(float(retry_after))
+
+        _, elapsed, errors = run_concurrent(flow, args.requests, args.overload_concurrency)
+        admitted = [latency for status, latency in outcomes if status == 302]
+        statuses = {}
+        for status, _ in outcomes:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return admitted, elapsed, errors, dict(
+            concurrency=args.overload_concurrency, shed=len(outcomes) - len(admitted), statuses=statuses,
+            all_p99_ms=round(percentile(sorted(latency for _, latency in outcomes), 0.99) * 1000, 4)
+        )
+
+    results = {}
+    stop = threading.Event()
+    try:
+        admitted, elapsed, errors, extra = flood()
+        results['overload.process'] = summarize(admitted, elapsed, errors=errors, **extra)
+
+        slow_thread, slow_statuses = start_slow_uploads(
+            parts, bodies, args.overload_slow_clients, args.slow_seconds, stop
+        )
+        # Let every slow connection get established before measuring
+        time.sleep(min(args.slow_seconds, 1.0))
+        try:
+            admitted, elapsed, errors, extra = flood()
+        finally:
+            stop.set()
+            slow_thread.join()
+        results['overload.process_slow_clients'] = summarize(
+            admitted, elapsed, errors=errors, slow_clients=args.overload_slow_clients,
+            slow_statuses=slow_statuses, **extra
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def run_slow(args):
+    """Fast client flows alongside many slow uploads, on the threaded and the ASGI server"""
+    rng = random.Random(args.seed)
+    bodies = [urlencode(random_profile(rng)) for _ in range(512)]
+    results = {}
+
+    for name, start in (('threaded', start_server), ('asgi', start_asgi_server)):
+        url, server = start()
+        parts = urlsplit(url)
+        stop = threading.Event()
+        peak_threads = threading.active_count()
+
+        def count_threads():
+            nonlocal peak_threads
+            while not stop.wait(0.05):
+                peak_threads = max(peak_threads, threading.active_count())
+
+        slow_thread, slow_statuses = start_slow_uploads(parts, bodies, args.slow_clients, args.slow_seconds, stop)
+        threading.Thread(target=count_threads, daemon=True).start()
+        # Let every slow connection get established before measuring
+        time.sleep(min(args.slow_seconds, 1.0))
+
+        # Why failed fast flows failed, e.g. {'/process 503': 2}: a 503 is a
+        # request shed by the server, not a broken one
+        failures = {}
+        lock = threading.Lock()
+
+        def fail(path, status):
+            key = f'{path} {status}'
+            with lock:
+                failures[key] = failures.get(key, 0) + 1
+            raise RuntimeError(f'{path} returned {status}')
+
+        def flow(state, index):
+            conn = state.get('conn')
+            if conn is None:
+                conn = state['conn'] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            conn.request('POST', '/process', bodies[index % len(bodies)], {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-Forwarded-For': client_address(index)
+            })
+            response = conn.getresponse()
+            response.read()
+            cookie = response.getheader('Set-Cookie', '')
+            if response.status != 302:
+                fail('/process', response.status)
+            conn.request('GET', '/dashboard', headers={'Cookie': cookie.split(';', 1)[0]})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                fail('/dashboard', response.status)
+
+        try:
+            latencies, elapsed, errors = run_concurrent(flow, args.requests, args.concurrency)
+        finally:
+            stop.set()
+            slow_thread.join()
+            server.shutdown()
+        results[f'slow.{name}'] = summarize(
+            latencies, elapsed, errors=errors, failures=failures, concurrency=args.concurrency,
+            slow_clients=args.slow_clients, slow_statuses=slow_statuses, peak_threads=peak_threads
+        )
+    return results
+
+
+def run_assets(args):
+    """Benchmark the bytes and requests a dashboard visit spends on static assets"""
+    import re
+    from app import app
+
+    client = app.test_client()
+    client.post('/process', data=random_profile(random.Random(args.seed)))
+    page = client.get('/dashboard').get_data(as_text=True)
+    urls = sorted(set(re.findall(r'(?:href|src)="(/static/[^"]+)"', page)))
+    accept = {'Accept-Encoding': 'gzip, br'}
+
+    def fresh(response):
+        # Whether a browser may reuse its copy without asking the server
+        cache_control = response.headers.get('Cache-Control', '')
+        match = re.search(r'max-age=(\d+)', cache_control)
+        return 'no-cache' not in cache_control and 'no-store' not in cache_control and bool(match) and int(match.group(1)) > 0
+
+    latencies = []
+    cached = {}
+    first_bytes = 0
+    for url in urls:
+        t = time.perf_counter()
+        response = client.get(url, headers=accept)
+        latencies.append(time.perf_counter() - t)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        first_bytes += len(response.data)
+        cached[url] = response
+
+    repeat_bytes = 0
+    repeat_requests = 0
+    for url, previous in cached.items():
+        if fresh(previous):
+            continue
+        headers = dict(accept)
+        if previous.headers.get('ETag'):
+            headers['If-None-Match'] = previous.headers['ETag']
+        if previous.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = previous.headers['Last-Modified']
+        response = client.get(url, headers=headers)
+        repeat_requests += 1
+        repeat_bytes += len(response.data)
+
+    elapsed = sum(latencies)
+    return {
+        'assets.dashboard_visit': summarize(
+            latencies, elapsed, assets=len(urls), first_visit_bytes=first_bytes,
+            repeat_visit_bytes=repeat_bytes, repeat_visit_requests=repeat_requests
+        )
+    }
+
+
+# Serves the app from a child process, so the benchmark's client threads
+# don't compete with the server for the GIL; prints the port once listening
+SERVER_PROCESS_CODE = '''
+import logging
+from werkzeug.serving import make_server
+from app import app
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+server = make_server('127.0.0.1', 0, app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+'''
+
+
+# Times a cold start of the app in a fresh interpreter and prints the
+# figures as JSON
+STARTUP_CODE = '''
+import json, time, resource
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+client.post('/process', data={
+    'age': '34', 'weight': '82.5', 'goal_weight': '74', 'sex': 'female', 'height': '168',
+    'activity_level': 'moderate'
+})
+response = client.get('/dashboard')
+response.get_data()
+answered = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import': imported - start, 'first_response': answered - start,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+'''
+
+
+def run_startup(args):
+    """Benchmark worker start-up: import time, first response and peak RSS"""
+    results = {}
+    for mode in ('warm', 'cold'):
+        runs = []
+        warm_dir = tempfile.mkdtemp(prefix='fittrack-bench-jinja-')
+        for index in range(args.startup_runs + (mode == 'warm')):
+            # Warm runs share a bytecode cache the first (untimed) run fills
+            cache_dir = warm_dir if mode == 'warm' else tempfile.mkdtemp(prefix='fittrack-bench-jinja-')
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_CODE], env=dict(os.environ, JINJA_CACHE_DIR=cache_dir),
+                cwd=APP_DIR, capture_output=True, text=True, check=True
+            ).stdout
+            if mode == 'cold' or index > 0:
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+        imports = sorted(run['import'] for run in runs)
+        results[f'startup.{mode}'] = summarize(
+            [run['first_response'] for run in runs], sum(run['first_response'] for run in runs),
+            import_p50_ms=round(percentile(imports, 0.50) * 1000, 1),
+            peak_rss_mb=round(max(run['rss_mb'] for run in runs), 1)
+        )
+    return results
+
+
+def start_server_process(env):
+    """Start the app in a threaded Werkzeug server in a child process and return its URL"""
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_PROCESS_CODE], env=dict(os.environ, **env),
+        cwd=APP_DIR, stdout=subprocess.PIPE, text=True
+    )
+    port = process.stdout.readline().strip()
+    if not port:
+        process.wait()
+        raise RuntimeError(f'server process exited with status {process.returncode}')
+    return f'http://127.0.0.1:{port}', process
+
+
+def run_stream(args):
+    """Time to first byte and total latency of a large dashboard, streamed and rendered whole"""
+    import app as app_module
+    from plan_store import SQLitePlanStore
+
+    app = app_module.app
+    client = app.test_client()
+    client.post('/process', data=random_profile(random.Random(args.seed)))
+    with client.session_transaction() as session:
+        user_id, plan_id = session['user_id'], session['plan_id']
+
+    # The same plan with --plan-scale times the exercises, saved where the
+    # server processes will look for it
+    plan = dict(app_module.plan_store.load(plan_id))
+    plan['exercises'] = dict(plan['exercises'], exercises=list(plan['exercises']['exercises']) * args.plan_scale)
+    plan.pop('etag', None)
+    plan['etag'] = app_module.plan_etag(plan)
+    plan_path = os.path.join(os.path.dirname(os.environ['DATABASE_PATH']), 'stream-plans.db')
+    store = SQLitePlanStore(plan_path)
+    large_id = store.save(plan)
+    store.close()
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie = app.config['SESSION_COOKIE_NAME'] + '=' + serializer.dumps({'user_id': user_id, 'plan_id': large_id})
+
+    results = {}
+    for mode, enabled in (('streamed', '1'), ('whole', '0')):
+        url, process = start_server_process({
+            'DASHBOARD_STREAMING': enabled, 'PLAN_STORE': 'sqlite', 'PLAN_STORE_PATH': plan_path,
+            'SESSION_SECRET': app.secret_key
+        })
+        parts = urlsplit(url)
+        sizes = {}
+        first_bytes = []
+        lock = threading.Lock()
+
+        def flow(state, index):
+            conn = state.get('conn')
+            if conn is None:
+                conn = state['conn'] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            t = time.perf_counter()
+            conn.request('GET', '/dashboard', headers={'Cookie': cookie})
+            response = conn.getresponse()
+            first = response.read1(65536)
+            ttfb = time.perf_counter() - t
+            body = first + response.read()
+            if response.status != 200:
+                raise RuntimeError(f'/dashboard returned {response.status}')
+            with lock:
+                first_bytes.append(ttfb)
+            sizes.setdefault('response_bytes', len(body))
+            sizes.setdefault('first_chunk_bytes', len(first))
+
+        try:
+            run_concurrent(flow, min(20, args.requests), 1)
+            first_bytes.clear()
+            latencies, elapsed, errors = run_concurrent(flow, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        first_bytes.sort()
+        results[f'stream.dashboard_{mode}'] = summarize(
+            latencies, elapsed, errors=errors, concurrency=args.concurrency, plan_scale=args.plan_scale,
+            ttfb_p50_ms=round(percentile(first_bytes, 0.50) * 1000, 4),
+            ttfb_p99_ms=round(percentile(first_bytes, 0.99) * 1000, 4),
+            cookie_bytes=len(cookie), **sizes
+        )
+    return results
+
+
+def run_hydration(args):
+    """Sustained water log events through the write-behind buffer, a write-through baseline and the API"""
+    from datetime import date
+    from app import app, db
+    from hydration import create_hydration_log
+
+    today = date.today()
+    users = [db.create_user() for _ in range(args.users)]
+
+    def events(log, count):
+        def flow(state, index):
+            log(users[index % len(users)], 250)
+        run_concurrent(flow, min(1000, count), 1)
+        latencies, elapsed, errors = run_concurrent(flow, count, args.concurrency)
+        return summarize(latencies, elapsed, errors=errors, concurrency=args.concurrency, users=args.users)
+
+    def logged_total():
+        with db.connection() as conn:
+            return conn.execute('SELECT COALESCE(SUM(ml), 0) FROM water_log').fetchone()[0]
+
+    before = logged_total()
+    hydration = create_hydration_log(db)
+    buffered = events(lambda user_id, ml: hydration.log(user_id, today, ml), args.events)
+    hydration.close()
+    written = logged_total() - before
+    expected = (min(1000, args.events) + args.events - buffered['errors']) * 250
+    if written != expected:
+        raise RuntimeError(f'buffered log wrote {written} ml, expected {expected}')
+
+    # One transaction per event is much slower, so it gets a tenth of the events
+    direct = events(
+        lambda user_id, ml: db.add_water([(user_id, today.isoformat(), ml)]), max(1, args.events // 10)
+    )
+
+    def api(state, index):
+        client = state.get('client')
+        if client is None:
+            client = state['client'] = app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = users[index % len(users)]
+        response = client.post('/api/water', json={'ml': 250})
+        if response.status_code != 201:
+            raise RuntimeError(f'/api/water returned {response.status_code}')
+
+    run_concurrent(api, min(50, args.requests), 1)
+    latencies, elapsed, errors = run_concurrent(api, args.requests, args.concurrency)
+    return {
+        'hydration.buffered': buffered,
+        'hydration.write_through': direct,
+        'hydration.api_log_water': summarize(latencies, elapsed, errors=errors, concurrency=args.concurrency)
+    }
+
+
+RUNNERS = {
+    'micro': run_micro, 'exercises': run_exercises, 'startup': run_startup,
+    'batch': run_batch, 'database': run_database,
+    'client': run_client, 'instrumentation': run_instrumentation, 'server': run_server,
+    'fragments': run_fragments, 'overload': run_overload,
+    'hydration': run_hydration, 'slow': run_slow, 'assets': run_assets, 'stream': run_stream
+}
+
+
+def git_commit():
+    """Commit of the benchmarked tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=APP_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    global APP_DIR
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit('Unknown scenario(s): ' + ', '.join(unknown))
+    if args.tree:
+        APP_DIR = os.path.abspath(args.tree)
+        sys.path.insert(0, APP_DIR)
+
+    results = {}
+    for name in scenarios:
+        print(f'running {name}...', file=sys.stderr)
+        results.update(RUNNERS[name](args))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'tree': APP_DIR,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'iterations': args.iterations,
+            'requests': args.requests,
+            'concurrency': args.concurrency
+        },
+        'results': results
+    }
+
+    for name, result in results.items():
+        line = f"{name:40} {result['ops_per_sec']:>10.1f} ops/s  p50 {result['p50_ms']:.3f}ms  " \
+               f"p95 {result['p95_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms"
+        if 'response_bytes' in result:
+            line += f"  {result['response_bytes']}B page  {result['cookie_bytes']}B cookie"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+
+def compare(args):
+    """Print the change of each shared metric and fail on regressions"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before = baseline[name].get(metric)
+            after = current[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = (change < -args.threshold) if higher_is_better else (change > args.threshold)
+            regressions += regressed
+            marker = '  REGRESSION' if regressed else ''
+            print(f'{name:40} {metric:15} {before:>12} -> {after:<12} {change:+7.1%}{marker}')
+
+    if regressions:
+        print(f'{regressions} regression(s) beyond {args.threshold:.0%}', file=sys.stderr)
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='FitTrack hot path benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks')
+    run_parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenarios')
+    run_parser.add_argument('--iterations', type=int, default=20000, help='calls per micro-benchmark')
+    run_parser.add_argument('--batch-size', type=int, default=10000, help='users per batched meal solve')
+    run_parser.add_argument('--startup-runs', type=int, default=5, help='fresh interpreters per startup mode')
+    run_parser.add_argument('--batch-rows', default='1000,100000,1000000', help='comma-separated batch engine sizes')
+    run_parser.add_argument('--db-users', type=int, default=100000, help='users in the database scenario')
+    run_parser.add_argument('--requests', type=int, default=1000, help='end-to-end flows per scenario')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='concurrent end-to-end clients')
+    run_parser.add_argument('--overload-concurrency', type=int, default=64, help='concurrent clients in the overload scenario')
+    run_parser.add_argument('--overload-slow-clients', type=int, default=16, help='slow uploads alongside the second overload flood')
+    run_parser.add_argument('--events', type=int, default=50000, help='water log events in the hydration scenario')
+    run_parser.add_argument('--users', type=int, default=1000, help='users logging water in the hydration scenario')
+    run_parser.add_argument('--slow-clients', type=int, default=256, help='slow connections in the slow scenario')
+    run_parser.add_argument('--slow-seconds', type=float, default=2.0, help='time each slow client takes to send its request')
+    run_parser.add_argument('--plan-scale', type=int, default=20, help='exercise multiplier of the stream scenario plan')
+    run_parser.add_argument('--url', help='benchmark this server instead of starting one')
+    run_parser.add_argument('--tree', help='import the app from this checkout (e.g. a worktree of an older commit)')
+    run_parser.add_argument('--seed', type=int, default=0, help='seed for the generated profiles')
+    run_parser.add_argument('-o', '--output', help='write results as JSON to this file')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative change')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Bulk plan generation: stream a CSV of profiles into plans.
+
+    python bulk.py profiles.csv -o plans.csv --rejects rejects.csv
+    python bulk.py profiles.csv -o plans.ndjson --format ndjson --workers 4
+
+The input needs a header with the profile columns (age, weight,
+goal_weight, sex, height, activity_level); other columns are ignored. Rows
+are read and processed in fixed-size chunks, so memory stays bounded no
+matter how large the file is. Rows that fail validation are written to the
+rejects file with their error instead of stopping the run.
+"""
+import io
+import os
+import sys
+import csv
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from plan_engine import (
+    PROFILE_FIELDS, load_numpy, profile_columns, validate_profiles_batch, calculate_plan_metrics_batch
+)
+
+# Computed columns written after the profile columns, in output order
+PLAN_COLUMNS = (
+    'bmi', 'tdee', 'water_intake', 'calorie_target', 'goal_type', 'weeks_to_goal',
+    'protein', 'fat', 'carbs'
+)
+
+NUMERIC_FIELDS = ('age', 'weight', 'goal_weight', 'height')
+
+OUTPUT_FORMATS = ('csv', 'ndjson')
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _parse_numeric(values, field, errors):
+    """
+    Parse one numeric column of raw strings into a float array.
+
+    Unparseable values become NaN and are recorded in errors, keyed by their
+    row index within the chunk.
+    """
+    np = load_numpy()
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        pass
+
+    # Slow path for chunks with bad values: parse row by row
+    parsed = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+        except ValueError:
+            parsed[i] = np.nan
+            errors.setdefault(i, f'{field} must be a number.')
+    return parsed
+
+
+def process_chunk(rows, indices, fmt='csv'):
+    """
+    Validate and compute plans for one chunk of CSV rows.
+
+    Args:
+        rows: List of raw CSV rows (lists of strings)
+        indices: Position of each PROFILE_FIELDS column in a row
+        fmt: Output format for the results, 'csv' or 'ndjson'
+
+    Returns:
+        Tuple of (results, rejects): results is the formatted output text
+        for the valid rows and rejects is a list of (row, error) pairs
+    """
+    np = load_numpy()
+    width = max(indices.values()) + 1
+    rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+
+    parse_errors = {}
+    raw = {field: [row[indices[field]].strip() for row in rows] for field in PROFILE_FIELDS}
+    for field in NUMERIC_FIELDS:
+        raw[field] = _parse_numeric(raw[field], field, parse_errors)
+    columns = profile_columns(raw)
+
+    valid, errors = validate_profiles_batch(columns)
+    # A parse error explains the NaN better than the range message it triggers
+    errors.update(parse_errors)
+    valid[list(parse_errors)] = False
+
+    selected = {field: columns[field][valid] for field in PROFILE_FIELDS}
+    selected['age'] = selected['age'].astype(np.int64)
+    metrics = calculate_plan_metrics_batch(*selected.values())
+
+    names = PROFILE_FIELDS + PLAN_COLUMNS
+    values = [selected[field].tolist() for field in PROFILE_FIELDS]
+    values += [metrics[column].tolist() for column in PLAN_COLUMNS]
+
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        csv.writer(buffer, lineterminator='\n').writerows(zip(*values))
+    else:
+        for record in zip(*values):
+            buffer.write(json.dumps(dict(zip(names, record)), separators=(',', ':')))
+            buffer.write('\n')
+
+    rejects = [(rows[i], errors[i]) for i in sorted(errors)]
+    return buffer.getvalue(), rejects
+
+
+def read_chunks(reader, chunk_size):
+    """Yield lists of up to chunk_size rows from a CSV reader"""
+    chunk = []
+    for row in reader:
+        if not row:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ordered_map(executor, function, chunks, window, *args):
+    """
+    Map function over chunks in a process pool, yielding results in order.
+
+    At most window chunks are in flight at once, so a fast reader can't
+    queue the whole file in memory ahead of the workers.
+    """
+    pending = []
+    for chunk in chunks:
+        pending.append((chunk, executor.submit(function, chunk, *args)))
+        if len(pending) >= window:
+            chunk, future = pending.pop(0)
+            yield chunk, future.result()
+    for chunk, future in pending:
+        yield chunk, future.result()
+
+
+def generate_plans(source, destination, rejects=None, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Stream profiles from a CSV file object into plans.
+
+    Args:
+        source: Text file object with a CSV header row
+        destination: Text file object for the plans (CSV or NDJSON)
+        rejects: Optional text file object for rows that failed validation;
+            written as CSV with the input header plus an error column
+        fmt: 'csv' or 'ndjson'
+        chunk_size: Number of rows processed per batch
+        workers: Number of worker processes (1 processes in-line)
+
+    Returns:
+        Dictionary with the number of rows read, written and rejected
+
+    Raises:
+        ValueError: If the format is unknown or the header lacks a profile column
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+    reader = csv.reader(source)
+    header = [name.strip() for name in next(reader, [])]
+    missing = [field for field in PROFILE_FIELDS if field not in header]
+    if missing:
+        raise ValueError('Missing column(s) in header: ' + ', '.join(missing))
+    indices = {field: header.index(field) for field in PROFILE_FIELDS}
+
+    if fmt == 'csv':
+        csv.writer(destination, lineterminator='\n').writerow(PROFILE_FIELDS + PLAN_COLUMNS)
+    reject_writer = None
+    if rejects is not None:
+        reject_writer = csv.writer(rejects, lineterminator='\n')
+        reject_writer.writerow(header + ['error'])
+
+    stats = {'read': 0, 'written': 0, 'rejected': 0}
+    chunks = read_chunks(reader, chunk_size)
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers)
+        results = _ordered_map(executor, process_chunk, chunks, 2 * workers, indices, fmt)
+    else:
+        executor = None
+        results = ((chunk, process_chunk(chunk, indices, fmt)) for chunk in chunks)
+
+    try:
+        for chunk, (output, rejected) in results:
+            destination.write(output)
+            if reject_writer is not None:
+                reject_writer.writerows(row + [error] for row, error in rejected)
+            stats['read'] += len(chunk)
+            stats['rejected'] += len(rejected)
+            stats['written'] += len(chunk) - len(rejected)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate plans for a CSV file of profiles.')
+    parser.add_argument('input', help="profiles CSV file ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="plans output file ('-' for stdout)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help='output format')
+    parser.add_argument('--rejects', help='CSV file for rows that fail validation')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows per batch')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help=f'worker processes (0 uses all {os.cpu_count()} CPUs)'
+    )
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count()
+    source = sys.stdin if args.input == '-' else open(args.input, newline='')
+    destination = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    rejects = open(args.rejects, 'w', newline='') if args.rejects else None
+    try:
+        stats = generate_plans(source, destination, rejects, args.format, args.chunk_size, workers)
+    except ValueError as e:
+        parser.exit(2, f"error: {e}\n")
+    finally:
+        for file in (source, destination, rejects):
+            if file not in (None, sys.stdin, sys.stdout):
+                file.close()
+
+    print(f"{stats['read']} rows read, {stats['written']} plans written, "
+          f"{stats['rejected']} rejected", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
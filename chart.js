@@ -4,41 +4,68 @@
  */
 
 // Progress Chart - to visualize weight progress over time
-function createProgressChart(currentWeight, goalWeight) {
+// projection (optional) is the server-side series: {weeks: [...], weights: [...]}
+// history (optional) is {url, start}: logged weights are fetched from url and
+// plotted against the projection, counting weeks from the plan's start date
+function createProgressChart(currentWeight, goalWeight, projection, history) {
     const ctx = document.getElementById('progressChart');
     
     if (!ctx) return; // Exit if canvas doesn't exist
     
-    const weightDiff = goalWeight - currentWeight;
-    const isWeightLoss = weightDiff < 0;
-    const absWeightDiff = Math.abs(weightDiff);
-    
-    // Generate future weight data points (weekly projections)
-    // Assuming 0.5kg/week weight change
-    const weeks = Math.ceil(absWeightDiff / 0.5);
     const labels = [];
     const data = [];
+    let xScale = {};
     
-    // Add current week
-    labels.push('Now');
-    data.push(currentWeight);
-    
-    // Generate future weeks
-    for (let i = 1; i <= weeks; i++) {
-        labels.push(`Week ${i}`);
-        const weeklyChange = isWeightLoss ? -0.5 : 0.5;
-        data.push(Math.round((currentWeight + (weeklyChange * i)) * 10) / 10);
+    if (projection && projection.weeks.length > 1) {
+        // Adaptive projection computed on the server, already downsampled.
+        // Points are placed on a linear week axis so logged weights can be
+        // drawn on the same scale.
+        projection.weeks.forEach((week, i) => {
+            data.push({ x: week, y: projection.weights[i] });
+        });
+        xScale = {
+            type: 'linear',
+            min: 0,
+            title: {
+                display: true,
+                text: 'Weeks'
+            },
+            ticks: {
+                callback: function(value) {
+                    return value === 0 ? 'Now' : `Week ${value}`;
+                }
+            }
+        };
+    } else {
+        const weightDiff = goalWeight - currentWeight;
+        const isWeightLoss = weightDiff < 0;
+        const absWeightDiff = Math.abs(weightDiff);
+        
+        // Generate future weight data points (weekly projections)
+        // Assuming 0.5kg/week weight change
+        const weeks = Math.ceil(absWeightDiff / 0.5);
+        
+        // Add current week
+        labels.push('Now');
+        data.push(currentWeight);
+        
+        // Generate future weeks
+        for (let i = 1; i <= weeks; i++) {
+            labels.push(`Week ${i}`);
+            const weeklyChange = isWeightLoss ? -0.5 : 0.5;
+            data.push(Math.round((currentWeight + (weeklyChange * i)) * 10) / 10);
+        }
+        
+        // Add goal
+        labels.push('Goal');
+        data.push(goalWeight);
     }
     
-    // Add goal
-    labels.push('Goal');
-    data.push(goalWeight);
-    
     // Chart colors
     const primaryColor = '#64b5f6';
     const secondaryColor = '#81c784';
     
-    new Chart(ctx, {
+    const chart = new Chart(ctx, {
         type: 'line',
         data: {
             labels: labels,
@@ -63,12 +90,13 @@ function createProgressChart(currentWeight, goalWeight) {
                 tooltip: {
                     callbacks: {
                         label: function(context) {
-                            return `Weight: ${context.raw}kg`;
+                            return `Weight: ${context.parsed.y}kg`;
                         }
                     }
                 }
             },
             scales: {
+                x: xScale,
                 y: {
                     title: {
                         display: true,
@@ -80,6 +108,43 @@ function createProgressChart(currentWeight, goalWeight) {
             }
         }
     });
+    
+    if (history && history.url && xScale.type === 'linear') {
+        addWeightHistory(chart, history.url, history.start);
+    }
+}
+
+// Overlay logged weights on the progress chart
+function addWeightHistory(chart, url, startDate) {
+    const start = Date.parse(startDate);
+    const msPerWeek = 7 * 24 * 60 * 60 * 1000;
+    
+    fetch(url, { credentials: 'same-origin' })
+        .then(response => response.ok ? response.json() : null)
+        .then(result => {
+            if (!result || result.entries.length === 0) return;
+            
+            const points = result.entries
+                .map(entry => ({
+                    x: Math.round((Date.parse(entry.date) - start) / msPerWeek * 10) / 10,
+                    y: entry.weight
+                }))
+                .filter(point => point.x >= 0);
+            if (points.length === 0) return;
+            
+            chart.data.datasets.push({
+                label: 'Logged Weight',
+                data: points,
+                borderColor: '#81c784',
+                backgroundColor: '#81c784',
+                pointRadius: 4,
+                showLine: true,
+                fill: false
+            });
+            chart.options.plugins.legend.display = true;
+            chart.update();
+        })
+        .catch(error => console.error('Could not load weight history:', error));
 }
 
 // Calorie Breakdown Chart
@@ -1,6 +1,229 @@
 import random
+from collections import namedtuple
+from types import MappingProxyType
 
-def get_exercise_recommendations(weight_diff, bmi, sex, age, activity_level):
+# Water intake multipliers by activity level
+WATER_ACTIVITY_FACTORS = {
+    'sedentary': 1.0,
+    'light': 1.1,
+    'moderate': 1.2,
+    'active': 1.3,
+    'very_active': 1.4
+}
+
+# Macronutrient split (protein, fat, carbs) as a share of daily calories
+MACRO_RATIOS = {
+    'loss': (0.35, 0.25, 0.40),
+    'gain': (0.30, 0.25, 0.45),
+    'maintain': (0.30, 0.30, 0.40)
+}
+
+# Exercise attribute flags, combined as a bitmask on each catalog record
+BEGINNER = 1        # Suitable for sedentary or lightly active users
+LOW_IMPACT = 2      # Preferred for older adults (50+)
+JOINT_FRIENDLY = 4  # Preferred for high BMI (30+)
+HIGH_IMPACT = 8     # Replaced for older adults and high BMI
+
+EXERCISE_CATEGORIES = ("cardio", "strength", "flexibility")
+
+# Immutable catalog record; fields is a read-only view of the dict returned
+# to templates, in display order and ending with the category
+Exercise = namedtuple("Exercise", ["name", "category", "flags", "fields"])
+
+
+def _exercise(category, flags, **fields):
+    """Build a catalog record from the exercise's display fields"""
+    fields["category"] = category
+    return Exercise(fields["name"], category, flags, MappingProxyType(fields))
+
+
+EXERCISE_CATALOG = (
+    _exercise(
+        "cardio", BEGINNER | LOW_IMPACT,
+        name="Brisk Walking",
+        description="A low-impact cardio exercise good for beginners.",
+        duration="30-45 minutes",
+        frequency="5-7 days per week",
+        intensity="Moderate",
+        calories_burned="150-300 calories",
+        image_url="https://images.unsplash.com/photo-1483721310020-03333e577078"
+    ),
+    _exercise(
+        "cardio", BEGINNER | LOW_IMPACT | JOINT_FRIENDLY,
+        name="Cycling",
+        description="Excellent low-impact cardio that strengthens lower body.",
+        duration="30-60 minutes",
+        frequency="3-5 days per week",
+        intensity="Moderate to High",
+        calories_burned="300-600 calories",
+        image_url="https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
+    ),
+    _exercise(
+        "cardio", BEGINNER | LOW_IMPACT | JOINT_FRIENDLY,
+        name="Swimming",
+        description="Full-body workout that's gentle on joints.",
+        duration="30-45 minutes",
+        frequency="2-4 days per week",
+        intensity="Moderate to High",
+        calories_burned="400-700 calories",
+        image_url="https://images.unsplash.com/photo-1464925257126-6450e871c667"
+    ),
+    _exercise(
+        "cardio", HIGH_IMPACT,
+        name="Running",
+        description="High-intensity cardio that burns calories efficiently.",
+        duration="20-40 minutes",
+        frequency="3-4 days per week",
+        intensity="High",
+        calories_burned="400-800 calories",
+        image_url="https://images.unsplash.com/photo-1518310383802-640c2de311b2"
+    ),
+    _exercise(
+        "cardio", HIGH_IMPACT,
+        name="Jumping Rope",
+        description="Simple but effective cardio workout.",
+        duration="15-30 minutes",
+        frequency="3-5 days per week",
+        intensity="High",
+        calories_burned="200-400 calories",
+        image_url="https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
+    ),
+    _exercise(
+        "strength", BEGINNER,
+        name="Bodyweight Squats",
+        description="Basic lower body exercise targeting quads, hamstrings and glutes.",
+        sets="3-4 sets",
+        reps="12-15 reps",
+        frequency="2-3 days per week",
+        intensity="Low to Moderate",
+        image_url="https://images.unsplash.com/photo-1518459031867-a89b944bffe4"
+    ),
+    _exercise(
+        "strength", BEGINNER,
+        name="Push-ups",
+        description="Classic upper body exercise for chest, shoulders and triceps.",
+        sets="3-4 sets",
+        reps="10-15 reps",
+        frequency="2-3 days per week",
+        intensity="Moderate",
+        image_url="https://images.unsplash.com/photo-1541534741688-6078c6bfb5c5"
+    ),
+    _exercise(
+        "strength", BEGINNER,
+        name="Planks",
+        description="Core strengthening isometric exercise.",
+        sets="3 sets",
+        reps="30-60 seconds",
+        frequency="3-4 days per week",
+        intensity="Moderate",
+        image_url="https://images.unsplash.com/photo-1518611012118-696072aa579a"
+    ),
+    _exercise(
+        "strength", 0,
+        name="Dumbbell Rows",
+        description="Upper back and bicep strengthening exercise.",
+        sets="3 sets",
+        reps="10-12 reps per side",
+        frequency="2 days per week",
+        intensity="Moderate",
+        image_url="https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
+    ),
+    _exercise(
+        "strength", 0,
+        name="Lunges",
+        description="Lower body exercise for balance and strength.",
+        sets="3 sets",
+        reps="10-12 reps per leg",
+        frequency="2-3 days per week",
+        intensity="Moderate",
+        image_url="https://images.unsplash.com/photo-1483721310020-03333e577078"
+    ),
+    _exercise(
+        "flexibility", 0,
+        name="Yoga",
+        description="Combines strength, flexibility and mindfulness.",
+        duration="20-60 minutes",
+        frequency="3-7 days per week",
+        intensity="Low to Moderate",
+        focus="Full body flexibility and relaxation",
+        image_url="https://images.unsplash.com/photo-1518611012118-696072aa579a"
+    ),
+    _exercise(
+        "flexibility", BEGINNER,
+        name="Dynamic Stretching",
+        description="Active stretches that prepare muscles for exercise.",
+        duration="5-10 minutes",
+        frequency="Before each workout",
+        intensity="Low",
+        focus="Warming up muscles and joints",
+        image_url="https://images.unsplash.com/photo-1541534741688-6078c6bfb5c5"
+    ),
+    _exercise(
+        "flexibility", BEGINNER,
+        name="Static Stretching",
+        description="Held stretches to improve flexibility.",
+        duration="10-15 minutes",
+        frequency="After workouts or daily",
+        intensity="Low",
+        focus="Improving range of motion",
+        image_url="https://images.unsplash.com/photo-1518459031867-a89b944bffe4"
+    )
+)
+
+
+def _build_exercise_index(catalog):
+    """Map (category, flag) to the matching records, in catalog order; flag 0 selects all"""
+    index = {}
+    for category in EXERCISE_CATEGORIES:
+        records = tuple(ex for ex in catalog if ex.category == category)
+        index[(category, 0)] = records
+        for flag in (BEGINNER, LOW_IMPACT, JOINT_FRIENDLY, HIGH_IMPACT):
+            index[(category, flag)] = tuple(ex for ex in records if ex.flags & flag)
+    return index
+
+
+EXERCISE_INDEX = _build_exercise_index(EXERCISE_CATALOG)
+
+# Number of exercises sampled per category: (cardio, strength, flexibility)
+BEGINNER_SAMPLE_SIZES = (2, 2, 1)
+GOAL_SAMPLE_SIZES = {
+    "weight_loss": (3, 2, 1),    # Prioritize cardio for weight loss
+    "weight_gain": (1, 3, 1),    # Prioritize strength for weight gain (muscle mass)
+    "maintenance": (2, 2, 1)     # Balanced approach for maintenance
+}
+
+WEEKLY_SCHEDULES = {
+    "weight_loss": {
+        "Monday": "Cardio (30-45 min) + Core Strength",
+        "Tuesday": "Strength Training (Full Body)",
+        "Wednesday": "Active Recovery (Walking or Light Cardio)",
+        "Thursday": "High-Intensity Cardio (20-30 min)",
+        "Friday": "Strength Training (Upper Body Focus)",
+        "Saturday": "Cardio (30-45 min) + Strength (Lower Body Focus)",
+        "Sunday": "Rest or Light Activity (Stretching/Yoga)"
+    },
+    "weight_gain": {
+        "Monday": "Strength Training (Upper Body)",
+        "Tuesday": "Light Cardio (20 min) + Core",
+        "Wednesday": "Strength Training (Lower Body)",
+        "Thursday": "Rest or Active Recovery",
+        "Friday": "Strength Training (Full Body)",
+        "Saturday": "Moderate Cardio + Flexibility",
+        "Sunday": "Rest"
+    },
+    "maintenance": {
+        "Monday": "Cardio (30 min) + Core",
+        "Tuesday": "Strength Training (Upper Body)",
+        "Wednesday": "Moderate Cardio or Active Recovery",
+        "Thursday": "Strength Training (Lower Body)",
+        "Friday": "Flexibility + Light Cardio",
+        "Saturday": "Mixed Workout (Cardio + Strength)",
+        "Sunday": "Rest or Light Activity"
+    }
+}
+
+
+def get_exercise_recommendations(weight_diff, bmi, sex, age, activity_level, rng=None):
     """
     Generate personalized exercise recommendations based on user data.
     
@@ -10,137 +233,14 @@ def get_exercise_recommendations(weight_diff, bmi, sex, age, activity_level):
         sex: 'male' or 'female'
         age: Age in years
         activity_level: User's activity level
+        rng: random.Random instance used for sampling; pass a seeded
+            instance for reproducible results (defaults to the global RNG)
         
     Returns:
         Dictionary containing recommended exercises
     """
-    
-    # Define exercise categories
-    cardio_exercises = [
-        {
-            "name": "Brisk Walking",
-            "description": "A low-impact cardio exercise good for beginners.",
-            "duration": "30-45 minutes",
-            "frequency": "5-7 days per week",
-            "intensity": "Moderate",
-            "calories_burned": "150-300 calories",
-            "image_url": "https://images.unsplash.com/photo-1483721310020-03333e577078"
-        },
-        {
-            "name": "Cycling",
-            "description": "Excellent low-impact cardio that strengthens lower body.",
-            "duration": "30-60 minutes",
-            "frequency": "3-5 days per week",
-            "intensity": "Moderate to High",
-            "calories_burned": "300-600 calories",
-            "image_url": "https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
-        },
-        {
-            "name": "Swimming",
-            "description": "Full-body workout that's gentle on joints.",
-            "duration": "30-45 minutes",
-            "frequency": "2-4 days per week",
-            "intensity": "Moderate to High",
-            "calories_burned": "400-700 calories",
-            "image_url": "https://images.unsplash.com/photo-1464925257126-6450e871c667"
-        },
-        {
-            "name": "Running",
-            "description": "High-intensity cardio that burns calories efficiently.",
-            "duration": "20-40 minutes",
-            "frequency": "3-4 days per week",
-            "intensity": "High",
-            "calories_burned": "400-800 calories",
-            "image_url": "https://images.unsplash.com/photo-1518310383802-640c2de311b2"
-        },
-        {
-            "name": "Jumping Rope",
-            "description": "Simple but effective cardio workout.",
-            "duration": "15-30 minutes",
-            "frequency": "3-5 days per week",
-            "intensity": "High",
-            "calories_burned": "200-400 calories",
-            "image_url": "https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
-        }
-    ]
-    
-    strength_exercises = [
-        {
-            "name": "Bodyweight Squats",
-            "description": "Basic lower body exercise targeting quads, hamstrings and glutes.",
-            "sets": "3-4 sets",
-            "reps": "12-15 reps",
-            "frequency": "2-3 days per week",
-            "intensity": "Low to Moderate",
-            "image_url": "https://images.unsplash.com/photo-1518459031867-a89b944bffe4"
-        },
-        {
-            "name": "Push-ups",
-            "description": "Classic upper body exercise for chest, shoulders and triceps.",
-            "sets": "3-4 sets",
-            "reps": "10-15 reps",
-            "frequency": "2-3 days per week",
-            "intensity": "Moderate",
-            "image_url": "https://images.unsplash.com/photo-1541534741688-6078c6bfb5c5"
-        },
-        {
-            "name": "Planks",
-            "description": "Core strengthening isometric exercise.",
-            "sets": "3 sets",
-            "reps": "30-60 seconds",
-            "frequency": "3-4 days per week",
-            "intensity": "Moderate",
-            "image_url": "https://images.unsplash.com/photo-1518611012118-696072aa579a"
-        },
-        {
-            "name": "Dumbbell Rows",
-            "description": "Upper back and bicep strengthening exercise.",
-            "sets": "3 sets",
-            "reps": "10-12 reps per side",
-            "frequency": "2 days per week",
-            "intensity": "Moderate",
-            "image_url": "https://images.unsplash.com/photo-1518644961665-ed172691aaa1"
-        },
-        {
-            "name": "Lunges",
-            "description": "Lower body exercise for balance and strength.",
-            "sets": "3 sets",
-            "reps": "10-12 reps per leg",
-            "frequency": "2-3 days per week",
-            "intensity": "Moderate",
-            "image_url": "https://images.unsplash.com/photo-1483721310020-03333e577078"
-        }
-    ]
-    
-    flexibility_exercises = [
-        {
-            "name": "Yoga",
-            "description": "Combines strength, flexibility and mindfulness.",
-            "duration": "20-60 minutes",
-            "frequency": "3-7 days per week",
-            "intensity": "Low to Moderate",
-            "focus": "Full body flexibility and relaxation",
-            "image_url": "https://images.unsplash.com/photo-1518611012118-696072aa579a"
-        },
-        {
-            "name": "Dynamic Stretching",
-            "description": "Active stretches that prepare muscles for exercise.",
-            "duration": "5-10 minutes",
-            "frequency": "Before each workout",
-            "intensity": "Low",
-            "focus": "Warming up muscles and joints",
-            "image_url": "https://images.unsplash.com/photo-1541534741688-6078c6bfb5c5"
-        },
-        {
-            "name": "Static Stretching",
-            "description": "Held stretches to improve flexibility.",
-            "duration": "10-15 minutes",
-            "frequency": "After workouts or daily",
-            "intensity": "Low",
-            "focus": "Improving range of motion",
-            "image_url": "https://images.unsplash.com/photo-1518459031867-a89b944bffe4"
-        }
-    ]
+    if rng is None:
+        rng = random
     
     # Determine goal type
     if weight_diff < 0:
@@ -150,97 +250,40 @@ def get_exercise_recommendations(weight_diff, bmi, sex, age, activity_level):
     else:
         goal_type = "maintenance"
     
-    # Tailor exercise recommendations based on user data
-    recommendations = {"cardio": [], "strength": [], "flexibility": []}
-    
-    # For beginners (based on activity level)
+    # Beginners (based on activity level) choose from the beginner-friendly
+    # subset of every category; everyone else from the full catalog
     if activity_level in ['sedentary', 'light']:
-        beginner_cardio = [ex for ex in cardio_exercises if ex["name"] in ["Brisk Walking", "Swimming", "Cycling"]]
-        beginner_strength = [ex for ex in strength_exercises if ex["name"] in ["Bodyweight Squats", "Push-ups", "Planks"]]
-        beginner_flexibility = [ex for ex in flexibility_exercises if ex["name"] in ["Static Stretching", "Dynamic Stretching"]]
-        
-        recommendations["cardio"] = random.sample(beginner_cardio, min(2, len(beginner_cardio)))
-        recommendations["strength"] = random.sample(beginner_strength, min(2, len(beginner_strength)))
-        recommendations["flexibility"] = random.sample(beginner_flexibility, min(1, len(beginner_flexibility)))
-    
-    # For intermediate/advanced (based on activity level)
+        pool_flag = BEGINNER
+        sample_sizes = BEGINNER_SAMPLE_SIZES
     else:
-        if goal_type == "weight_loss":
-            # Prioritize cardio for weight loss
-            recommendations["cardio"] = random.sample(cardio_exercises, min(3, len(cardio_exercises)))
-            recommendations["strength"] = random.sample(strength_exercises, min(2, len(strength_exercises)))
-        elif goal_type == "weight_gain":
-            # Prioritize strength for weight gain (muscle mass)
-            recommendations["cardio"] = random.sample(cardio_exercises, min(1, len(cardio_exercises)))
-            recommendations["strength"] = random.sample(strength_exercises, min(3, len(strength_exercises)))
-        else:
-            # Balanced approach for maintenance
-            recommendations["cardio"] = random.sample(cardio_exercises, min(2, len(cardio_exercises)))
-            recommendations["strength"] = random.sample(strength_exercises, min(2, len(strength_exercises)))
-        
-        recommendations["flexibility"] = random.sample(flexibility_exercises, min(1, len(flexibility_exercises)))
+        pool_flag = 0
+        sample_sizes = GOAL_SAMPLE_SIZES[goal_type]
     
-    # Special considerations
-    # For older adults (50+), add more low-impact options
-    if age > 50:
-        # Replace high-impact with low-impact options
-        for i, exercise in enumerate(recommendations["cardio"]):
-            if exercise["name"] == "Running" or exercise["name"] == "Jumping Rope":
-                low_impact = [ex for ex in cardio_exercises if ex["name"] in ["Brisk Walking", "Swimming", "Cycling"]]
-                if low_impact:
-                    recommendations["cardio"][i] = random.choice(low_impact)
+    recommendations = {}
+    for category, size in zip(EXERCISE_CATEGORIES, sample_sizes):
+        pool = EXERCISE_INDEX[(category, pool_flag)]
+        recommendations[category] = rng.sample(pool, min(size, len(pool)))
     
-    # For high BMI, focus on joint-friendly exercises
-    if bmi > 30:
-        # Replace high-impact with low-impact options
-        for i, exercise in enumerate(recommendations["cardio"]):
-            if exercise["name"] == "Running" or exercise["name"] == "Jumping Rope":
-                joint_friendly = [ex for ex in cardio_exercises if ex["name"] in ["Swimming", "Cycling"]]
-                if joint_friendly:
-                    recommendations["cardio"][i] = random.choice(joint_friendly)
+    # Special considerations: replace high-impact cardio with low-impact
+    # options for older adults (50+) and joint-friendly ones for high BMI
+    cardio = recommendations["cardio"]
+    for condition, replacement_flag in ((age > 50, LOW_IMPACT), (bmi > 30, JOINT_FRIENDLY)):
+        if condition:
+            for i, exercise in enumerate(cardio):
+                if exercise.flags & HIGH_IMPACT:
+                    cardio[i] = rng.choice(EXERCISE_INDEX[("cardio", replacement_flag)])
     
-    # Flatten the recommendations for easier use in templates
-    flattened_recommendations = []
-    for category, exercises in recommendations.items():
-        for exercise in exercises:
-            exercise["category"] = category
-            flattened_recommendations.append(exercise)
-    
-    # Add weekly schedule recommendation
-    if goal_type == "weight_loss":
-        schedule = {
-            "Monday": "Cardio (30-45 min) + Core Strength",
-            "Tuesday": "Strength Training (Full Body)",
-            "Wednesday": "Active Recovery (Walking or Light Cardio)",
-            "Thursday": "High-Intensity Cardio (20-30 min)",
-            "Friday": "Strength Training (Upper Body Focus)",
-            "Saturday": "Cardio (30-45 min) + Strength (Lower Body Focus)",
-            "Sunday": "Rest or Light Activity (Stretching/Yoga)"
-        }
-    elif goal_type == "weight_gain":
-        schedule = {
-            "Monday": "Strength Training (Upper Body)",
-            "Tuesday": "Light Cardio (20 min) + Core",
-            "Wednesday": "Strength Training (Lower Body)",
-            "Thursday": "Rest or Active Recovery",
-            "Friday": "Strength Training (Full Body)",
-            "Saturday": "Moderate Cardio + Flexibility",
-            "Sunday": "Rest"
-        }
-    else:  # maintenance
-        schedule = {
-            "Monday": "Cardio (30 min) + Core",
-            "Tuesday": "Strength Training (Upper Body)",
-            "Wednesday": "Moderate Cardio or Active Recovery",
-            "Thursday": "Strength Training (Lower Body)",
-            "Friday": "Flexibility + Light Cardio",
-            "Saturday": "Mixed Workout (Cardio + Strength)",
-            "Sunday": "Rest or Light Activity"
-        }
+    # Flatten the recommendations for easier use in templates; each caller
+    # gets fresh dicts so the catalog itself is never modified
+    flattened_recommendations = [
+        exercise.fields.copy()
+        for category in EXERCISE_CATEGORIES
+        for exercise in recommendations[category]
+    ]
     
     return {
         "exercises": flattened_recommendations,
-        "schedule": schedule
+        "schedule": WEEKLY_SCHEDULES[goal_type].copy()
     }
 
 
@@ -259,15 +302,7 @@ def calculate_water_intake(weight, activity_level):
     base_intake = weight * 35
     
     # Adjust for activity level
-    activity_factors = {
-        'sedentary': 1.0,
-        'light': 1.1,
-        'moderate': 1.2,
-        'active': 1.3,
-        'very_active': 1.4
-    }
-    
-    adjusted_intake = base_intake * activity_factors[activity_level]
+    adjusted_intake = base_intake * WATER_ACTIVITY_FACTORS[activity_level]
     
     # Convert to liters and round to 1 decimal place
     return round(adjusted_intake / 1000, 1)
@@ -285,18 +320,7 @@ def get_diet_recommendations(goal_type, calorie_target):
         Dictionary containing diet recommendations
     """
     # Define macronutrient ratios based on goal
-    if goal_type == 'loss':
-        protein_ratio = 0.35  # 35% protein
-        fat_ratio = 0.25      # 25% fat
-        carb_ratio = 0.40     # 40% carbs
-    elif goal_type == 'gain':
-        protein_ratio = 0.30  # 30% protein
-        fat_ratio = 0.25      # 25% fat
-        carb_ratio = 0.45     # 45% carbs
-    else:  # maintain
-        protein_ratio = 0.30  # 30% protein
-        fat_ratio = 0.30      # 30% fat
-        carb_ratio = 0.40     # 40% carbs
+    protein_ratio, fat_ratio, carb_ratio = MACRO_RATIOS.get(goal_type, MACRO_RATIOS['maintain'])
     
     # Calculate macros in grams
     protein_calories = calorie_target * protein_ratio
@@ -374,13 +398,15 @@ def get_diet_recommendations(goal_type, calorie_target):
         ]
     }
     
-    # Example meals based on goal
-    meal_examples = {
-        'breakfast': get_meal_example('breakfast', goal_type),
-        'lunch': get_meal_example('lunch', goal_type),
-        'dinner': get_meal_example('dinner', goal_type),
-        'snacks': get_meal_example('snacks', goal_type)
-    }
+    # Portions that hit each meal's calories and the goal's macro ratios.
+    # Imported here because meal_planner depends on plan_engine, which
+    # imports this module.
+    from meal_planner import plan_meals
+    meal_plans = plan_meals(
+        calorie_target,
+        {meal: data['portion'] for meal, data in meal_structure.items()},
+        (protein_ratio, fat_ratio, carb_ratio)
+    )
     
     # Nutrition tips based on goal
     if goal_type == 'loss':
@@ -419,32 +445,6 @@ def get_diet_recommendations(goal_type, calorie_target):
         },
         'meal_structure': meal_structure,
         'food_recommendations': food_recommendations,
-        'meal_examples': meal_examples,
+        'meal_plans': meal_plans,
         'tips': tips
-    }
-
-
-def get_meal_example(meal_type, goal_type):
-    """Helper function to get example meals based on meal type and goal"""
-    examples = {
-        'loss': {
-            'breakfast': 'Greek yogurt with berries and a tablespoon of chia seeds',
-            'lunch': 'Grilled chicken salad with mixed greens, cherry tomatoes, cucumber, and light vinaigrette',
-            'dinner': 'Baked salmon with steamed broccoli and a small portion of quinoa',
-            'snacks': 'Apple slices with a tablespoon of natural almond butter'
-        },
-        'gain': {
-            'breakfast': 'Oatmeal made with milk, topped with banana, nuts, and a scoop of protein powder',
-            'lunch': 'Turkey and avocado sandwich on whole grain bread with a side of sweet potato wedges',
-            'dinner': 'Lean steak with roasted vegetables and brown rice',
-            'snacks': 'Protein smoothie with milk, banana, peanut butter, and protein powder'
-        },
-        'maintain': {
-            'breakfast': 'Two eggs with whole grain toast and half an avocado',
-            'lunch': 'Tuna wrap with mixed vegetables and a side of fruit',
-            'dinner': 'Stir-fried chicken and vegetables with a moderate portion of brown rice',
-            'snacks': 'A small handful of mixed nuts and a piece of fruit'
-        }
-    }
-    
-    return examples[goal_type][meal_type]
\ No newline at end of file
+    }
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+from types import MappingProxyType
+from flask import current_app, render_template
+from markupsafe import Markup
+from plan_cache import LRUCache
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered template fragments.
+
+    Fragments are keyed by template name and a hash of the context they are
+    rendered with, so any change to the inputs renders a new entry instead
+    of serving stale HTML. Fragment templates must only use the context
+    passed to render() (no session, request or flashed messages).
+    """
+
+    def __init__(self, maxsize=1024):
+        self.enabled = maxsize > 0
+        self._cache = LRUCache(maxsize)
+        self._digests = LRUCache(maxsize)
+
+    def _digest(self, value):
+        """Hash of a context value's content"""
+        # Frozen plan components (see plan_cache.freeze) are shared and never
+        # modified, so their digest is memoized by identity. The entry keeps
+        # a reference to the value so its id can't be reused while cached.
+        if isinstance(value, MappingProxyType):
+            cached_value, digest = self._digests.get_or_create(
+                id(value), lambda: (value, self._hash(value))
+            )
+            if cached_value is value:
+                return digest
+        return self._hash(value)
+
+    @staticmethod
+    def _hash(value):
+        payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=dict)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def render(self, template_name, **context):
+        """Render template_name with context, reusing a cached result if possible"""
+        # Templates can change on disk when auto-reload is on, so skip caching
+        if not self.enabled or current_app.jinja_env.auto_reload:
+            return Markup(render_template(template_name, **context))
+
+        key = (template_name,) + tuple(
+            (name, self._digest(value)) for name, value in sorted(context.items())
+        )
+        return self._cache.get_or_create(
+            key,
+            lambda: Markup(render_template(template_name, **context))
+        )
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def create_fragment_cache():
+    """Build the fragment cache; FRAGMENT_CACHE_SIZE=0 disables it"""
+    return FragmentCache(int(os.environ.get('FRAGMENT_CACHE_SIZE', 1024)))
@@ -0,0 +1,165 @@
+import os
+import time
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger('fittrack.hydration')
+
+
+class HydrationLog:
+    """
+    Water intake logging with a write-behind buffer.
+
+    log() only adds the amount to an in-memory pending total for the
+    (user, day) and returns the day's progress; a background thread writes
+    the pending totals to the database in one batched transaction when
+    flush_size days have pending amounts or flush_interval seconds have
+    passed, so a burst of taps costs one row per user per flush rather
+    than one transaction each.
+
+    A day's progress is its committed total, loaded from the database once
+    and then kept current by each flush, plus whatever is still pending.
+    Committed totals are reloaded after refresh_interval seconds so amounts
+    logged through other workers show up. close() writes out everything
+    pending and runs at interpreter exit; the pre-forking server calls it
+    before a worker exits, so a graceful shutdown loses nothing.
+    """
+
+    def __init__(self, db, flush_size=256, flush_interval=1.0, refresh_interval=30.0, registry=None):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.registry = registry
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+        if registry is not None:
+            registry.describe('fittrack_hydration_events_total', 'counter', 'Water intake events logged')
+            registry.describe('fittrack_hydration_flushes_total', 'counter', 'Batched water log writes, by outcome')
+            registry.gauge_callback(
+                'fittrack_hydration_pending', 'Days with water intake not yet written to the database',
+                lambda: {(): len(self._pending)}
+            )
+
+    def _reset(self):
+        # A forked worker starts with no buffer or flusher of its own; the
+        # parent's pending amounts are the parent's to write
+        self._pending = {}
+        self._committed = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def log(self, user_id, day, ml):
+        """
+        Record ml of water for a user's day.
+
+        Returns:
+            The day's total in ml, including amounts not yet written
+        """
+        key = (user_id, day.isoformat())
+        committed = self._committed_total(key, day)
+        with self._lock:
+            pending = self._pending[key] = self._pending.get(key, 0) + ml
+            # Read under the lock so a flush can't move amounts between the two
+            committed = self._committed.get(key, (committed,))[0]
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='hydration-flush', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.flush_size:
+                self._wake.set()
+        if self.registry is not None:
+            self.registry.inc('fittrack_hydration_events_total')
+        if self._closed:
+            self.flush()
+        return committed + pending
+
+    def total(self, user_id, day):
+        """The day's total in ml, including amounts not yet written"""
+        key = (user_id, day.isoformat())
+        committed = self._committed_total(key, day)
+        with self._lock:
+            return self._committed.get(key, (committed,))[0] + self._pending.get(key, 0)
+
+    def _committed_total(self, key, day):
+        with self._lock:
+            cached = self._committed.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.refresh_interval:
+            return cached[0]
+        # Loads wait for any flush in progress, so a total is never read
+        # between a batch's commit and its amounts moving out of pending
+        with self._flush_lock:
+            total = self.db.water_total(key[0], day)
+            with self._lock:
+                self._committed[key] = (total, time.monotonic())
+        return total
+
+    def flush(self):
+        """Write every pending amount in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self.db.add_water([(user_id, day, ml) for (user_id, day), ml in batch.items()])
+            except Exception:
+                logger.exception("Failed to write %d water log rows; keeping them pending", len(batch))
+                with self._lock:
+                    for key, ml in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + ml
+                if self.registry is not None:
+                    self.registry.inc('fittrack_hydration_flushes_total', (('outcome', 'error'),))
+                return 0
+
+            now = time.monotonic()
+            with self._lock:
+                for key, ml in batch.items():
+                    cached = self._committed.get(key)
+                    if cached is not None:
+                        self._committed[key] = (cached[0] + ml, cached[1])
+                # Stale totals would be reloaded anyway; dropping them keeps
+                # the cache to the users active recently
+                stale = [key for key, (_, loaded) in self._committed.items() if now - loaded >= self.refresh_interval]
+                for key in stale:
+                    del self._committed[key]
+        if self.registry is not None:
+            self.registry.inc('fittrack_hydration_flushes_total', (('outcome', 'ok'),))
+        return len(batch)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write out everything still pending"""
+        self._closed = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+
+def create_hydration_log(db, registry=None):
+    """
+    Build the water intake log from the environment.
+
+    HYDRATION_FLUSH_SIZE (days with pending amounts) and
+    HYDRATION_FLUSH_INTERVAL (seconds) trigger a batched write, whichever
+    comes first; HYDRATION_REFRESH_INTERVAL (seconds) bounds how stale a
+    day's committed total may be before it is reloaded.
+    """
+    return HydrationLog(
+        db,
+        flush_size=int(os.environ.get('HYDRATION_FLUSH_SIZE', 256)),
+        flush_interval=float(os.environ.get('HYDRATION_FLUSH_INTERVAL', 1.0)),
+        refresh_interval=float(os.environ.get('HYDRATION_REFRESH_INTERVAL', 30.0)),
+        registry=registry
+    )
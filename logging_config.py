@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+
+# Defaults per environment (FITTRACK_ENV); LOG_LEVEL, LOG_FORMAT,
+# ACCESS_LOG_SAMPLE and LOG_LEVELS override them. In development Werkzeug's
+# own request lines stay on and the structured access log is off; in
+# production a sample of requests gets a structured line instead.
+ENVIRONMENT_DEFAULTS = {
+    'development': {'level': 'DEBUG', 'format': 'text', 'access_sample': 0.0, 'werkzeug': 'INFO'},
+    'production': {'level': 'INFO', 'format': 'json', 'access_sample': 0.1, 'werkzeug': 'WARNING'}
+}
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+access_logger = logging.getLogger('fittrack.access')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed with extra="""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks or formats on the logging thread.
+
+    Records are enqueued as they are and formatted by the listener thread.
+    If the writer falls so far behind that the queue is full, records are
+    dropped (and counted) rather than stalling requests.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """Root queue handler plus the background listener that writes records out"""
+
+    def __init__(self, output, queue_size):
+        self.output = output
+        self.queue_size = queue_size
+        self.handler = _DroppingQueueHandler(queue.Queue(queue_size))
+        self.listener = None
+
+    def start(self):
+        self.listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _after_fork(self):
+        # Only the forking thread survives in the child, so the listener is
+        # gone and the queue's lock may have been held by it; start over
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = None
+        self.start()
+
+
+_pipeline = None
+
+
+def _environment_defaults():
+    return ENVIRONMENT_DEFAULTS.get(os.environ.get('FITTRACK_ENV', 'development'), ENVIRONMENT_DEFAULTS['development'])
+
+
+def _parse_levels(spec):
+    """Parse 'name=LEVEL,name=LEVEL' into a dict"""
+    levels = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Environment:
+        FITTRACK_ENV: 'development' (default) or 'production', selecting
+            the defaults in ENVIRONMENT_DEFAULTS
+        LOG_LEVEL: Root level
+        LOG_LEVELS: Per-logger levels, e.g. 'werkzeug=INFO,app=DEBUG'
+        LOG_FORMAT: 'text' or 'json'
+        LOG_FILE: Write to this file instead of stderr
+        LOG_QUEUE_SIZE: Records buffered before new ones are dropped
+
+    Calling it again is a no-op, so both the app and the launcher can call
+    it. The pipeline restarts itself in forked workers.
+
+    Returns:
+        The LoggingPipeline
+    """
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+
+    defaults = _environment_defaults()
+    log_file = os.environ.get('LOG_FILE')
+    output = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMAT', defaults['format']) == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    pipeline = LoggingPipeline(output, int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(pipeline.handler)
+    root.setLevel(os.environ.get('LOG_LEVEL', defaults['level']).upper())
+
+    levels = {'werkzeug': defaults['werkzeug']}
+    levels.update(_parse_levels(os.environ.get('LOG_LEVELS', '')))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    pipeline.start()
+    os.register_at_fork(after_in_child=pipeline._after_fork)
+    atexit.register(pipeline.stop)
+    _pipeline = pipeline
+    return pipeline
+
+
+def shutdown_logging():
+    """Write out queued records; call before os._exit(), which skips atexit"""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def init_access_log(app):
+    """
+    Log one structured line per request to the fittrack.access logger.
+
+    A random ACCESS_LOG_SAMPLE fraction of requests is logged; server
+    errors are always logged.
+    """
+    sample = float(os.environ.get('ACCESS_LOG_SAMPLE', _environment_defaults()['access_sample']))
+    if sample <= 0:
+        return
+
+    @app.before_request
+    def start_access_timer():
+        g.access_start = time.perf_counter()
+
+    @app.after_request
+    def log_access(response):
+        if (response.status_code >= 500 or random.random() < sample) and access_logger.isEnabledFor(logging.INFO):
+            start = g.get('access_start')
+            access_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3) if start else None,
+                    'remote_addr': request.remote_addr,
+                    'sampled': sample
+                }
+            )
+        return response
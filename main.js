@@ -109,36 +109,54 @@ function showAlert(message, type = 'error') {
 }
 
 /**
- * Initialize water tracker visualization
+ * Initialize water tracker: show today's logged intake against the
+ * recommendation and log a glass on each button press
  */
 function initWaterTracker() {
     const waterFill = document.querySelector('.water-fill');
     const waterPercentage = document.querySelector('.water-percentage');
     const recommendedIntake = parseFloat(document.getElementById('recommended-water').dataset.liters);
+    const logButton = document.getElementById('log-water');
+    const url = document.querySelector('.water-tracker').dataset.url;
     
-    if (waterFill && waterPercentage && recommendedIntake) {
-        // Animate water fill from 0 to recommended value
-        let currentIntake = 0;
-        const animationDuration = 1500; // ms
-        const steps = 50;
-        const increment = recommendedIntake / steps;
-        const stepTime = animationDuration / steps;
-        
-        const animation = setInterval(() => {
-            currentIntake += increment;
-            
-            if (currentIntake >= recommendedIntake) {
-                currentIntake = recommendedIntake;
-                clearInterval(animation);
-            }
-            
-            // Update water fill height (80% max to leave some space at top of glass)
-            const fillPercentage = (currentIntake / recommendedIntake) * 80;
-            waterFill.style.height = fillPercentage + '%';
-            
-            // Update percentage text
-            waterPercentage.textContent = currentIntake.toFixed(1) + 'L';
-        }, stepTime);
+    if (!waterFill || !waterPercentage || !recommendedIntake) {
+        return;
+    }
+    
+    function showIntake(data) {
+        const liters = data.ml / 1000;
+        const target = data.target_ml ? data.target_ml / 1000 : recommendedIntake;
+        // 80% max to leave some space at top of glass; the fill's CSS
+        // transition animates the change
+        const fillPercentage = Math.min(liters / target, 1) * 80;
+        waterFill.style.height = fillPercentage + '%';
+        waterPercentage.textContent = liters.toFixed(2) + 'L';
+    }
+    
+    fetch(url, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.ok ? response.json() : null)
+        .then(data => data && showIntake(data))
+        .catch(() => {});
+    
+    if (logButton) {
+        logButton.addEventListener('click', function() {
+            logButton.disabled = true;
+            fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ml: parseInt(logButton.dataset.ml, 10) })
+            })
+                .then(response => response.json().then(data => {
+                    if (!response.ok) {
+                        throw new Error(data.error);
+                    }
+                    showIntake(data);
+                }))
+                .catch(error => showAlert(error.message || 'Could not log water, please try again.'))
+                .finally(() => {
+                    logButton.disabled = false;
+                });
+        });
     }
 }
 
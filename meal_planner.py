@@ -0,0 +1,201 @@
+from plan_engine import load_numpy
+
+# Nutrient table for every food in the diet recommendations:
+# (name, typical serving in grams, kcal, protein, fat, carbs per 100 g)
+FOODS = (
+    ('Chicken Breast', 120, 165, 31.0, 3.6, 0.0),
+    ('Greek Yogurt', 170, 59, 10.0, 0.4, 3.6),
+    ('Eggs', 100, 143, 12.6, 9.5, 0.7),
+    ('Tofu', 150, 144, 17.3, 8.7, 2.8),
+    ('Fish', 150, 105, 22.8, 0.9, 0.0),
+    ('Brown Rice', 150, 123, 2.7, 1.0, 25.6),
+    ('Sweet Potatoes', 150, 90, 2.0, 0.2, 20.7),
+    ('Quinoa', 150, 120, 4.4, 1.9, 21.3),
+    ('Oats', 40, 379, 13.2, 6.5, 67.7),
+    ('Whole Grain Bread', 60, 252, 12.5, 3.5, 42.7),
+    ('Avocado', 70, 160, 2.0, 14.7, 8.5),
+    ('Nuts', 30, 607, 20.0, 54.0, 21.0),
+    ('Olive Oil', 10, 884, 0.0, 100.0, 0.0),
+    ('Chia Seeds', 15, 486, 16.5, 30.7, 42.1),
+    ('Fatty Fish', 120, 206, 22.1, 12.4, 0.0),
+    ('Leafy Greens', 60, 23, 2.9, 0.4, 3.6),
+    ('Broccoli', 90, 34, 2.8, 0.4, 6.6),
+    ('Bell Peppers', 90, 31, 1.0, 0.3, 6.0),
+    ('Cauliflower', 100, 25, 1.9, 0.3, 5.0),
+    ('Zucchini', 100, 17, 1.2, 0.3, 3.1),
+    ('Berries', 100, 57, 0.7, 0.3, 14.5),
+    ('Apples', 150, 52, 0.3, 0.2, 13.8),
+    ('Citrus Fruits', 130, 47, 0.9, 0.1, 11.8),
+    ('Bananas', 120, 89, 1.1, 0.3, 22.8),
+    ('Pears', 150, 57, 0.4, 0.1, 15.2)
+)
+
+FOOD_INDEX = {food[0]: i for i, food in enumerate(FOODS)}
+
+# Foods composed into each meal of the daily meal structure. Every meal
+# lists the same number of foods so all meals are solved as one array.
+MEAL_FOODS = {
+    'breakfast': ('Oats', 'Greek Yogurt', 'Eggs', 'Berries', 'Chia Seeds'),
+    'lunch': ('Chicken Breast', 'Brown Rice', 'Avocado', 'Leafy Greens', 'Bell Peppers'),
+    'dinner': ('Fish', 'Quinoa', 'Olive Oil', 'Broccoli', 'Sweet Potatoes'),
+    'snacks': ('Greek Yogurt', 'Nuts', 'Apples', 'Bananas', 'Whole Grain Bread')
+}
+
+MEALS = tuple(MEAL_FOODS)
+
+# How strongly portions are pulled towards the meal's typical servings
+# (scaled to the meal's calories). The macro targets alone leave a meal of
+# five foods underdetermined; a weak pull picks the most ordinary-looking
+# plate among the portion sets that hit them.
+SERVING_WEIGHT = 0.05
+
+# Portions are reported to the nearest PORTION_STEP grams
+PORTION_STEP = 5
+
+_solver = None
+
+
+def _build_solver():
+    """
+    Precompute the per-meal least-squares operators for every active set.
+
+    The fit for one meal has four target rows in kcal (total, protein, fat,
+    carbs) plus one serving-prior row per food. With five foods there are
+    only 32 possible sets of non-zero portions, so non-negative least
+    squares is solved exactly by taking the unconstrained solution on each
+    set and keeping the feasible one with the smallest residual. The
+    pseudo-inverses for those sets depend only on the food table, so they
+    are computed once and a solve is a few array products.
+    """
+    np = load_numpy()
+    table = np.array([food[1:] for food in FOODS], dtype=np.float64)
+    per_gram = table[:, 1:] / 100
+    # kcal, protein kcal, fat kcal, carb kcal per gram
+    nutrients = per_gram * np.array([1, 4, 9, 4])
+
+    indices = np.array([[FOOD_INDEX[name] for name in MEAL_FOODS[meal]] for meal in MEALS])
+    meals, foods = indices.shape
+    weight = np.sqrt(SERVING_WEIGHT)
+
+    # (meals, rows, foods): nutrient rows then the serving-prior rows, which
+    # measure portion differences in kcal so every row has the same units
+    design = np.zeros((meals, 4 + foods, foods))
+    for m in range(meals):
+        design[m, :4] = nutrients[indices[m]].T
+        design[m, 4:] = np.diag(weight * nutrients[indices[m], 0])
+
+    servings = table[indices, 0]
+    serving_kcal = servings * nutrients[indices, 0]
+    # Typical servings scaled to 1 kcal of meal
+    prior = servings / serving_kcal.sum(axis=1, keepdims=True)
+
+    supports = ((np.arange(1, 2 ** foods)[:, None] >> np.arange(foods)) & 1).astype(bool)
+    operators = np.zeros((meals, foods, len(supports), 4 + foods))
+    for m in range(meals):
+        for s, support in enumerate(supports):
+            operators[m, support, s] = np.linalg.pinv(design[m][:, support])
+
+    return {
+        'design': design,
+        # (meals, rows, foods * sets): one product with a meal's target rows
+        # gives the portions for every active set, laid out food-major so
+        # the feasibility checks below read contiguous memory
+        'operators': np.ascontiguousarray(
+            operators.reshape(meals, foods * len(supports), 4 + foods).transpose(0, 2, 1)
+        ),
+        'sets': len(supports),
+        'prior_rows': weight * prior * nutrients[indices, 0],
+        'indices': indices,
+        'nutrients': nutrients
+    }
+
+
+def load_solver():
+    """Build the solver tables on first use and return them"""
+    global _solver
+    if _solver is None:
+        _solver = _build_solver()
+    return _solver
+
+
+def solve_meal_portions(meal_calories, ratios):
+    """
+    Fit food portions for many meals at once.
+
+    Args:
+        meal_calories: (n, meals) calorie target of each meal in MEALS order
+        ratios: (n, 3) protein, fat and carb share of calories
+
+    Returns:
+        (n, meals, foods) portions in grams, foods in MEAL_FOODS order
+    """
+    np = load_numpy()
+    solver = load_solver()
+
+    meal_calories = np.asarray(meal_calories, dtype=np.float64)
+    ratios = np.asarray(ratios, dtype=np.float64)
+
+    # Target rows, (n, meals, 4 + foods)
+    targets = np.concatenate([
+        meal_calories[:, :, None],
+        meal_calories[:, :, None] * ratios[:, None, :],
+        meal_calories[:, :, None] * solver['prior_rows'][None]
+    ], axis=2)
+
+    by_meal = targets.transpose(1, 0, 2)
+    meals, count, _ = by_meal.shape
+    foods = len(MEAL_FOODS[MEALS[0]])
+
+    # Least-squares portions on every active set, (meals, n, foods, sets)
+    portions = np.matmul(by_meal, solver['operators']).reshape(meals, count, foods, solver['sets'])
+
+    # A least-squares residual is orthogonal to the fit, so its squared norm
+    # is |b|^2 - (A^T b).x, which avoids forming A x for every set
+    projected = np.matmul(by_meal, solver['design'])
+    residual = (by_meal ** 2).sum(axis=2)[:, :, None] - np.matmul(projected[:, :, None, :], portions)[:, :, 0]
+
+    # Sets whose solution has a negative portion are infeasible
+    infeasible = portions[:, :, 0] < -1e-9
+    for food in range(1, foods):
+        infeasible |= portions[:, :, food] < -1e-9
+    residual[infeasible] = np.inf
+
+    best = residual.argmin(axis=2)
+    chosen = np.take_along_axis(portions, best[:, :, None, None], axis=3)[:, :, :, 0]
+    return np.maximum(chosen, 0).transpose(1, 0, 2)
+
+
+def plan_meals(calorie_target, meal_shares, ratios):
+    """
+    Portion plan for each meal of one user.
+
+    Args:
+        calorie_target: Daily calorie target
+        meal_shares: Mapping of meal name to its share of daily calories
+        ratios: (protein, fat, carbs) share of calories
+
+    Returns:
+        Dictionary mapping each meal to its foods (name and grams) and the
+        calories and macro grams those rounded portions add up to
+    """
+    np = load_numpy()
+    grams = solve_meal_portions(
+        [[calorie_target * meal_shares[meal] for meal in MEALS]], [ratios]
+    )[0]
+    grams = np.rint(grams / PORTION_STEP) * PORTION_STEP
+
+    solver = load_solver()
+    plans = {}
+    for m, meal in enumerate(MEALS):
+        totals = (grams[m] @ solver['nutrients'][solver['indices'][m]]).tolist()
+        plans[meal] = {
+            'foods': [
+                {'name': name, 'grams': int(amount)}
+                for name, amount in zip(MEAL_FOODS[meal], grams[m].tolist()) if amount > 0
+            ],
+            'calories': round(totals[0]),
+            'protein': round(totals[1] / 4),
+            'fat': round(totals[2] / 9),
+            'carbs': round(totals[3] / 4)
+        }
+    return plans
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import atexit
+import random
+import logging
+import threading
+import tracemalloc
+
+logger = logging.getLogger('fittrack.memory_profile')
+
+# Allocations made by the profiler itself are left out of the sites
+_IGNORED = frozenset((tracemalloc.__file__, __file__))
+
+# Directory of the app's modules; sites inside it are reported by relative path
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def _site(traceback):
+    """'file:line' of each frame of an allocation, most recent first"""
+    return ' <- '.join(
+        '{}:{}'.format(frame.filename[len(_ROOT):] if frame.filename.startswith(_ROOT) else frame.filename, frame.lineno)
+        for frame in reversed(traceback)
+    )
+
+
+class _Measurement:
+    """Traced memory at the start of a request or stage, and the highest level seen since"""
+
+    __slots__ = ('name', 'start', 'peak', 'overhead', 'snapshot')
+
+    def __init__(self, name, start, overhead, snapshot):
+        self.name = name
+        self.start = start
+        self.peak = start
+        self.overhead = overhead
+        self.snapshot = snapshot
+
+
+class ProfiledRequest:
+    """
+    Allocation measurements of one sampled request.
+
+    Each stage records its allocated bytes (the peak of traced memory above
+    its starting level, so short-lived objects count), its retained bytes
+    (what is still allocated when it ends) and the sites of the retained
+    allocations, from a snapshot diff. Stages may nest. Memory the
+    measurements themselves keep is subtracted from the figures.
+    """
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.stages = []
+        self._overhead = 0
+        self._open = [_Measurement('total', tracemalloc.get_traced_memory()[0], 0, tracemalloc.take_snapshot())]
+        tracemalloc.reset_peak()
+
+    def _track_peak(self):
+        # Stages reset the tracer's peak, so each open measurement keeps
+        # its own high-water mark
+        current, peak = tracemalloc.get_traced_memory()
+        for measurement in self._open:
+            measurement.peak = max(measurement.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name):
+        current = self._track_peak()
+        self._open.append(_Measurement(name, current, self._overhead, tracemalloc.take_snapshot()))
+        tracemalloc.reset_peak()
+        self._overhead += tracemalloc.get_traced_memory()[0] - current
+
+    def exit(self):
+        """Close the innermost open stage; the last exit closes the request itself ('total')"""
+        current = self._track_peak()
+        measurement = self._open.pop()
+        overhead = self._overhead - measurement.overhead
+        key_type = 'traceback' if self.profiler.frames > 1 else 'lineno'
+        # Snapshot.filter_traces() matches each trace with fnmatch, which
+        # costs more than the diff; the profiler's own sites are dropped here
+        stats = [
+            stat for stat in tracemalloc.take_snapshot().compare_to(measurement.snapshot, key_type)
+            if stat.size_diff > 0 and stat.traceback[-1].filename not in _IGNORED
+        ]
+        sites = [(_site(stat.traceback), stat.size_diff, stat.count_diff) for stat in stats[:self.profiler.top]]
+        self.stages.append((
+            measurement.name, max(0, measurement.peak - measurement.start - overhead),
+            current - measurement.start - overhead, sites
+        ))
+        del stats
+        # Comparing snapshots is the profiler's own work, not the stage's
+        tracemalloc.reset_peak()
+        self._overhead += tracemalloc.get_traced_memory()[0] - current
+
+
+class _ProfiledStage:
+    """Context manager recording a stage's allocations around the wrapped stage timer"""
+
+    __slots__ = ('stage', 'sample', 'name')
+
+    def __init__(self, stage, sample, name):
+        self.stage = stage
+        self.sample = sample
+        self.name = name
+
+    def __enter__(self):
+        self.sample.enter(self.name)
+        self.stage.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stage.__exit__(*exc_info)
+        self.sample.exit()
+
+
+class _RouteStage:
+    """Aggregated allocations of one stage of one route"""
+
+    __slots__ = ('samples', 'allocated', 'allocated_max', 'retained', 'sites')
+
+    def __init__(self):
+        self.samples = 0
+        self.allocated = 0
+        self.allocated_max = 0
+        self.retained = 0
+        self.sites = {}
+
+    def add(self, allocated, retained, sites):
+        self.samples += 1
+        self.allocated += allocated
+        self.allocated_max = max(self.allocated_max, allocated)
+        self.retained += retained
+        for site, size, count in sites:
+            total_size, total_count = self.sites.get(site, (0, 0))
+            self.sites[site] = (total_size + size, total_count + count)
+
+    def summary(self, top):
+        sites = sorted(self.sites.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            'samples': self.samples,
+            'allocated_bytes_avg': round(self.allocated / self.samples),
+            'allocated_bytes_max': self.allocated_max,
+            'retained_bytes_avg': round(self.retained / self.samples),
+            'top_sites': [
+                {'site': site, 'bytes_avg': round(size / self.samples), 'blocks_avg': round(count / self.samples, 2)}
+                for site, (size, count) in sites
+            ]
+        }
+
+
+class AllocationProfiler:
+    """
+    Sampled tracemalloc profiling of requests, aggregated per route and stage.
+
+    RequestMetrics asks sample() at the start of each request; a sampled
+    request turns tracing on, so unsampled traffic runs at full speed
+    whenever no sampled request is in flight. Every stage of a sampled
+    request (the `with request_metrics.stage(...)` blocks and session
+    saving) and the request as a whole (stage 'total') are measured by
+    ProfiledRequest, and record() folds the results into per-route
+    aggregates: average and maximum allocated bytes, average retained
+    bytes and the allocation sites retaining the most memory.
+
+    Figures are exact on the pre-forking server, which handles one request
+    at a time per worker. With a threaded server, allocations of requests
+    running alongside a sampled one are counted in its figures. Streamed
+    dashboard bodies render after the request is closed and aren't
+    measured. Sampled requests are slower, and so are their Server-Timing
+    stage durations, because of the snapshots.
+
+    The report is served by /admin/memory-profile (to MEMORY_PROFILE_TOKEN
+    holders, or local clients when no token is set) and, when dump_path is
+    set, written there every dump_interval seconds and when the worker
+    exits; '{pid}' in dump_path is replaced by the worker's process ID.
+    """
+
+    def __init__(self, sample_rate=0.01, top=10, frames=1, dump_path=None, dump_interval=60.0, enabled=True):
+        self.sample_rate = sample_rate
+        self.top = top
+        self.frames = frames
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.enabled = enabled
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        if enabled and dump_path:
+            atexit.register(self._dump_at_exit)
+
+    def _reset(self):
+        # A forked worker profiles its own requests from scratch
+        self._routes = {}
+        self._sampled = 0
+        self._active = 0
+        self._tracing = False
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def sample(self):
+        """
+        Decide whether to profile the request that is starting.
+
+        Returns:
+            A ProfiledRequest, or None if the request isn't sampled
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            # Tracing started elsewhere (PYTHONTRACEMALLOC, a benchmark) is
+            # used as it is and left running
+            if self._active == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._tracing = True
+            self._active += 1
+        return ProfiledRequest(self)
+
+    def stage(self, stage, sample, name):
+        """Wrap a stage timer so the stage's allocations are measured too"""
+        return _ProfiledStage(stage, sample, name)
+
+    def record(self, sample, route):
+        """Close a sampled request and add its measurements to the route's aggregates"""
+        sample.exit()
+        with self._lock:
+            self._active -= 1
+            if self._active == 0 and self._tracing:
+                # Stopping drops every trace, so the next sampled request
+                # starts from a clean slate
+                tracemalloc.stop()
+                self._tracing = False
+            stages = self._routes.setdefault(route, {})
+            for name, allocated, retained, sites in sample.stages:
+                stats = stages.get(name)
+                if stats is None:
+                    stats = stages[name] = _RouteStage()
+                stats.add(allocated, retained, sites)
+            self._sampled += 1
+            due = bool(self.dump_path) and time.monotonic() - self._last_dump >= self.dump_interval
+            if due:
+                self._last_dump = time.monotonic()
+        if due:
+            self.dump()
+
+    def report(self):
+        """Aggregated allocations per route and stage, as a JSON-serializable dict"""
+        with self._lock:
+            routes = {
+                route: {name: stats.summary(self.top) for name, stats in stages.items()}
+                for route, stages in sorted(self._routes.items())
+            }
+            sampled = self._sampled
+        return {
+            'enabled': self.enabled,
+            'pid': os.getpid(),
+            'sample_rate': self.sample_rate,
+            'frames': self.frames,
+            'sampled_requests': sampled,
+            'routes': routes
+        }
+
+    def clear(self):
+        with self._lock:
+            self._routes = {}
+            self._sampled = 0
+
+    def _dump_at_exit(self):
+        # The pre-forking master serves nothing, so it has nothing to write
+        if self._sampled:
+            self.dump()
+
+    def dump(self):
+        """Write the report to dump_path, replacing the previous one"""
+        if not self.dump_path:
+            return
+        path = self.dump_path.replace('{pid}', str(os.getpid()))
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            logger.exception("Failed to write the memory profile to %s", path)
+
+
+def create_allocation_profiler():
+    """
+    Build the allocation profiler from the environment.
+
+    MEMORY_PROFILE=1 turns it on. MEMORY_PROFILE_SAMPLE_RATE is the share
+    of requests profiled, MEMORY_PROFILE_TOP the number of allocation sites
+    kept per stage and MEMORY_PROFILE_FRAMES the stack depth recorded per
+    allocation. MEMORY_PROFILE_PATH, if set, is where the report is dumped
+    every MEMORY_PROFILE_DUMP_INTERVAL seconds.
+    """
+    return AllocationProfiler(
+        sample_rate=float(os.environ.get('MEMORY_PROFILE_SAMPLE_RATE', 0.01)),
+        top=int(os.environ.get('MEMORY_PROFILE_TOP', 10)),
+        frames=int(os.environ.get('MEMORY_PROFILE_FRAMES', 1)),
+        dump_path=os.environ.get('MEMORY_PROFILE_PATH') or None,
+        dump_interval=float(os.environ.get('MEMORY_PROFILE_DUMP_INTERVAL', 60)),
+        enabled=os.environ.get('MEMORY_PROFILE', '0') == '1'
+    )
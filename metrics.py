@@ -0,0 +1,274 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from flask import request
+from flask.sessions import SecureCookieSessionInterface
+
+# Histogram bucket upper bounds: seconds for latencies, bytes for payload sizes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, sum, count)"""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, histograms and callback gauges.
+
+    Metrics are identified by name plus a tuple of (label, value) pairs and
+    rendered in the Prometheus text exposition format. Counts are per
+    process; with several workers each one reports its own.
+    """
+
+    def __init__(self):
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        histogram.observe(value)
+
+    def gauge_callback(self, name, help_text, callback):
+        """
+        Register a gauge read at scrape time.
+
+        callback() returns a mapping of label tuples to values.
+        """
+        self.describe(name, 'gauge', help_text)
+        self._gauges.append((name, callback))
+
+    def render(self):
+        """Render every metric in the Prometheus text format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+            described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for (name, labels), histogram in histograms:
+            header(name)
+            cumulative, total, count = histogram.snapshot()
+            bounds = [_format_number(bound) for bound in histogram.buckets] + ['+Inf']
+            for bound, value in zip(bounds, cumulative):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {value}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for name, callback in self._gauges:
+            header(name)
+            for labels, value in sorted(callback().items()):
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Stage:
+    """Context manager appending (name, seconds) to the request's stage timings"""
+
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.append((self.name, time.perf_counter() - self.start))
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+# (start time, stage timings, profiled request or None) of the request
+# being handled. A context variable is much cheaper to read than flask.g,
+# which matters for a lookup made on every stage.
+_current = ContextVar('fittrack_request_timings', default=None)
+
+
+class RequestMetrics:
+    """
+    Per-stage request timing for a Flask app.
+
+    Views wrap their stages in `with request_metrics.stage('name'):`. Every
+    response then gets a Server-Timing header with each stage and the
+    total, and the durations feed per-route histograms in the registry.
+    Session serialization is timed too, together with the size of the
+    session cookie it produces. With a profiler (see memory_profile), the
+    requests it samples also have their stages' allocations measured.
+    """
+
+    def __init__(self, registry=None, enabled=True, profiler=None):
+        self.registry = registry or MetricsRegistry()
+        self.enabled = enabled
+        self.profiler = profiler
+        self.registry.describe('fittrack_requests_total', 'counter', 'Requests handled, by route, method and status')
+        self.registry.describe('fittrack_request_seconds', 'histogram', 'Request latency by route')
+        self.registry.describe('fittrack_stage_seconds', 'histogram', 'Time spent in each request stage')
+        self.registry.describe('fittrack_session_bytes', 'histogram', 'Size of the session cookie written')
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.teardown_request(self._close)
+        app.session_interface = _TimedSessionInterface(self)
+
+    def stage(self, name):
+        """Time a block as a named stage of the current request"""
+        current = _current.get()
+        if current is None:
+            return _NULL_STAGE
+        if current[2] is not None:
+            return self.profiler.stage(_Stage(current[1], name), current[2], name)
+        return _Stage(current[1], name)
+
+    def _start(self):
+        sample = self.profiler.sample() if self.profiler is not None else None
+        _current.set((time.perf_counter(), [], sample))
+
+    def _close(self, exc):
+        # A request whose session is never saved (one the ASGI handlers
+        # turn into a 503 or 500 themselves) is only closed here; a sampled
+        # one must still be recorded, or tracing would stay on
+        current = _current.get()
+        if current is None:
+            return
+        _current.set(None)
+        if current[2] is not None:
+            self.profiler.record(current[2], request.endpoint or 'unmatched')
+
+    def finish(self, response):
+        """Record the request's timings and add the Server-Timing header"""
+        current = _current.get()
+        if current is None:
+            return
+        _current.set(None)
+        start, timings, sample = current
+        total = time.perf_counter() - start
+        route = request.endpoint or 'unmatched'
+        registry = self.registry
+        if sample is not None:
+            self.profiler.record(sample, route)
+
+        entries = []
+        for name, seconds in timings:
+            registry.observe('fittrack_stage_seconds', (('route', route), ('stage', name)), seconds)
+            entries.append(f'{name};dur={seconds * 1000:.3f}')
+        entries.append(f'total;dur={total * 1000:.3f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+
+        registry.observe('fittrack_request_seconds', (('route', route),), total)
+        registry.inc('fittrack_requests_total', (
+            ('route', route), ('method', request.method), ('status', str(response.status_code))
+        ))
+
+
+class _TimedSessionInterface(SecureCookieSessionInterface):
+    # Saving the session is the last step of Flask's response processing,
+    # after every after_request handler, so it also closes the request's timings
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def save_session(self, app, session, response):
+        if _current.get() is None:
+            return super().save_session(app, session, response)
+
+        with self.metrics.stage('session'):
+            super().save_session(app, session, response)
+
+        cookie_name = self.get_cookie_name(app) + '='
+        for header in response.headers.getlist('Set-Cookie'):
+            if header.startswith(cookie_name):
+                self.metrics.registry.observe(
+                    'fittrack_session_bytes', (('route', request.endpoint or 'unmatched'),),
+                    len(header), SIZE_BUCKETS
+                )
+        self.metrics.finish(response)
+
+
+def create_request_metrics(profiler=None):
+    """Build request metrics; METRICS_ENABLED=0 turns timing (and with it allocation profiling) off"""
+    return RequestMetrics(enabled=os.environ.get('METRICS_ENABLED', '1') == '1', profiler=profiler)
@@ -1,4 +1,249 @@
-from datetime import datetime
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, timezone
 
-# This file is reserved for future database models
-# Currently using session for data storage, but this file is kept for future expansion
\ No newline at end of file
+# Schema for users, their generated plans and daily weight logs. weight_log
+# is clustered on (user_id, date), so a user's history is one contiguous
+# range scan, as is water_log's daily intake. analytics_partials holds each
+# worker's latest cohort aggregates (see analytics.py).
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        created_at TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS plans (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users (id),
+        plan_key TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        goal_weight REAL NOT NULL,
+        sex TEXT NOT NULL,
+        height REAL NOT NULL,
+        activity_level TEXT NOT NULL,
+        bmi REAL NOT NULL,
+        tdee INTEGER NOT NULL,
+        calorie_target INTEGER NOT NULL,
+        water_intake REAL NOT NULL,
+        goal_type TEXT NOT NULL,
+        weeks_to_goal INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS plans_user_created ON plans (user_id, created_at)',
+    '''CREATE TABLE IF NOT EXISTS weight_log (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS water_log (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        ml INTEGER NOT NULL,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS analytics_partials (
+        worker TEXT PRIMARY KEY,
+        updated_at TEXT NOT NULL,
+        snapshot TEXT NOT NULL
+    )'''
+)
+
+# Statements are kept as module constants: sqlite3 caches the prepared
+# statement per connection keyed by SQL text, so reusing the same strings
+# means each one is compiled once per pooled connection.
+INSERT_USER = 'INSERT INTO users (created_at) VALUES (?)'
+INSERT_PLAN = (
+    'INSERT INTO plans (user_id, plan_key, created_at, age, weight, goal_weight, sex, height, '
+    'activity_level, bmi, tdee, calorie_target, water_intake, goal_type, weeks_to_goal) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+UPSERT_WEIGHT = (
+    'INSERT INTO weight_log (user_id, date, weight) VALUES (?, ?, ?) '
+    'ON CONFLICT (user_id, date) DO UPDATE SET weight = excluded.weight'
+)
+SELECT_WEIGHTS = (
+    'SELECT date, weight FROM weight_log '
+    'WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date'
+)
+SELECT_LATEST_PLAN = (
+    'SELECT plan_key, created_at FROM plans WHERE user_id = ? ORDER BY created_at DESC LIMIT 1'
+)
+ADD_WATER = (
+    'INSERT INTO water_log (user_id, date, ml) VALUES (?, ?, ?) '
+    'ON CONFLICT (user_id, date) DO UPDATE SET ml = ml + excluded.ml'
+)
+SELECT_WATER = 'SELECT ml FROM water_log WHERE user_id = ? AND date = ?'
+UPSERT_ANALYTICS_PARTIAL = (
+    'INSERT INTO analytics_partials (worker, updated_at, snapshot) VALUES (?, ?, ?) '
+    'ON CONFLICT (worker) DO UPDATE SET updated_at = excluded.updated_at, snapshot = excluded.snapshot'
+)
+SELECT_ANALYTICS_PARTIALS = 'SELECT worker, snapshot FROM analytics_partials WHERE worker != ?'
+
+
+class Database:
+    """
+    SQLite storage with a fixed-size connection pool per worker process.
+
+    Connections are opened by connect(), normally once at start-up (and
+    again in each worker after a fork), so requests only ever borrow an
+    already-open connection. The database runs in WAL mode so readers
+    don't block the writer.
+    """
+
+    def __init__(self, path, pool_size=4, timeout=5.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # A lock held by another thread at fork time would never be released
+        # in the child, which reopens the pool under it
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self.connections_opened += 1
+        return conn
+
+    def connect(self):
+        """Open the pool for the current process and make sure the schema exists"""
+        with self._lock:
+            self._connect()
+
+    def _connect(self):
+        pool = queue.LifoQueue()
+        for _ in range(self.pool_size):
+            pool.put(self._open())
+        conn = pool.get()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        pool.put(conn)
+        self._pool = pool
+        self._pid = os.getpid()
+
+    def close(self):
+        """Close every pooled connection; the next use reopens the pool"""
+        with self._lock:
+            pool, self._pool, self._pid = self._pool, None, None
+        while pool is not None and not pool.empty():
+            pool.get_nowait().close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        # Connections can't be shared with a forked parent; reopen once per
+        # worker. The check is repeated under the lock so threads racing to
+        # the first query open one pool, not one each
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._connect()
+        # Return the connection to the pool it came from, even if the pool
+        # has been replaced meanwhile
+        pool = self._pool
+        conn = pool.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and run the block in a single transaction"""
+        with self.connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def create_user(self):
+        """Create an anonymous user and return its ID"""
+        with self.connection() as conn:
+            return conn.execute(INSERT_USER, (datetime.now(timezone.utc).isoformat(),)).lastrowid
+
+    def save_plan(self, user_id, plan_key, plan):
+        """Record a generated plan's profile and metrics for a user"""
+        profile = plan['user_data']
+        with self.connection() as conn:
+            conn.execute(INSERT_PLAN, (
+                user_id, plan_key, datetime.now(timezone.utc).isoformat(),
+                profile['age'], profile['weight'], profile['goal_weight'], profile['sex'],
+                profile['height'], profile['activity_level'],
+                plan['bmi'], plan['tdee'], plan['calorie_target'], plan['water_intake'],
+                plan['goal_type'], plan['weeks_to_goal']
+            ))
+
+    def latest_plan(self, user_id):
+        """Return (plan_key, created_at) of the user's most recent plan, or None"""
+        with self.connection() as conn:
+            return conn.execute(SELECT_LATEST_PLAN, (user_id,)).fetchone()
+
+    def log_weight(self, user_id, weight, on=None):
+        """Record the user's weight for a day (today by default), replacing any earlier entry"""
+        day = (on or date.today()).isoformat()
+        with self.connection() as conn:
+            conn.execute(UPSERT_WEIGHT, (user_id, day, weight))
+
+    def log_weights(self, rows):
+        """Bulk-insert (user_id, date, weight) rows in one transaction"""
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_WEIGHT, rows)
+
+    def weight_history(self, user_id, start, end):
+        """Return [(date, weight), ...] for a user between two dates (inclusive)"""
+        with self.connection() as conn:
+            return conn.execute(SELECT_WEIGHTS, (user_id, start.isoformat(), end.isoformat())).fetchall()
+
+    def add_water(self, rows):
+        """Add (user_id, date, ml) amounts to the daily water totals in one transaction"""
+        with self.transaction() as conn:
+            conn.executemany(ADD_WATER, rows)
+
+    def water_total(self, user_id, day):
+        """Return the water (ml) recorded for a user on a day"""
+        with self.connection() as conn:
+            row = conn.execute(SELECT_WATER, (user_id, day.isoformat())).fetchone()
+        return row[0] if row else 0
+
+    def save_analytics_partial(self, worker, snapshot):
+        """Store a worker's serialized analytics snapshot, replacing its previous one"""
+        with self.connection() as conn:
+            conn.execute(UPSERT_ANALYTICS_PARTIAL, (worker, datetime.now(timezone.utc).isoformat(), snapshot))
+
+    def analytics_partials(self, exclude_worker=''):
+        """Return [(worker, snapshot), ...] for every worker except exclude_worker"""
+        with self.connection() as conn:
+            return conn.execute(SELECT_ANALYTICS_PARTIALS, (exclude_worker,)).fetchall()
+
+
+def create_database():
+    """
+    Build the database configured by the environment.
+
+    DATABASE_PATH sets the SQLite file and DATABASE_POOL_SIZE the number of
+    connections each worker keeps open.
+    """
+    return Database(
+        os.environ.get('DATABASE_PATH', 'fittrack.db'),
+        int(os.environ.get('DATABASE_POOL_SIZE', 4))
+    )
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from exercise_data import get_diet_recommendations
+from plan_engine import calculate_plan_metrics
+
+
+class LRUCache:
+    """
+    Thread-safe bounded mapping with least-recently-used eviction.
+
+    Keeps hit, miss and eviction counters so callers can tell whether the
+    cache is sized sensibly for their traffic.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for key, calling factory() to build it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Build outside the lock; concurrent misses on the same key may both
+        # build, and the first stored value wins
+        value = factory()
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the counters and current size as a dictionary"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+
+def freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _quantize(value, step):
+    """Snap value to the nearest multiple of step (no-op when step is None)"""
+    if not step:
+        return value
+    return round(round(value / step) * step, 6)
+
+
+class PlanCache:
+    """
+    Memoizes the deterministic parts of a plan.
+
+    Metrics are keyed by a normalized profile tuple; weight and height can be
+    quantized (e.g. to 0.5kg / 1cm steps) so nearby profiles share entries,
+    in which case metrics are computed from the quantized values. Diet
+    recommendations depend only on (goal_type, calorie_target) and are
+    shared across every profile that lands on the same target.
+
+    Cached values are frozen and shared between requests, so callers must
+    copy them before modifying.
+    """
+
+    def __init__(self, maxsize=4096, weight_step=None, height_step=None):
+        self.weight_step = weight_step
+        self.height_step = height_step
+        self.metrics_cache = LRUCache(maxsize)
+        self.diet_cache = LRUCache(maxsize)
+
+    def normalize(self, age, weight, goal_weight, sex, height, activity_level):
+        """Return the cache key for a profile"""
+        return (
+            age,
+            _quantize(weight, self.weight_step),
+            _quantize(goal_weight, self.weight_step),
+            'male' if sex == 'male' else 'female',
+            _quantize(height, self.height_step),
+            activity_level
+        )
+
+    def get_metrics(self, age, weight, goal_weight, sex, height, activity_level):
+        """Cached calculate_plan_metrics() result for a profile"""
+        key = self.normalize(age, weight, goal_weight, sex, height, activity_level)
+        return self.metrics_cache.get_or_create(key, lambda: freeze(calculate_plan_metrics(*key)))
+
+    def get_diet(self, goal_type, calorie_target):
+        """Cached get_diet_recommendations() result"""
+        key = (goal_type, calorie_target)
+        return self.diet_cache.get_or_create(key, lambda: freeze(get_diet_recommendations(*key)))
+
+    def stats(self):
+        return {
+            'metrics': self.metrics_cache.stats(),
+            'diet': self.diet_cache.stats()
+        }
+
+
+def create_plan_cache():
+    """
+    Build the plan cache configured by the environment.
+
+    PLAN_CACHE_SIZE bounds each component cache; PLAN_CACHE_WEIGHT_STEP and
+    PLAN_CACHE_HEIGHT_STEP enable quantization of weight (kg) and height (cm).
+    """
+    weight_step = os.environ.get('PLAN_CACHE_WEIGHT_STEP')
+    height_step = os.environ.get('PLAN_CACHE_HEIGHT_STEP')
+    return PlanCache(
+        int(os.environ.get('PLAN_CACHE_SIZE', 4096)),
+        float(weight_step) if weight_step else None,
+        float(height_step) if height_step else None
+    )
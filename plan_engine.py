@@ -0,0 +1,300 @@
+from exercise_data import calculate_water_intake, WATER_ACTIVITY_FACTORS, MACRO_RATIOS
+
+# Activity multipliers applied to BMR to estimate TDEE
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9
+}
+
+ACTIVITY_LEVELS = tuple(ACTIVITY_FACTORS)
+
+# Allowed ranges for numeric profile fields, checked in this order
+VALIDATION_RULES = (
+    ('age', 12, 100, 'Please enter a valid age between 12 and 100.'),
+    ('weight', 30, 300, 'Please enter a valid weight between 30kg and 300kg.'),
+    ('goal_weight', 30, 300, 'Please enter a valid goal weight between 30kg and 300kg.'),
+    ('height', 100, 250, 'Please enter a valid height between 100cm and 250cm.')
+)
+
+INVALID_ACTIVITY_MESSAGE = 'Please select a valid activity level.'
+
+# Values offered by the form's sex field
+SEXES = ('male', 'female')
+
+INVALID_SEX_MESSAGE = 'Please select a valid sex.'
+
+# Column order used by the batch engine and its callers
+PROFILE_FIELDS = ('age', 'weight', 'goal_weight', 'sex', 'height', 'activity_level')
+
+# Daily calorie floor applied to weight loss targets
+MIN_CALORIE_TARGET = 1200
+
+# Assumed weekly weight change (kg) for a 500 calorie deficit/surplus
+WEEKLY_WEIGHT_CHANGE = 0.5
+
+# NumPy is only needed by the batch functions, so it is imported on first use
+# to keep it out of worker start-up time and memory
+np = None
+
+
+def load_numpy():
+    """Import NumPy on first use and return the module"""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def validate_profile(profile):
+    """
+    Check a single profile against the form validation rules.
+
+    Args:
+        profile: Mapping with numeric age, weight, goal_weight and height
+
+    Returns:
+        The first validation error message, or None if the profile is valid
+    """
+    for field, low, high, message in VALIDATION_RULES:
+        # Written as a range check so NaN fails it too
+        if not low <= profile[field] <= high:
+            return message
+    return None
+
+
+def calculate_bmi(weight, height):
+    """Body Mass Index from weight in kg and height in cm (unrounded)"""
+    return weight / ((height/100) ** 2)
+
+
+def calculate_plan_metrics(age, weight, goal_weight, sex, height, activity_level):
+    """
+    Calculate the derived metrics for a single profile.
+
+    Args:
+        age: Age in years
+        weight: Current weight in kg
+        goal_weight: Goal weight in kg
+        sex: 'male' or 'female'
+        height: Height in cm
+        activity_level: User's activity level
+
+    Returns:
+        Dictionary with bmi, tdee, water_intake, calorie_target, goal_type
+        and weeks_to_goal, rounded the way they are shown to the user
+    """
+    bmi = calculate_bmi(weight, height)
+
+    # Calculate BMR (Basal Metabolic Rate) using Mifflin-St Jeor Equation
+    if sex == 'male':
+        bmr = 10 * weight + 6.25 * height - 5 * age + 5
+    else:
+        bmr = 10 * weight + 6.25 * height - 5 * age - 161
+
+    # Calculate TDEE (Total Daily Energy Expenditure)
+    tdee = bmr * ACTIVITY_FACTORS[activity_level]
+
+    # Calculate daily calorie target (assuming ~500 calorie deficit/surplus for ~0.5kg/week)
+    weight_diff = goal_weight - weight
+    if weight_diff < 0:  # Weight loss
+        calorie_target = max(MIN_CALORIE_TARGET, round(tdee - 500))
+        goal_type = 'loss'
+    elif weight_diff > 0:  # Weight gain
+        calorie_target = round(tdee + 500)
+        goal_type = 'gain'
+    else:  # Maintenance
+        calorie_target = round(tdee)
+        goal_type = 'maintain'
+
+    return {
+        'bmi': round(bmi, 2),
+        'tdee': round(tdee),
+        'water_intake': calculate_water_intake(weight, activity_level),
+        'calorie_target': calorie_target,
+        'goal_type': goal_type,
+        'weeks_to_goal': round(abs(weight_diff) / WEEKLY_WEIGHT_CHANGE)
+    }
+
+
+def _round(values, ndigits):
+    """
+    Round an array exactly like the built-in round().
+
+    np.round scales by 10**ndigits first, which can turn a value just below
+    a .5 boundary into an exact tie. Those few near-ties are re-rounded with
+    round() so batch results match the single-profile path bit for bit.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    near_ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_ties:
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def profile_columns(raw):
+    """
+    Convert raw profile columns (lists or arrays) into NumPy arrays.
+
+    Numeric fields become float arrays (missing values become NaN) and the
+    text fields become object arrays.
+
+    Raises:
+        TypeError, ValueError: If a numeric column holds non-numeric values
+    """
+    load_numpy()
+    return {
+        'age': np.asarray(raw['age'], dtype=np.float64),
+        'weight': np.asarray(raw['weight'], dtype=np.float64),
+        'goal_weight': np.asarray(raw['goal_weight'], dtype=np.float64),
+        'sex': np.asarray(raw['sex'], dtype=object),
+        'height': np.asarray(raw['height'], dtype=np.float64),
+        'activity_level': np.asarray(raw['activity_level'], dtype=object)
+    }
+
+
+def validate_profiles_batch(columns):
+    """
+    Validate a batch of profiles given as columns.
+
+    Args:
+        columns: Mapping of PROFILE_FIELDS to equal-length arrays, as
+            returned by profile_columns()
+
+    Returns:
+        Tuple of (valid, errors) where valid is a boolean array and errors
+        maps each invalid row index to its first validation error message
+    """
+    load_numpy()
+    n = len(columns['age'])
+    valid = np.ones(n, dtype=bool)
+    errors = {}
+
+    for field, low, high, message in VALIDATION_RULES:
+        values = np.asarray(columns[field])
+        failed = valid & ((values < low) | (values > high) | np.isnan(values))
+        for i in np.flatnonzero(failed).tolist():
+            errors[i] = message
+        valid &= ~failed
+
+    # The form only accepts whole years, so fractional ages fail the age rule
+    age = np.asarray(columns['age'])
+    failed = valid & (age != np.floor(age))
+    for i in np.flatnonzero(failed).tolist():
+        errors[i] = VALIDATION_RULES[0][3]
+    valid &= ~failed
+
+    sex = np.asarray(columns['sex'], dtype=object)
+    failed = valid & ~np.isin(sex, SEXES)
+    for i in np.flatnonzero(failed).tolist():
+        errors[i] = INVALID_SEX_MESSAGE
+    valid &= ~failed
+
+    activity = np.asarray(columns['activity_level'], dtype=object)
+    failed = valid & ~np.isin(activity, ACTIVITY_LEVELS)
+    for i in np.flatnonzero(failed).tolist():
+        errors[i] = INVALID_ACTIVITY_MESSAGE
+    valid &= ~failed
+
+    return valid, errors
+
+
+def calculate_plan_metrics_batch(age, weight, goal_weight, sex, height, activity_level):
+    """
+    Vectorized version of calculate_plan_metrics for many profiles at once.
+
+    All arguments are equal-length array-likes; rows are expected to have
+    passed validate_profiles_batch. Results match calculate_plan_metrics
+    (and the macros from get_diet_recommendations) row for row.
+
+    Returns:
+        Dictionary of NumPy arrays: bmi, tdee, water_intake, calorie_target,
+        goal_type, weeks_to_goal, protein, fat and carbs
+    """
+    load_numpy()
+    age = np.asarray(age, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    goal_weight = np.asarray(goal_weight, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    sex = np.asarray(sex, dtype=object)
+    activity_level = np.asarray(activity_level, dtype=object)
+
+    # Map activity levels to their table rows once, then gather both factors
+    level_index = np.zeros(len(activity_level), dtype=np.intp)
+    for i, level in enumerate(ACTIVITY_LEVELS):
+        level_index[activity_level == level] = i
+    activity_factors = np.array([ACTIVITY_FACTORS[level] for level in ACTIVITY_LEVELS])
+    water_factors = np.array([WATER_ACTIVITY_FACTORS[level] for level in ACTIVITY_LEVELS])
+
+    bmi = weight / ((height/100) ** 2)
+
+    # Mifflin-St Jeor, same operation order as the scalar path
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(sex == 'male', 5, -161)
+    tdee = bmr * activity_factors[level_index]
+
+    weight_diff = goal_weight - weight
+    loss = weight_diff < 0
+    gain = weight_diff > 0
+    calorie_target = np.where(
+        loss,
+        np.maximum(MIN_CALORIE_TARGET, np.rint(tdee - 500)),
+        np.where(gain, np.rint(tdee + 500), np.rint(tdee))
+    ).astype(np.int64)
+    goal_type = np.where(loss, 'loss', np.where(gain, 'gain', 'maintain'))
+
+    water_intake = _round(weight * 35 * water_factors[level_index] / 1000, 1)
+
+    # Macro grams, using the same ratios as get_diet_recommendations
+    ratios = np.array([MACRO_RATIOS[goal] for goal in ('loss', 'gain', 'maintain')])
+    goal_index = np.where(loss, 0, np.where(gain, 1, 2))
+    protein = np.rint(calorie_target * ratios[goal_index, 0] / 4).astype(np.int64)
+    fat = np.rint(calorie_target * ratios[goal_index, 1] / 9).astype(np.int64)
+    carbs = np.rint(calorie_target * ratios[goal_index, 2] / 4).astype(np.int64)
+
+    return {
+        'bmi': _round(bmi, 2),
+        'tdee': np.rint(tdee).astype(np.int64),
+        'water_intake': water_intake,
+        'calorie_target': calorie_target,
+        'goal_type': goal_type,
+        'weeks_to_goal': np.rint(np.abs(weight_diff) / WEEKLY_WEIGHT_CHANGE).astype(np.int64),
+        'protein': protein,
+        'fat': fat,
+        'carbs': carbs
+    }
+
+
+def sweep_plan_metrics(profile, goal_weights, activity_levels):
+    """
+    Plan metrics for one profile across a grid of goal weights and activity levels.
+
+    The whole grid goes through calculate_plan_metrics_batch in one pass,
+    so each cell matches what /process would compute for that combination.
+
+    Args:
+        profile: Validated profile; its goal_weight and activity_level are
+            replaced by the grid values
+        goal_weights: Sequence of goal weights (columns of the grid)
+        activity_levels: Sequence of activity levels (rows of the grid)
+
+    Returns:
+        Dictionary of (len(activity_levels), len(goal_weights)) NumPy arrays,
+        keyed like calculate_plan_metrics_batch's result
+    """
+    load_numpy()
+    rows, columns = len(activity_levels), len(goal_weights)
+    size = rows * columns
+    metrics = calculate_plan_metrics_batch(
+        np.full(size, profile['age']),
+        np.full(size, profile['weight']),
+        np.tile(np.asarray(goal_weights, dtype=np.float64), rows),
+        np.full(size, profile['sex'], dtype=object),
+        np.full(size, profile['height']),
+        np.repeat(np.asarray(activity_levels, dtype=object), columns)
+    )
+    return {name: values.reshape(rows, columns) for name, values in metrics.items()}
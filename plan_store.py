@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+class PlanStore:
+    """
+    Base class for server-side plan storage.
+
+    Plans are stored under a short random ID so the session cookie only has
+    to carry that ID. Entries expire ttl seconds after they were saved.
+    """
+
+    def __init__(self, ttl=86400):
+        self.ttl = ttl
+
+    def new_id(self):
+        """Generate a short, URL-safe plan ID"""
+        return secrets.token_urlsafe(12)
+
+    def save(self, plan):
+        """Store a plan and return its ID"""
+        plan_id = self.new_id()
+        self.put(plan_id, plan, time.time() + self.ttl)
+        return plan_id
+
+    def put(self, plan_id, plan, expires_at):
+        raise NotImplementedError
+
+    def load(self, plan_id):
+        """Return the plan stored under plan_id, or None if missing or expired"""
+        raise NotImplementedError
+
+    def delete(self, plan_id):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Remove all expired plans and return how many were removed"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections held by this process (e.g. before forking workers)"""
+
+
+class MemoryPlanStore(PlanStore):
+    """
+    In-process LRU plan store.
+
+    Holds at most max_entries plans; the least recently loaded plan is
+    evicted first. Plans are only visible to the worker that created them.
+    """
+
+    def __init__(self, ttl=86400, max_entries=10000):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, plan_id, plan, expires_at):
+        with self._lock:
+            self._entries[plan_id] = (expires_at, plan)
+            self._entries.move_to_end(plan_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, plan_id):
+        with self._lock:
+            entry = self._entries.get(plan_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[plan_id]
+                return None
+            self._entries.move_to_end(plan_id)
+            return entry[1]
+
+    def delete(self, plan_id):
+        with self._lock:
+            self._entries.pop(plan_id, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [plan_id for plan_id, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for plan_id in expired:
+                del self._entries[plan_id]
+        return len(expired)
+
+
+class SQLitePlanStore(PlanStore):
+    """
+    SQLite-backed plan store shared by every worker on the host.
+
+    Plans are stored as JSON. Expired rows are skipped on load and removed
+    in bulk every purge_interval saves.
+    """
+
+    def __init__(self, path, ttl=86400, purge_interval=1000):
+        super().__init__(ttl)
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._saves = 0
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS plans ('
+            'id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._connection().execute('CREATE INDEX IF NOT EXISTS plans_expires_at ON plans (expires_at)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        # Connections held by other threads are dropped with their thread-local
+        self._local = threading.local()
+
+    def put(self, plan_id, plan, expires_at):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO plans (id, data, expires_at) VALUES (?, ?, ?)',
+            (plan_id, json.dumps(plan, separators=(',', ':'), default=_encode_default), expires_at)
+        )
+        self._saves += 1
+        if self._saves % self.purge_interval == 0:
+            self.purge_expired()
+
+    def load(self, plan_id):
+        row = self._connection().execute(
+            'SELECT data FROM plans WHERE id = ? AND expires_at > ?',
+            (plan_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, plan_id):
+        self._connection().execute('DELETE FROM plans WHERE id = ?', (plan_id,))
+
+    def purge_expired(self):
+        cursor = self._connection().execute('DELETE FROM plans WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+
+def _encode_default(value):
+    # Cached plan components are read-only mappings rather than dicts
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def create_plan_store():
+    """
+    Build the plan store selected by the environment.
+
+    PLAN_STORE picks the backend ('memory' or 'sqlite'), PLAN_TTL sets the
+    lifetime in seconds, PLAN_STORE_MAX_ENTRIES bounds the memory backend and
+    PLAN_STORE_PATH sets the SQLite database file.
+    """
+    backend = os.environ.get('PLAN_STORE', 'memory')
+    ttl = int(os.environ.get('PLAN_TTL', 86400))
+
+    if backend == 'memory':
+        return MemoryPlanStore(ttl, int(os.environ.get('PLAN_STORE_MAX_ENTRIES', 10000)))
+    if backend == 'sqlite':
+        return SQLitePlanStore(os.environ.get('PLAN_STORE_PATH', 'fittrack_plans.db'), ttl)
+    raise ValueError(f"Unknown PLAN_STORE backend: {backend}")
@@ -0,0 +1,210 @@
+from plan_engine import ACTIVITY_FACTORS, ACTIVITY_LEVELS, MIN_CALORIE_TARGET, load_numpy
+
+# Energy content of one kg of body weight change (kcal)
+KCAL_PER_KG = 7700
+
+# Metabolic adaptation: expenditure drifts by this share per kg changed
+# (down while losing, up while gaining), capped at MAX_ADAPTATION
+ADAPTATION_PER_KG = 0.005
+MAX_ADAPTATION = 0.15
+
+# Longest projection horizon, in weeks
+MAX_WEEKS = 520
+
+# Weekly change (kg) below which a projection is treated as a plateau
+PLATEAU_THRESHOLD = 0.001
+
+# Default number of points returned for a chart
+DEFAULT_POINT_BUDGET = 52
+
+
+def project_weights_batch(age, weight, goal_weight, sex, height, activity_level, max_weeks=MAX_WEEKS):
+    """
+    Simulate week-by-week weight for many users at once.
+
+    Each week BMR and TDEE are recomputed from the projected weight and the
+    plan's calorie target follows them (TDEE -/+ 500, with the 1200 kcal
+    floor for weight loss). Actual expenditure is adjusted for metabolic
+    adaptation, so progress slows as the user moves away from their
+    starting weight and can plateau before the goal.
+
+    Args:
+        age, weight, goal_weight, sex, height, activity_level: Equal-length
+            array-likes of validated profiles
+        max_weeks: Projection horizon
+
+    Returns:
+        Tuple of (weights, weeks_to_goal). weights is an (n, weeks + 1)
+        array whose rows hold the goal weight once reached; weeks_to_goal
+        is -1 for users who plateau or don't reach the goal in time.
+    """
+    np = load_numpy()
+    age = np.asarray(age, dtype=np.float64)
+    start = np.asarray(weight, dtype=np.float64)
+    goal = np.asarray(goal_weight, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    sex = np.asarray(sex, dtype=object)
+    activity_level = np.asarray(activity_level, dtype=object)
+
+    level_index = np.zeros(len(activity_level), dtype=np.intp)
+    for i, level in enumerate(ACTIVITY_LEVELS):
+        level_index[activity_level == level] = i
+    factor = np.array([ACTIVITY_FACTORS[level] for level in ACTIVITY_LEVELS])[level_index]
+
+    # Mifflin-St Jeor terms that don't depend on weight
+    base = 6.25 * height - 5 * age + np.where(sex == 'male', 5, -161)
+
+    direction = np.sign(goal - start)
+    losing = direction < 0
+    active = direction != 0
+    weeks_to_goal = np.where(active, -1, 0)
+
+    current = start.copy()
+    history = [current]
+    for week in range(1, max_weeks + 1):
+        if not active.any():
+            break
+
+        nominal_tdee = (10 * current + base) * factor
+        intake = np.where(losing, np.maximum(MIN_CALORIE_TARGET, nominal_tdee - 500), nominal_tdee + 500)
+        adaptation = np.minimum(ADAPTATION_PER_KG * np.abs(current - start), MAX_ADAPTATION)
+        actual_tdee = nominal_tdee * (1 + direction * adaptation)
+
+        change = np.where(active, 7 * (intake - actual_tdee) / KCAL_PER_KG, 0.0)
+        projected = current + change
+
+        reached = active & ((projected - goal) * direction >= 0)
+        projected = np.where(reached, goal, projected)
+        weeks_to_goal[reached] = week
+
+        # Users whose weekly change has stalled (or reversed) won't get there
+        stalled = active & ~reached & (change * direction < PLATEAU_THRESHOLD)
+        active &= ~(reached | stalled)
+
+        current = projected
+        history.append(current)
+
+    return np.stack(history, axis=1), weeks_to_goal
+
+
+def downsample_lttb(x, y, budget):
+    """
+    Reduce a series to at most budget points with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with its neighbours, which preserves
+    the visual shape of the curve. Chart series are a few hundred points at
+    most, so this runs on plain lists.
+
+    Returns:
+        Tuple of (x, y) lists
+    """
+    x = list(x)
+    y = list(y)
+    n = len(x)
+    if budget >= n or budget < 3:
+        return x, y
+
+    every = (n - 2) / (budget - 2)
+    selected = [0]
+    a = 0
+    for i in range(budget - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # Average of the next bucket (the last point for the final bucket)
+        if end >= n - 1:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = sum(x[end:next_end]) / (next_end - end)
+            avg_y = sum(y[end:next_end]) / (next_end - end)
+
+        ax, ay = x[a], y[a]
+        best_area = -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                a = j
+        selected.append(a)
+
+    selected.append(n - 1)
+    return [x[i] for i in selected], [y[i] for i in selected]
+
+
+def projection_series(weights, weeks_to_goal, budget=DEFAULT_POINT_BUDGET):
+    """
+    Chart-ready series for one projected weight trajectory.
+
+    Args:
+        weights: Weekly weights from project_weights(), or one row of
+            project_weights_batch()
+        weeks_to_goal: Matching weeks to goal (-1 if not reached)
+        budget: Maximum number of points to return
+
+    Returns:
+        Dictionary with weeks, weights (kg, 1 decimal) and weeks_to_goal
+        (None if the goal isn't reached within the horizon)
+    """
+    weights = [float(value) for value in weights]
+    if weeks_to_goal >= 0:
+        length = int(weeks_to_goal) + 1
+    else:
+        # Batch rows are padded to the longest projection; stop at the plateau
+        length = len(weights)
+        while length > 1 and weights[length - 1] == weights[length - 2]:
+            length -= 1
+    weeks, values = downsample_lttb(range(length), weights[:length], budget)
+    return {
+        'weeks': weeks,
+        'weights': [round(value, 1) for value in values],
+        'weeks_to_goal': int(weeks_to_goal) if weeks_to_goal >= 0 else None
+    }
+
+
+def project_weights(age, weight, goal_weight, sex, height, activity_level, max_weeks=MAX_WEEKS):
+    """
+    Scalar version of project_weights_batch() for a single profile.
+
+    NumPy's per-call overhead dominates for one row, so the per-request
+    path runs the same model in plain floats (same operation order, same
+    results).
+
+    Returns:
+        Tuple of (weights, weeks_to_goal) with weights as a list that ends at
+        the goal or the plateau
+    """
+    factor = ACTIVITY_FACTORS[activity_level]
+    base = 6.25 * height - 5 * age + (5 if sex == 'male' else -161)
+    if goal_weight == weight:
+        return [float(weight)], 0
+    direction = 1 if goal_weight > weight else -1
+
+    current = float(weight)
+    weights = [current]
+    for week in range(1, max_weeks + 1):
+        nominal_tdee = (10 * current + base) * factor
+        if direction < 0:
+            intake = max(MIN_CALORIE_TARGET, nominal_tdee - 500)
+        else:
+            intake = nominal_tdee + 500
+        adaptation = min(ADAPTATION_PER_KG * abs(current - weight), MAX_ADAPTATION)
+        actual_tdee = nominal_tdee * (1 + direction * adaptation)
+
+        change = 7 * (intake - actual_tdee) / KCAL_PER_KG
+        current = current + change
+        if (current - goal_weight) * direction >= 0:
+            weights.append(float(goal_weight))
+            return weights, week
+        weights.append(current)
+        if change * direction < PLATEAU_THRESHOLD:
+            break
+
+    return weights, -1
+
+
+def project_plan(age, weight, goal_weight, sex, height, activity_level, budget=DEFAULT_POINT_BUDGET):
+    """Chart-ready projection series for a single profile"""
+    weights, weeks_to_goal = project_weights(age, weight, goal_weight, sex, height, activity_level)
+    return projection_series(weights, weeks_to_goal, budget)
@@ -0,0 +1,252 @@
+"""
+Production launcher: a pre-forking WSGI server for FitTrack.
+
+    SERVE_WORKERS=4 python serve.py
+
+The master process imports the app (templates compiled, exercise catalog
+and other module-level data built), freezes the garbage collector's view
+of those objects and then forks the workers, so every worker shares that
+memory copy-on-write instead of building its own. Each worker serves
+requests from the shared listening socket one at a time.
+
+Signals sent to the master:
+    SIGHUP           graceful reload: re-exec the master with fresh code on
+                     the same socket while old workers finish their request
+    SIGTERM, SIGINT  graceful shutdown (workers are killed after
+                     SERVE_GRACEFUL_TIMEOUT seconds)
+
+Configuration (environment):
+    SERVE_HOST, SERVE_PORT         listen address (default 0.0.0.0:5000)
+    SERVE_WORKERS                  worker processes (default: CPU count)
+    SERVE_MAX_REQUESTS             recycle a worker after this many requests
+                                   (default 0, never)
+    SERVE_MAX_REQUESTS_JITTER      random extra requests per worker, so
+                                   workers don't all recycle at once
+    SERVE_GRACEFUL_TIMEOUT         seconds to wait for workers on shutdown
+    SERVE_BACKLOG                  listen backlog
+    SERVE_PRELOAD_NUMPY            import NumPy and build the meal solver
+                                   before forking (default 1; 0 defers it to
+                                   the first diet or batch request)
+"""
+import os
+import gc
+import sys
+import time
+import random
+import signal
+import socket
+import logging
+from werkzeug.serving import BaseWSGIServer
+from logging_config import configure_logging, shutdown_logging
+
+# Set by a reloading master so the new image keeps the listening socket
+LISTEN_FD_ENV = 'SERVE_LISTEN_FD'
+
+logger = logging.getLogger('fittrack.serve')
+
+
+def load_config():
+    """Read the launcher configuration from the environment"""
+    return {
+        'host': os.environ.get('SERVE_HOST', '0.0.0.0'),
+        'port': int(os.environ.get('SERVE_PORT', os.environ.get('PORT', 5000))),
+        'workers': int(os.environ.get('SERVE_WORKERS', 0)) or os.cpu_count() or 1,
+        'max_requests': int(os.environ.get('SERVE_MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(os.environ.get('SERVE_MAX_REQUESTS_JITTER', 0)),
+        'graceful_timeout': float(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30)),
+        'backlog': int(os.environ.get('SERVE_BACKLOG', 2048)),
+        'preload_numpy': os.environ.get('SERVE_PRELOAD_NUMPY', '1') == '1'
+    }
+
+
+def open_listener(config):
+    """Bind the listening socket, or adopt the one handed over by a reload"""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        sock = socket.create_server(
+            (config['host'], config['port']), backlog=config['backlog']
+        )
+    # Idle workers all wait on the socket; the ones that lose the race for a
+    # connection must not block in accept()
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(config):
+    """Import and warm everything workers should share, then freeze it for the GC"""
+    # The memory plan store and rate limiter are per process, so a plan
+    # created by one worker would be missing on the next request if another
+    # worker handled it, and each worker would grant a client its own budget
+    if config['workers'] > 1:
+        os.environ.setdefault('PLAN_STORE', 'sqlite')
+        os.environ.setdefault('ADMISSION_BACKEND', 'sqlite')
+
+    import app as app_module
+
+    if config['preload_numpy']:
+        from meal_planner import load_solver
+        load_solver()
+
+    # Inherited database handles can't be used safely from a child process;
+    # each worker opens its own after the fork
+    app_module.db.close()
+    app_module.plan_store.close()
+
+    # Objects that exist now are never collected; keeping the collector
+    # away from them stops it writing to (and so copying) the shared pages
+    gc.collect()
+    gc.freeze()
+    return app_module
+
+
+class _WorkerServer(BaseWSGIServer):
+    """Single-request-at-a-time server that counts completed requests"""
+
+    handled = 0
+
+    def shutdown_request(self, request):
+        super().shutdown_request(request)
+        self.handled += 1
+
+
+def run_worker(app_module, sock, config):
+    """Serve requests until told to stop or the request budget is used up"""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # Per-worker resources that can't be shared across the fork
+    app_module.db.connect()
+    random.seed()
+
+    budget = config['max_requests']
+    if budget and config['max_requests_jitter']:
+        budget += random.randint(0, config['max_requests_jitter'])
+
+    server = _WorkerServer(config['host'], config['port'], app_module.app, fd=sock.fileno())
+    server.timeout = 1.0
+    while not stopping and not (budget and server.handled >= budget):
+        server.handle_request()
+    # Write buffered water logs, publish this worker's final analytics
+    # partial and dump its memory profile before it goes away (os._exit
+    # skips atexit handlers)
+    app_module.hydration.close()
+    app_module.analytics.flush()
+    if app_module.memory_profiler.enabled:
+        app_module.memory_profiler.dump()
+    shutdown_logging()
+    os._exit(0)
+
+
+class Master:
+    """Forks and supervises the worker processes"""
+
+    def __init__(self, app_module, sock, config):
+        self.app_module = app_module
+        self.sock = sock
+        self.config = config
+        self.workers = set()
+        self.signal = None
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.app_module, self.sock, self.config)
+            finally:
+                os._exit(1)
+        self.workers.add(pid)
+
+    def reap(self):
+        """Collect exited children; returns True if any worker exited"""
+        exited = False
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return exited
+            if pid == 0:
+                return exited
+            # Children of a previous image (after a reload) aren't tracked
+            if pid in self.workers:
+                self.workers.discard(pid)
+                exited = True
+
+    def stop_workers(self):
+        """Ask workers to finish their current request and exit, then wait"""
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.config['graceful_timeout']
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _on_signal(self, signum, frame):
+        self.signal = signum
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._on_signal)
+
+        logger.info(
+            "Serving on %s:%s with %d workers", self.config['host'],
+            self.sock.getsockname()[1], self.config['workers']
+        )
+        while True:
+            if self.signal == signal.SIGHUP:
+                self.reload()
+            if self.signal in (signal.SIGTERM, signal.SIGINT):
+                logger.info("Shutting down")
+                self.stop_workers()
+                return
+
+            self.reap()
+            while len(self.workers) < self.config['workers']:
+                self.spawn()
+            time.sleep(0.2)
+
+    def reload(self):
+        """
+        Re-exec the master with the same listening socket.
+
+        The old workers get SIGTERM and finish the request they are on; the
+        new image imports the current code and forks fresh workers, and
+        connections that arrive meanwhile wait in the socket backlog.
+        """
+        logger.info("Reloading")
+        for pid in self.workers:
+            self._kill(pid, signal.SIGTERM)
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        shutdown_logging()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+def main():
+    os.environ.setdefault('FITTRACK_ENV', 'production')
+    configure_logging()
+    config = load_config()
+    sock = open_listener(config)
+    app_module = preload(config)
+    Master(app_module, sock, config).run()
+
+
+if __name__ == '__main__':
+    main()
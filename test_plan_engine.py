@@ -0,0 +1,96 @@
+"""
+Parity of the batch plan engine with the single-profile path used by /process.
+
+    python -m pytest test_plan_engine.py
+"""
+import random
+
+import pytest
+
+from exercise_data import get_diet_recommendations
+from plan_engine import (
+    ACTIVITY_LEVELS, INVALID_ACTIVITY_MESSAGE, INVALID_SEX_MESSAGE, PROFILE_FIELDS, SEXES, VALIDATION_RULES,
+    calculate_plan_metrics, calculate_plan_metrics_batch, profile_columns, validate_profile, validate_profiles_batch
+)
+
+MACRO_FIELDS = ('protein', 'fat', 'carbs')
+
+
+def random_profiles(count, seed):
+    """Form-like profiles over the accepted ranges, plus a few just outside them"""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        weight = round(rng.uniform(30, 300), 1)
+        profiles.append({
+            'age': rng.randint(12, 100),
+            'weight': weight,
+            # Some maintenance goals, which take their own branch
+            'goal_weight': weight if rng.random() < 0.1 else round(rng.uniform(30, 300), 1),
+            'sex': rng.choice(('male', 'female')),
+            'height': float(rng.randint(100, 250)),
+            'activity_level': rng.choice(ACTIVITY_LEVELS)
+        })
+    return profiles
+
+
+def scalar_plan(profile):
+    """Metrics and macros the way /process computes them"""
+    metrics = calculate_plan_metrics(*(profile[field] for field in PROFILE_FIELDS))
+    macros = get_diet_recommendations(metrics['goal_type'], metrics['calorie_target'])['macros']
+    return dict(metrics, **{field: macros[field] for field in MACRO_FIELDS})
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_metrics_match_scalar_path(seed):
+    profiles = random_profiles(500, seed)
+    columns = profile_columns({field: [profile[field] for profile in profiles] for field in PROFILE_FIELDS})
+    batch = calculate_plan_metrics_batch(*(columns[field] for field in PROFILE_FIELDS))
+    results = {name: values.tolist() for name, values in batch.items()}
+
+    for i, profile in enumerate(profiles):
+        expected = scalar_plan(profile)
+        actual = {name: results[name][i] for name in expected}
+        assert actual == expected, profile
+        # JSON responses must carry the same types too (int, not 1234.0)
+        assert {name: type(value) for name, value in actual.items()} == \
+            {name: type(value) for name, value in expected.items()}, profile
+
+
+def test_batch_validation_matches_scalar_path():
+    profiles = random_profiles(200, 7)
+    rng = random.Random(7)
+    for profile in profiles:
+        field = rng.choice(('age', 'weight', 'goal_weight', 'height', None))
+        if field:
+            profile[field] = rng.choice((5, 11.5, 301, 99.9, 1000, float('nan')))
+    profiles.append(dict(profiles[0], age=30.5))
+    profiles.append(dict(profiles[0], activity_level='athletic'))
+    profiles.append(dict(profiles[0], sex='M'))
+
+    columns = profile_columns({field: [profile[field] for profile in profiles] for field in PROFILE_FIELDS})
+    valid, errors = validate_profiles_batch(columns)
+
+    for i, profile in enumerate(profiles):
+        expected = validate_profile(profile)
+        if expected is None and profile['age'] != int(profile['age']):
+            # The form's int() parsing rejects fractional ages before validation
+            expected = VALIDATION_RULES[0][3]
+        if expected is None and profile['sex'] not in SEXES:
+            expected = INVALID_SEX_MESSAGE
+        if expected is None and profile['activity_level'] not in ACTIVITY_LEVELS:
+            expected = INVALID_ACTIVITY_MESSAGE
+        assert errors.get(i) == expected, profile
+        assert bool(valid[i]) == (expected is None), profile
+
+
+def test_batch_validation_rejects_unknown_sex():
+    profiles = random_profiles(6, 3)
+    for i, sex in ((1, 'M'), (2, ''), (4, 'xyz')):
+        profiles[i]['sex'] = sex
+
+    columns = profile_columns({field: [profile[field] for profile in profiles] for field in PROFILE_FIELDS})
+    valid, errors = validate_profiles_batch(columns)
+
+    assert valid.tolist() == [True, False, False, True, False, True]
+    assert errors == {1: INVALID_SEX_MESSAGE, 2: INVALID_SEX_MESSAGE, 4: INVALID_SEX_MESSAGE}